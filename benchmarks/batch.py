@@ -0,0 +1,58 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+"""Batch compilation in a thread pool against one circuit at a time.
+
+Run with ``python -m benchmarks.batch``, ideally on free-threaded CPython 3.13
+(``python3.13t``), where the threads compile in parallel; with the GIL only the
+time spent in pytket itself overlaps.
+"""
+
+# ruff: noqa: T201
+
+import os
+import sys
+import time
+
+from pytket.phir.api import pytket_to_phir_program, pytket_to_phir_programs
+from pytket.phir.qtm_machine import QtmMachine
+from tests.test_utils import QasmFile, get_qasm_as_circuit
+
+COPIES = 8
+REPEATS = 3
+
+
+def main() -> None:
+    """Report serial and thread-pool compile times of the corpus for H1."""
+    circuits = [get_qasm_as_circuit(qasm_file) for qasm_file in QasmFile] * COPIES
+    workers = os.cpu_count() or 1
+    # only free-threaded builds can disable the GIL
+    gil = True
+    if sys.version_info >= (3, 13):
+        gil = sys._is_gil_enabled()  # noqa: SLF001
+
+    serial_time = parallel_time = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for circuit in circuits:
+            pytket_to_phir_program(circuit, QtmMachine.H1)
+        serial_time = min(serial_time, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pytket_to_phir_programs(circuits, QtmMachine.H1, max_workers=workers)
+        parallel_time = min(parallel_time, time.perf_counter() - start)
+
+    print(f"python:      {sys.version.split()[0]} (GIL {'on' if gil else 'off'})")
+    print(f"circuits:    {len(circuits)}")
+    print(f"serial:      {serial_time:.2f}s")
+    print(f"{workers} threads:  {parallel_time:.2f}s")
+    print(f"speedup:     {serial_time / parallel_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+"""Speed of emitting PHIR JSON from placed shards, as dicts or as fragments.
+
+Run with ``python -m benchmarks.emission``. Both paths are timed without
+validation, from already placed shards to the JSON text of the ops, on a large
+brickwork circuit.
+"""
+
+# ruff: noqa: T201
+
+import json
+import time
+from functools import partial
+from typing import TYPE_CHECKING
+
+from pytket.phir.phirgen import EmitProfile, FragmentEmitter, genphir_layers
+from pytket.phir.place_and_route import place_and_route
+from pytket.phir.sharding.sharder import Sharder
+from pytket.phir.validation import PhirValidator, ValidationLevel
+
+from .sharder import sq_cx_circuit
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pytket.phir.sharding.shard import Cost, Ordering, ShardLayer
+
+N_QUBITS = 50
+N_ROUNDS = 400
+REPEATS = 5
+
+
+def main() -> None:
+    """Report the emission time of both paths for each profile with comments."""
+    circuit = sq_cx_circuit(N_QUBITS, N_ROUNDS)
+    circuit.measure_all()
+    placed = place_and_route(Sharder(circuit).shard())
+    n_commands = len(circuit.get_commands())
+    print(f"commands:   {n_commands}")
+
+    for profile in (EmitProfile.commented, EmitProfile.compact):
+        comments = profile == EmitProfile.commented
+        dict_time = _best(partial(_emit_dicts, placed, comments=comments))
+        fragment_time = _best(partial(_emit_fragments, placed, comments=comments))
+        print(
+            f"{profile.value:<10}  dicts {dict_time * 1e3:7.1f}ms  "
+            f"fragments {fragment_time * 1e3:7.1f}ms  "
+            f"speedup {dict_time / fragment_time:4.1f}x"
+        )
+
+
+def _emit_dicts(
+    placed: "list[tuple[Ordering, ShardLayer, Cost]]", *, comments: bool
+) -> None:
+    for ops in genphir_layers(placed, machine_ops=False, comments=comments):
+        json.dumps(ops)
+
+
+def _emit_fragments(
+    placed: "list[tuple[Ordering, ShardLayer, Cost]]", *, comments: bool
+) -> None:
+    emitter = FragmentEmitter(PhirValidator(ValidationLevel.off), comments=comments)
+    for fragments in emitter.layers(placed, machine_ops=False):
+        ", ".join(fragments)
+
+
+def _best(func: "Callable[[], object]") -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    main()
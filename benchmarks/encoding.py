@@ -0,0 +1,72 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+"""Size and speed of the PHIR encodings on the test corpus.
+
+Run with ``python -m benchmarks.encoding``. Each encoding is compared with plain
+`json.dumps`; encodings whose optional dependencies are missing are skipped.
+"""
+
+# ruff: noqa: T201
+
+import json
+import time
+from itertools import product
+from typing import TYPE_CHECKING
+
+from pytket.phir.api import pytket_to_phir_program
+from pytket.phir.encoding import Compression, Encoding, decode_phir, encode_phir
+from pytket.phir.qtm_machine import QtmMachine
+from tests.test_utils import QasmFile, get_qasm_as_circuit
+
+if TYPE_CHECKING:
+    from pytket.phir.phirgen import JsonDict
+
+REPEATS = 5
+
+
+def main() -> None:
+    """Report total size and encode/decode time of each encoding on the corpus."""
+    programs = [
+        pytket_to_phir_program(get_qasm_as_circuit(qasm_file), QtmMachine.H1).phir
+        for qasm_file in QasmFile
+    ]
+    baseline = sum(len(json.dumps(phir)) for phir in programs)
+
+    print(f"{'encoding':<20} {'bytes':>10} {'ratio':>6} {'encode':>10} {'decode':>10}")
+    for encoding, compression in product(Encoding, Compression):
+        label = f"{encoding.value}+{compression.value}"
+        try:
+            size, encode_time, decode_time = _measure(programs, encoding, compression)
+        except ImportError as e:
+            print(f"{label:<20} skipped: {e}")
+            continue
+        print(
+            f"{label:<20} {size:>10,} "
+            f"{size / baseline:>6.2f} {encode_time * 1e3:>8.1f}ms "
+            f"{decode_time * 1e3:>8.1f}ms"
+        )
+
+
+def _measure(
+    programs: list["JsonDict"], encoding: Encoding, compression: Compression
+) -> tuple[int, float, float]:
+    encode_time = decode_time = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        encoded = [encode_phir(phir, encoding, compression) for phir in programs]
+        encode_time = min(encode_time, time.perf_counter() - start)
+        start = time.perf_counter()
+        for data in encoded:
+            decode_phir(data, encoding, compression)
+        decode_time = min(decode_time, time.perf_counter() - start)
+    return sum(len(data) for data in encoded), encode_time, decode_time
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+"""Ops and size saved by the peephole pass on the test corpus.
+
+Run with ``python -m benchmarks.peephole``. Programs are compiled with the compact
+profile, serially without a machine, in parallel for H1 and in parallel without a
+machine; circuits that cannot be converted in a mode are left out of it.
+"""
+
+# ruff: noqa: T201
+
+import logging
+
+from pytket.phir.api import CompileOptions, pytket_to_phir_program
+from pytket.phir.phirgen import EmitProfile
+from pytket.phir.qtm_machine import QtmMachine
+from tests.test_utils import QasmFile, get_qasm_as_circuit
+
+MODES: dict[str, tuple[QtmMachine | None, CompileOptions]] = {
+    "serial": (None, {}),
+    "H1": (QtmMachine.H1, {}),
+    "width 10": (None, {"parallel_width": 10}),
+}
+
+
+def main() -> None:
+    """Report the ops and bytes of each mode, without and with the pass."""
+    # circuits with gates PHIR does not support log their errors
+    logging.disable(logging.ERROR)
+    circuits = [get_qasm_as_circuit(qasm_file) for qasm_file in QasmFile]
+
+    print(f"{'mode':<10} {'ops':>15} {'saved':>7} {'bytes':>21} {'saved':>7}")
+    for mode, (qtm_machine, options) in MODES.items():
+        ops = [0, 0]
+        size = [0, 0]
+        for circuit in circuits:
+            try:
+                programs = [
+                    pytket_to_phir_program(
+                        circuit,
+                        qtm_machine,
+                        profile=EmitProfile.compact,
+                        peephole=peephole,
+                        **options,
+                    )
+                    for peephole in (False, True)
+                ]
+            except KeyError:
+                continue
+            for i, program in enumerate(programs):
+                ops[i] += program.num_ops
+                size[i] += len(program.to_json())
+        print(
+            f"{mode:<10} {ops[0]:>6,} -> {ops[1]:>5,} {1 - ops[1] / ops[0]:>7.1%} "
+            f"{size[0]:>9,} -> {size[1]:>8,} {1 - size[1] / size[0]:>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
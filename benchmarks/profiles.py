@@ -0,0 +1,55 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+"""Size and compile time of the PHIR emission profiles on the test corpus.
+
+Run with ``python -m benchmarks.profiles``. Sizes are of the PHIR JSON, plus the
+JSON of the source map for the source-mapped profile.
+"""
+
+# ruff: noqa: T201
+
+import json
+import time
+
+from pytket.phir.api import pytket_to_phir_program
+from pytket.phir.phirgen import EmitProfile
+from pytket.phir.qtm_machine import QtmMachine
+from tests.test_utils import QasmFile, get_qasm_as_circuit
+
+REPEATS = 3
+
+
+def main() -> None:
+    """Report total size and compile time of each profile on the corpus."""
+    circuits = [get_qasm_as_circuit(qasm_file) for qasm_file in QasmFile]
+
+    print(f"{'profile':<15} {'phir bytes':>12} {'map bytes':>10} {'compile':>10}")
+    for profile in EmitProfile:
+        compile_time = float("inf")
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            programs = [
+                pytket_to_phir_program(circuit, QtmMachine.H1, profile=profile)
+                for circuit in circuits
+            ]
+            compile_time = min(compile_time, time.perf_counter() - start)
+        size = sum(len(program.to_json()) for program in programs)
+        map_size = sum(
+            len(json.dumps(program.source_map))
+            for program in programs
+            if program.source_map is not None
+        )
+        print(
+            f"{profile.value:<15} {size:>12,} {map_size:>10,} "
+            f"{compile_time * 1e3:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
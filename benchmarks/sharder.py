@@ -0,0 +1,71 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+"""Sharder throughput on single-qubit + CX traffic.
+
+Run with ``python -m benchmarks.sharder``. The target is stated in commands per
+second of sharding work, i.e. excluding `Circuit.get_commands`, which is timed
+separately since it is bounded by pytket itself.
+"""
+
+# ruff: noqa: T201
+
+import sys
+import time
+from typing import TYPE_CHECKING
+
+from pytket.circuit import Circuit
+
+from pytket.phir.sharding.sharder import Sharder
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+TARGET_COMMANDS_PER_SECOND = 100_000
+N_QUBITS = 50
+N_ROUNDS = 400
+REPEATS = 5
+
+
+def sq_cx_circuit(n_qubits: int, n_rounds: int) -> Circuit:
+    """Brickwork of a layer of Rz on every qubit followed by a layer of CX."""
+    circuit = Circuit(n_qubits)
+    for r in range(n_rounds):
+        for q in range(n_qubits):
+            circuit.Rz(0.1, q)
+        for q in range(r % 2, n_qubits - 1, 2):
+            circuit.CX(q, q + 1)
+    return circuit
+
+
+def main() -> None:
+    """Report the sharding throughput and fail below the target."""
+    circuit = sq_cx_circuit(N_QUBITS, N_ROUNDS)
+    n_commands = len(circuit.get_commands())
+
+    get_commands_time = min(_timed(circuit.get_commands) for _ in range(REPEATS))
+    # the sharder adds rollup barriers to its circuit, so shard fresh copies
+    total_time = min(_timed(Sharder(circuit.copy()).shard) for _ in range(REPEATS))
+    shard_time = total_time - get_commands_time
+
+    print(f"commands:                {n_commands}")
+    print(f"get_commands:            {n_commands / get_commands_time:,.0f} cmd/s")
+    print(f"sharding:                {n_commands / shard_time:,.0f} cmd/s")
+    print(f"target:                  {TARGET_COMMANDS_PER_SECOND:,} cmd/s")
+    if n_commands / shard_time < TARGET_COMMANDS_PER_SECOND:
+        sys.exit("Sharder throughput below target")
+
+
+def _timed(fn: "Callable[[], object]") -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
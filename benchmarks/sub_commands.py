@@ -0,0 +1,78 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+"""Speed of grouping the sub-commands of wide single-qubit layers.
+
+Run with ``python -m benchmarks.sub_commands``. Each layer alternates Rz and
+PhasedX gates on every qubit, so the number of groups grows with the width; the
+time per sub-command should stay flat as the width grows.
+"""
+
+# ruff: noqa: T201
+
+import time
+from functools import partial
+from typing import TYPE_CHECKING
+
+from pytket.circuit import Circuit
+
+from pytket.phir.phirgen_parallel import process_sub_commands
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from pytket.circuit import Command
+    from pytket.unit_id import UnitID
+
+WIDTHS = (250, 1000, 4000)
+DEPTH = 8
+MAX_PARALLEL_SQ_GATES = 10
+REPEATS = 5
+
+
+def main() -> None:
+    """Report the grouping time for each width."""
+    for width in WIDTHS:
+        sub_commands = sq_sub_commands(width, DEPTH)
+        n_sub_commands = width * DEPTH
+        elapsed = _best(
+            partial(process_sub_commands, sub_commands, MAX_PARALLEL_SQ_GATES)
+        )
+        print(
+            f"qubits {width:>5}  sub-commands {n_sub_commands:>6}  "
+            f"{elapsed * 1e3:8.1f}ms  "
+            f"{elapsed / n_sub_commands * 1e6:6.2f}us per sub-command"
+        )
+
+
+def sq_sub_commands(width: int, depth: int) -> "dict[UnitID, list[Command]]":
+    """Alternating Rz and PhasedX gates on every qubit, keyed by qubit."""
+    circuit = Circuit(width)
+    for layer in range(depth):
+        for qubit in range(width):
+            if layer % 2:
+                circuit.PhasedX(0.5, 0.25, qubit)
+            else:
+                circuit.Rz(0.5, qubit)
+    sub_commands: dict[UnitID, list[Command]] = {q: [] for q in circuit.qubits}
+    for command in circuit.get_commands():
+        sub_commands[command.qubits[0]].append(command)
+    return sub_commands
+
+
+def _best(func: "Callable[[], object]") -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    main()
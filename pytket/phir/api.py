@@ -9,40 +9,67 @@
 # mypy: disable-error-code="misc"
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from tempfile import NamedTemporaryFile
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, TypedDict
 
 from pytket.qasm.qasm import circuit_from_qasm_str, circuit_from_qasm_wasm
-from rich import print  # noqa: A004
+from rich import print, print_json  # noqa: A004
 
-from phir.model import PHIRModel
-
-from .phirgen import WORDSIZE, genphir
-from .phirgen_parallel import genphir_parallel
-from .place_and_route import place_and_route
+from .machine import generic_machine
+from .packing import PackingStats, SqPacking
+from .phirgen import WORDSIZE, EmitProfile, genphir_program
+from .phirgen_parallel import genphir_parallel_program
+from .place_and_route import iter_place_and_route
+from .program import LayerInfo, PhirProgram
 from .qtm_machine import QTM_MACHINES_MAP, QtmMachine
 from .rebasing.rebaser import rebase_to_qtm_machine
 from .sharding.sharder import Sharder
+from .timeline import Timeline
+from .validation import ValidationLevel
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
     from pytket.circuit import Circuit
+    from typing_extensions import Unpack
 
     from .machine import Machine
+    from .sharding.shard import Cost, Ordering, ShardLayer
 
 logger = logging.getLogger(__name__)
 
 
-def pytket_to_phir(circuit: "Circuit", qtm_machine: QtmMachine | None = None) -> str:
-    """Converts a pytket circuit into its PHIR representation.
-
-    This can optionally include rebasing against a Quantinuum machine architecture,
-    and control of the TKET optimization level.
+def pytket_to_phir_program(  # noqa: PLR0913
+    circuit: "Circuit",
+    qtm_machine: QtmMachine | None = None,
+    *,
+    conditional_sub_commands: bool = False,
+    overlap_classical: bool = False,
+    defer_measurements: bool = False,
+    validation: ValidationLevel = ValidationLevel.full,
+    profile: EmitProfile = EmitProfile.commented,
+    optimize_classical: bool = False,
+    fuse_range_predicates: bool = False,
+    fuse_sub_commands: bool = False,
+    sq_packing: SqPacking = SqPacking.greedy,
+    angle_tolerance: float | None = None,
+    timeline_metadata: bool = False,
+    parallel_width: int | None = None,
+    peephole: bool = False,
+) -> PhirProgram:
+    """Compiles a pytket circuit into a PHIR program object.
 
-    :param circuit: Circuit object to be converted
-    :param qtm_machine: (Optional) Quantinuum machine architecture to rebase against
+    Unlike `pytket_to_phir`, the program is not serialized, so in-process consumers
+    can use the PHIR dict directly; call `to_json` or `to_bytes` when needed. The
+    options are the same as for `pytket_to_phir`.
 
     Returns:
-        PHIR JSON as a str
+        the compiled PhirProgram, with per-layer statistics, with the source map
+        when the profile is `EmitProfile.source_mapped`, with the packing
+        statistics when it has parallel gating, and with the estimated timeline
+        when it has parallel gating on a machine
     """
     logger.info("Starting phir conversion process for circuit %s", circuit)
     machine: Machine | None = None
@@ -52,25 +79,212 @@ def pytket_to_phir(circuit: "Circuit", qtm_machine: QtmMachine | None = None) ->
         machine = QTM_MACHINES_MAP.get(qtm_machine)
     else:
         machine = None
+    # without a machine, gates are only grouped, with no placement or timings
+    parallel_machine = machine
+    if machine is None and parallel_width is not None:
+        parallel_machine = generic_machine(parallel_width)
 
     logger.debug("Sharding input circuit...")
-    shards = Sharder(circuit).shard()
+    shards = Sharder(
+        circuit,
+        conditional_sub_commands=conditional_sub_commands,
+        fuse_range_predicates=fuse_range_predicates,
+        fuse_sub_commands=fuse_sub_commands,
+    ).shard()
 
     if machine:
         # Only print message if a machine object is passed
         # Otherwise, placement and routing are functionally skipped
         # The function is called, but the output is just filled with 0s
         logger.debug("Performing placement and routing...")
-    placed = place_and_route(shards, machine)
+    layers: list[LayerInfo] = []
+    source_map: dict[int, str] | None = (
+        {} if profile == EmitProfile.source_mapped else None
+    )
+    placed = _record_layers(
+        iter_place_and_route(
+            shards,
+            machine,
+            overlap_classical=overlap_classical,
+            defer_measurements=defer_measurements,
+        ),
+        layers,
+    )
     # safety check: never run with parallelization on a 1 qubit circuit
-    if machine and len(circuit.qubits) > 1:
-        phir_json = genphir_parallel(placed, circuit, machine)
+    packing: PackingStats | None = None
+    timeline: Timeline | None = None
+    if parallel_machine and len(circuit.qubits) > 1:
+        packing = PackingStats()
+        timeline = Timeline() if machine else None
+        phir = genphir_parallel_program(
+            placed,
+            circuit,
+            parallel_machine,
+            machine_ops=bool(machine),
+            validation=validation,
+            profile=profile,
+            source_map=source_map,
+            optimize_classical=optimize_classical,
+            sq_packing=sq_packing,
+            packing_stats=packing,
+            angle_tolerance=angle_tolerance,
+            timeline=timeline,
+            peephole=peephole,
+        )
+        if timeline and timeline_metadata:
+            phir["metadata"]["timeline"] = timeline.to_metadata()
     else:
-        phir_json = genphir(placed, circuit, machine_ops=bool(machine))
+        phir = genphir_program(
+            placed,
+            circuit,
+            machine_ops=bool(machine),
+            validation=validation,
+            profile=profile,
+            source_map=source_map,
+            optimize_classical=optimize_classical,
+            peephole=peephole,
+        )
     if logger.getEffectiveLevel() <= logging.INFO:
+        # already validated during generation, so just pretty-print the JSON
         print("PHIR JSON:")
-        print(PHIRModel.model_validate_json(phir_json))
-    return phir_json
+        print_json(data=phir)
+    return PhirProgram(phir, layers, source_map, packing, timeline)
+
+
+def _record_layers(
+    placed: "Iterable[tuple[Ordering, ShardLayer, Cost]]", layers: list[LayerInfo]
+) -> "Iterator[tuple[Ordering, ShardLayer, Cost]]":
+    """Pass placed layers through, recording a summary of each in `layers`."""
+    for order, shard_layer, cost in placed:
+        layers.append(LayerInfo(len(shard_layer), cost))
+        yield order, shard_layer, cost
+
+
+def pytket_to_phir(  # noqa: PLR0913
+    circuit: "Circuit",
+    qtm_machine: QtmMachine | None = None,
+    *,
+    conditional_sub_commands: bool = False,
+    overlap_classical: bool = False,
+    defer_measurements: bool = False,
+    validation: ValidationLevel = ValidationLevel.full,
+    profile: EmitProfile = EmitProfile.commented,
+    optimize_classical: bool = False,
+    fuse_range_predicates: bool = False,
+    fuse_sub_commands: bool = False,
+    sq_packing: SqPacking = SqPacking.greedy,
+    angle_tolerance: float | None = None,
+    timeline_metadata: bool = False,
+    parallel_width: int | None = None,
+    peephole: bool = False,
+) -> str:
+    """Converts a pytket circuit into its PHIR representation.
+
+    This can optionally include rebasing against a Quantinuum machine architecture,
+    and control of the TKET optimization level.
+
+    :param circuit: Circuit object to be converted
+    :param qtm_machine: (Optional) Quantinuum machine architecture to rebase against
+    :param conditional_sub_commands: (Optional) roll conditional single-qubit gates
+        up as sub-commands instead of giving each its own shard
+    :param overlap_classical: (Optional) schedule qubit-free shards into the
+        quantum layers their dependencies are in, instead of adding extra layers
+    :param defer_measurements: (Optional) move measurements without classical
+        readers, and resets, to later layers so that they are batched together
+    :param validation: (Optional) how much of the generated PHIR to validate, all
+        of it by default
+    :param profile: (Optional) what to include besides the ops, a comment before
+        each op by default; see `EmitProfile`
+    :param optimize_classical: (Optional) fold constants, simplify identities and
+        hoist repeated sub-expressions of classical operations, see
+        `ClassicalOptimizer`
+    :param fuse_range_predicates: (Optional) test registers directly in the
+        conditions of Conditionals instead of through the scratch bits written by
+        range predicates, which are then left unwritten; see
+        `Sharder.fusable_range_predicates`
+    :param fuse_sub_commands: (Optional) merge consecutive single-qubit rotations
+        and drop identities, without rebasing; see `fuse_sq_gates`
+    :param sq_packing: (Optional) how single-qubit sub-commands are packed into
+        parallel groups, greedily by default; see `SqPacking`
+    :param angle_tolerance: (Optional) with parallel gating, group gates whose
+        angles are equal modulo 2π or within this tolerance, and drop rotations by
+        zero; see `canonical_angles`
+    :param timeline_metadata: (Optional) with a machine, add the estimated
+        timeline of the program to the PHIR metadata, see `Timeline`
+    :param parallel_width: (Optional) without a machine, still group gates in
+        parallel, up to this many single-qubit or half as many two-qubit gates
+        per group, with no placement and no machine ops; see `generic_machine`
+    :param peephole: (Optional) merge Transports, drop no-ops, coalesce adjacent
+        qops of the same gate and angles and flatten trivial blocks in the
+        generated ops; see `PeepholeOptimizer`
+
+    Returns:
+        PHIR JSON as a str
+    """
+    return pytket_to_phir_program(
+        circuit,
+        qtm_machine,
+        conditional_sub_commands=conditional_sub_commands,
+        overlap_classical=overlap_classical,
+        defer_measurements=defer_measurements,
+        validation=validation,
+        profile=profile,
+        optimize_classical=optimize_classical,
+        fuse_range_predicates=fuse_range_predicates,
+        fuse_sub_commands=fuse_sub_commands,
+        sq_packing=sq_packing,
+        angle_tolerance=angle_tolerance,
+        timeline_metadata=timeline_metadata,
+        parallel_width=parallel_width,
+        peephole=peephole,
+    ).to_json()
+
+
+class CompileOptions(TypedDict, total=False):
+    """Options of `pytket_to_phir_program`, see `pytket_to_phir` for details."""
+
+    conditional_sub_commands: bool
+    overlap_classical: bool
+    defer_measurements: bool
+    validation: ValidationLevel
+    profile: EmitProfile
+    optimize_classical: bool
+    fuse_range_predicates: bool
+    fuse_sub_commands: bool
+    sq_packing: SqPacking
+    angle_tolerance: float | None
+    timeline_metadata: bool
+    parallel_width: int | None
+    peephole: bool
+
+
+def pytket_to_phir_programs(
+    circuits: "Iterable[Circuit]",
+    qtm_machine: QtmMachine | None = None,
+    *,
+    max_workers: int | None = None,
+    **options: "Unpack[CompileOptions]",
+) -> list[PhirProgram]:
+    """Compiles a batch of pytket circuits into PHIR programs in a thread pool.
+
+    Compilation keeps no shared mutable state, so the circuits are compiled
+    concurrently. They run in parallel on free-threaded CPython; with the GIL the
+    speedup is limited to the time spent in pytket itself.
+
+    :param circuits: Circuit objects to be converted
+    :param qtm_machine: (Optional) Quantinuum machine architecture to rebase against
+    :param max_workers: (Optional) number of threads, as for `ThreadPoolExecutor`
+    :param options: (Optional) options applied to every circuit, as for
+        `pytket_to_phir`
+
+    Returns:
+        the compiled programs, in the order of `circuits`
+    """
+    compile_circuit = partial(
+        pytket_to_phir_program, qtm_machine=qtm_machine, **options
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(compile_circuit, circuits))
 
 
 def qasm_to_phir(
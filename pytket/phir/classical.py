@@ -0,0 +1,307 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+import operator
+from collections import Counter
+from typing import TYPE_CHECKING, TypeAlias
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable
+
+    from .phirgen import JsonDict
+
+# a classical expression: a constant, a register, a bit or a nested cop
+Expr: TypeAlias = "int | str | list[str | int] | JsonDict"
+
+# prefix of the registers holding hoisted common sub-expressions
+TEMP_PREFIX = "tk_CSE_"
+
+BINARY_COPS: dict[str, "Callable[[int, int], int]"] = {
+    "&": operator.and_,
+    "|": operator.or_,
+    "^": operator.xor,
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.floordiv,
+    "<<": operator.lshift,
+    ">>": operator.rshift,
+    "**": operator.pow,
+    "==": lambda a, b: int(a == b),
+    "!=": lambda a, b: int(a != b),
+    "<": lambda a, b: int(a < b),
+    ">": lambda a, b: int(a > b),
+    "<=": lambda a, b: int(a <= b),
+    ">=": lambda a, b: int(a >= b),
+}
+# x op c == x, and c op x == x, for a constant c; -1 is all ones, i.e. ~0
+RIGHT_IDENTITIES = {"^": 0, "|": 0, "+": 0, "-": 0, "<<": 0, ">>": 0, "*": 1}
+RIGHT_IDENTITIES |= {"/": 1, "**": 1, "&": -1}
+LEFT_IDENTITIES = {"^": 0, "|": 0, "+": 0, "*": 1, "&": -1}
+# x op c == c op x == c for a constant c
+ABSORBING = {"&": 0, "*": 0, "|": -1}
+# x op x, for cops whose result does not depend on x; None means x itself
+SELF_RESULTS: dict[str, int | None] = {
+    "^": 0,
+    "-": 0,
+    "&": None,
+    "|": None,
+    "==": 1,
+    "!=": 0,
+    "<=": 1,
+    ">=": 1,
+    "<": 0,
+    ">": 0,
+}
+COMPARISONS = frozenset({"==", "!=", "<", ">", "<=", ">="})
+
+
+class ClassicalOptimizer:
+    """Simplify the classical expressions of PHIR ops.
+
+    Each assignment and if-block condition is rewritten bottom-up:
+
+    - operations on constants are folded, as long as the result does not depend
+      on the width of the variables, i.e. it is a small non-negative integer;
+    - identities are simplified, e.g. `x ^ 0`, `x & ~0`, `x * 1` and `x | x` to
+      `x`, `x & 0` and `x ^ x` to `0`, and `b == 1` to `b` for a bit `b` nested
+      in a larger condition;
+    - assignments left copying a variable to itself are dropped, as are if blocks
+      left empty, and if blocks whose condition folds to a constant are replaced
+      by the branch taken;
+    - sub-expressions repeated within an assignment are hoisted into temporary
+      registers, `tk_CSE_0`, `tk_CSE_1`, ..., assigned just before it, when that
+      saves evaluating at least one operation.
+
+    The temporaries are reused across assignments, and each is declared as a full
+    word at the top level, before the first op that uses it.
+    """
+
+    def __init__(self, word_size: int) -> None:
+        """Create an optimizer.
+
+        Args:
+            word_size: width of the classical registers, see `WORDSIZE`
+        """
+        self.word_size = word_size
+        self._num_declared = 0
+        self._num_used = 0
+
+    def optimize_ops(self, ops: list["JsonDict"]) -> list["JsonDict"]:
+        """Optimize the classical expressions of top-level ops, e.g. of a layer."""
+        optimized: list[JsonDict] = []
+        for op in ops:
+            new_ops = self._optimize_op(op)
+            optimized.extend(
+                {
+                    "data": "cvar_define",
+                    "data_type": f"i{self.word_size}",
+                    "variable": f"{TEMP_PREFIX}{i}",
+                    "size": self.word_size,
+                }
+                for i in range(self._num_declared, self._num_used)
+            )
+            self._num_declared = self._num_used
+            optimized.extend(new_ops)
+        return optimized
+
+    def fold(self, expr: Expr) -> Expr:
+        """Fold constants and simplify identities in an expression, bottom-up."""
+        if not isinstance(expr, dict) or "cop" not in expr:
+            return expr
+        args = [self.fold(arg) for arg in expr["args"]]
+        folded = self._fold_cop(expr["cop"], args, nested=True)
+        return {**expr, "args": args} if folded is None else folded
+
+    def _optimize_op(self, op: "JsonDict") -> list["JsonDict"]:
+        if op.get("cop") == "=":
+            return self._optimize_assign(op)
+        match op.get("block"):
+            case "if":
+                return self._optimize_if(op)
+            case "sequence":
+                ops = self._optimize_list(op["ops"])
+                return [{**op, "ops": ops}] if ops else []
+        return [op]
+
+    def _optimize_list(self, ops: list["JsonDict"]) -> list["JsonDict"]:
+        return [new_op for op in ops for new_op in self._optimize_op(op)]
+
+    def _optimize_assign(self, op: "JsonDict") -> list["JsonDict"]:
+        returns = op["returns"]
+        args = [self.fold(arg) for arg in op["args"]]
+        if returns == args:
+            # every variable is assigned its own value
+            return []
+        if len(args) != 1:
+            # later args may read variables returned by earlier ones
+            return [{**op, "args": args}]
+        temps, args = hoist_subexprs(args)
+        self._num_used = max(self._num_used, len(temps))
+        return [
+            *({"cop": "=", "returns": [name], "args": [expr]} for name, expr in temps),
+            {**op, "args": args},
+        ]
+
+    def _optimize_if(self, op: "JsonDict") -> list["JsonDict"]:
+        condition = op["condition"]
+        args = [self.fold(arg) for arg in condition["args"]]
+        folded = self._fold_cop(condition["cop"], args, nested=False)
+        if isinstance(folded, int):
+            branch = "true_branch" if folded else "false_branch"
+            return self._optimize_list(op.get(branch, []))
+        if not isinstance(folded, dict):
+            # keep the condition a cop
+            folded = {**condition, "args": args}
+        new_op = {
+            **op,
+            "condition": folded,
+            "true_branch": self._optimize_list(op["true_branch"]),
+        }
+        if "false_branch" in op:
+            new_op["false_branch"] = self._optimize_list(op["false_branch"])
+        if not new_op["true_branch"] and not new_op.get("false_branch"):
+            # nothing left to do either way
+            return []
+        return [new_op]
+
+    def _fold_cop(self, cop: str, args: list[Expr], *, nested: bool) -> "Expr | None":
+        """Simplify a cop whose args are already simplified, None if it cannot be.
+
+        Args:
+            cop: the operation
+            args: its simplified arguments
+            nested: whether the cop is nested in a larger expression, so that it
+                can be simplified to a bit
+        """
+        match args:
+            case [0] if cop == "~":
+                return -1
+            case [{"cop": "~", "args": [arg]}] if cop == "~":
+                inner: Expr = arg
+                return inner
+            case [int() as lhs, int() as rhs] if cop in BINARY_COPS:
+                return self._evaluate(cop, lhs, rhs)
+            case [lhs, rhs]:
+                return _simplify(cop, lhs, rhs, nested=nested)
+        return None
+
+    def _evaluate(self, cop: str, lhs: int, rhs: int) -> int | None:
+        if lhs < 0 or rhs < 0:
+            return None
+        if (cop == "/" and rhs == 0) or (cop in {"<<", "**"} and rhs >= self.word_size):
+            return None
+        result = BINARY_COPS[cop](lhs, rhs)
+        # the same in any width, signed or not
+        return result if 0 <= result < 2 ** (self.word_size - 1) else None
+
+
+def hoist_subexprs(
+    exprs: list[Expr],
+) -> tuple[list[tuple[str, Expr]], list[Expr]]:
+    """Hoist sub-expressions repeated across `exprs` into temporaries.
+
+    Returns:
+        the temporaries with their expressions, in evaluation order, and the
+        expressions rewritten to use them
+    """
+    temps: list[tuple[str, Expr]] = []
+    while True:
+        counts: Counter[Hashable] = Counter()
+        sizes: dict[Hashable, int] = {}
+        nodes: dict[Hashable, Expr] = {}
+        for expr in [*exprs, *(temp for _, temp in temps)]:
+            _count_subexprs(expr, counts, sizes, nodes)
+        # hoisting a sub-expression of n ops used k times saves (k - 1) * n op
+        # evaluations at the cost of one assignment
+        repeated = [
+            key
+            for key, count in counts.items()
+            if (count - 1) * sizes[key] >= 2  # noqa: PLR2004
+        ]
+        if not repeated:
+            return temps, exprs
+        # the largest first, so a temporary never contains a later one
+        key = max(repeated, key=sizes.__getitem__)
+        name = f"{TEMP_PREFIX}{len(temps)}"
+        exprs = [_replace(expr, key, name) for expr in exprs]
+        temps = [(temp, _replace(expr, key, name)) for temp, expr in temps]
+        temps.insert(0, (name, nodes[key]))
+
+
+def _simplify(cop: str, lhs: Expr, rhs: Expr, *, nested: bool) -> "Expr | None":  # noqa: PLR0911
+    if isinstance(rhs, int) and RIGHT_IDENTITIES.get(cop) == rhs:
+        return lhs
+    if isinstance(lhs, int) and LEFT_IDENTITIES.get(cop) == lhs:
+        return rhs
+    absorbing = ABSORBING.get(cop)
+    if absorbing is not None and absorbing in {_expr_key(lhs), _expr_key(rhs)}:
+        return absorbing
+    if lhs == rhs and cop in SELF_RESULTS:
+        result = SELF_RESULTS[cop]
+        return lhs if result is None else result
+    if nested and _is_bit_valued(lhs):
+        # a 0 or 1 value
+        match cop, rhs:
+            case ("&" | "==", 1) | ("|" | "!=", 0):
+                return lhs
+            case "|", 1:
+                return 1
+    return None
+
+
+def _is_bit_valued(expr: Expr) -> bool:
+    match expr:
+        case 0 | 1:
+            return True
+        case [str(), int()]:
+            return True
+        case {"cop": cop, "args": args}:
+            return cop in COMPARISONS or (
+                cop in {"&", "|", "^"} and all(_is_bit_valued(arg) for arg in args)
+            )
+    return False
+
+
+def _expr_key(expr: Expr) -> "Hashable":
+    match expr:
+        case {"cop": cop, "args": args}:
+            return (cop, tuple(_expr_key(arg) for arg in args))
+        case list():
+            return tuple(expr)
+        case int() | str():
+            return expr
+    msg = f"Not a classical expression: {expr}"
+    raise TypeError(msg)
+
+
+def _count_subexprs(
+    expr: Expr,
+    counts: "Counter[Hashable]",
+    sizes: dict["Hashable", int],
+    nodes: dict["Hashable", Expr],
+) -> int:
+    """Count the cops in `expr` by structure, returning the size of `expr`."""
+    if not isinstance(expr, dict) or "cop" not in expr:
+        return 0
+    size = 1 + sum(_count_subexprs(arg, counts, sizes, nodes) for arg in expr["args"])
+    key = _expr_key(expr)
+    counts[key] += 1
+    sizes[key] = size
+    nodes[key] = expr
+    return size
+
+
+def _replace(expr: Expr, key: "Hashable", name: str) -> Expr:
+    if not isinstance(expr, dict) or "cop" not in expr:
+        return expr
+    if _expr_key(expr) == key:
+        return name
+    return {**expr, "args": [_replace(arg, key, name) for arg in expr["args"]]}
@@ -22,7 +22,7 @@ from pytket.qasm.qasm import (
 
 from pytket.phir.phirgen import WORDSIZE
 
-from .api import pytket_to_phir
+from .api import pytket_to_phir_program
 from .qtm_machine import QtmMachine
 
 
@@ -74,12 +74,13 @@ def main() -> None:
 
         if args.verbose:
             logging.basicConfig(level=logging.INFO)
-        phir = pytket_to_phir(circuit, machine)
+        # hand the PHIR dict to PECOS as is, without a JSON round trip
+        program = pytket_to_phir_program(circuit, machine)
 
         print("\nPECOS results:")
         print(
             HybridEngine(qsim="state-vector").run(
-                program=phir,
+                program=program.phir,
                 shots=10,
                 foreign_object=wasm_pecos_obj if args.wasm_file else None,
             )
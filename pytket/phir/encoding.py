@@ -0,0 +1,220 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+import gzip
+import io
+import json
+import struct
+from enum import Enum
+from importlib import import_module
+from typing import TYPE_CHECKING, BinaryIO, TextIO
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+    from .phirgen import JsonDict
+
+# msgpack extension type of a [name, index] pair, e.g. a bit, with the name in the
+# string table; the payload is both numbers in 1, 2 or 4 bytes each
+NAME_INDEX_EXT = 1
+NAME_INDEX_FORMATS = {2: ">BB", 4: ">HH", 8: ">II"}
+
+
+class Encoding(Enum):
+    """Serialization format of a PHIR program.
+
+    Every encoding round-trips losslessly: decoding gives the same program as
+    `json.loads` of the PHIR JSON. msgpack and zstd need the optional dependencies
+    from `pip install pytket-phir[encodings]`; JSON and gzip are always available.
+    """
+
+    json = "json"
+    """PHIR JSON, as UTF-8."""
+    msgpack = "msgpack"
+    """msgpack, with every [name, index] pair stored as an index into a table of
+    names, so that register names are written once."""
+
+
+class Compression(Enum):
+    """Compression applied on top of the encoding."""
+
+    none = "none"
+    gzip = "gzip"
+    zstd = "zstd"
+
+
+def encode_phir(
+    phir: "JsonDict",
+    encoding: Encoding = Encoding.json,
+    compression: Compression = Compression.none,
+) -> bytes:
+    """Encode a PHIR program.
+
+    Args:
+        phir: the PHIR program
+        encoding: serialization format
+        compression: compression applied to the serialized program
+    """
+    match encoding:
+        case Encoding.json:
+            data = json.dumps(phir).encode()
+        case Encoding.msgpack:
+            data = _msgpack_encode(phir)
+    return compress(data, compression)
+
+
+def decode_phir(
+    data: bytes,
+    encoding: Encoding = Encoding.json,
+    compression: Compression = Compression.none,
+) -> "JsonDict":
+    """Decode a PHIR program encoded by `encode_phir`.
+
+    Args:
+        data: the encoded program
+        encoding: serialization format it was encoded with
+        compression: compression it was encoded with
+    """
+    data = decompress(data, compression)
+    match encoding:
+        case Encoding.json:
+            phir: JsonDict = json.loads(data)
+        case Encoding.msgpack:
+            phir = _msgpack_decode(data)
+    return phir
+
+
+def compress(data: bytes, compression: Compression) -> bytes:
+    """Compress bytes in one go."""
+    match compression:
+        case Compression.none:
+            return data
+        case Compression.gzip:
+            return gzip.compress(data)
+        case Compression.zstd:
+            compressed: bytes = (
+                _import_optional("zstandard").ZstdCompressor().compress(data)
+            )
+            return compressed
+
+
+def decompress(data: bytes, compression: Compression) -> bytes:
+    """Decompress bytes compressed by `compress`."""
+    match compression:
+        case Compression.none:
+            return data
+        case Compression.gzip:
+            return gzip.decompress(data)
+        case Compression.zstd:
+            decompressed: bytes = (
+                _import_optional("zstandard").ZstdDecompressor().decompress(data)
+            )
+            return decompressed
+
+
+def compressed_writer(raw: BinaryIO, compression: Compression) -> TextIO:
+    """Wrap a binary stream in a text stream that compresses as it is written.
+
+    The result can be passed as `out` to `genphir` or `genphir_parallel` to stream
+    compressed PHIR JSON. Closing it finishes the compressed data and, with no
+    compression only, closes `raw`.
+
+    Args:
+        raw: binary stream to write the compressed data to
+        compression: compression to apply
+    """
+    match compression:
+        case Compression.none:
+            return io.TextIOWrapper(raw, encoding="utf-8")
+        case Compression.gzip:
+            return io.TextIOWrapper(
+                gzip.GzipFile(fileobj=raw, mode="wb"), encoding="utf-8"
+            )
+        case Compression.zstd:
+            zstandard = _import_optional("zstandard")
+            return io.TextIOWrapper(
+                zstandard.ZstdCompressor().stream_writer(raw, closefd=False),
+                encoding="utf-8",
+            )
+
+
+def compressed_reader(raw: BinaryIO, compression: Compression) -> TextIO:
+    """Wrap a binary stream in a text stream that decompresses as it is read.
+
+    Args:
+        raw: binary stream to read the compressed data from
+        compression: compression that was applied
+    """
+    match compression:
+        case Compression.none:
+            return io.TextIOWrapper(raw, encoding="utf-8")
+        case Compression.gzip:
+            return io.TextIOWrapper(
+                gzip.GzipFile(fileobj=raw, mode="rb"), encoding="utf-8"
+            )
+        case Compression.zstd:
+            zstandard = _import_optional("zstandard")
+            return io.TextIOWrapper(
+                zstandard.ZstdDecompressor().stream_reader(raw), encoding="utf-8"
+            )
+
+
+def _msgpack_encode(phir: "JsonDict") -> bytes:
+    msgpack = _import_optional("msgpack")
+    names: dict[str, int] = {}
+
+    def pack_names(value: object) -> object:
+        match value:
+            case dict():
+                return {key: pack_names(item) for key, item in value.items()}
+            case [str() as name, int() as index] if (
+                type(index) is int and 0 <= index < 2**32
+            ):
+                name_id = names.setdefault(name, len(names))
+                largest = max(name_id, index)
+                fmt = next(
+                    fmt
+                    for size, fmt in NAME_INDEX_FORMATS.items()
+                    if largest < 1 << (4 * size)
+                )
+                return msgpack.ExtType(NAME_INDEX_EXT, struct.pack(fmt, name_id, index))
+            case list() | tuple():
+                return [pack_names(item) for item in value]
+            case _:
+                return value
+
+    # the table is only complete once the program is packed, so nest the program
+    program = msgpack.packb(pack_names(phir))
+    data: bytes = msgpack.packb([list(names), program])
+    return data
+
+
+def _msgpack_decode(data: bytes) -> "JsonDict":
+    msgpack = _import_optional("msgpack")
+    names, program = msgpack.unpackb(data)
+
+    def unpack_names(code: int, ext_data: bytes) -> object:
+        if code != NAME_INDEX_EXT:
+            return msgpack.ExtType(code, ext_data)
+        name_id, index = struct.unpack(NAME_INDEX_FORMATS[len(ext_data)], ext_data)
+        return [names[name_id], index]
+
+    phir: JsonDict = msgpack.unpackb(program, ext_hook=unpack_names)
+    return phir
+
+
+def _import_optional(name: str) -> "ModuleType":
+    try:
+        return import_module(name)
+    except ImportError as e:
+        msg = (
+            f"{name} is required for this encoding: pip install pytket-phir[encodings]"
+        )
+        raise ImportError(msg) from e
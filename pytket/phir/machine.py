@@ -9,8 +9,35 @@
 from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
+from pytket.circuit import OpType
+
 if TYPE_CHECKING:
-    from pytket.circuit import OpType
+    from collections.abc import Sequence
+
+# the single-qubit gates a machine runs in parallel groups unless told otherwise
+DEFAULT_PARALLEL_SQ_GATES = (OpType.Rz, OpType.PhasedX)
+
+# every single-qubit gate with a PHIR equivalent, native ones first, so that
+# circuits that are not rebased get parallel groups too
+ALL_PARALLEL_SQ_GATES = (
+    OpType.Rz,
+    OpType.PhasedX,
+    OpType.Rx,
+    OpType.Ry,
+    OpType.U1,
+    OpType.H,
+    OpType.X,
+    OpType.Y,
+    OpType.Z,
+    OpType.S,
+    OpType.Sdg,
+    OpType.T,
+    OpType.Tdg,
+    OpType.SX,
+    OpType.SXdg,
+    OpType.V,
+    OpType.Vdg,
+)
 
 
 @dataclass
@@ -38,6 +65,8 @@ class Machine:
         gateset: "set[OpType]",
         tq_options: set[int],
         timings: MachineTimings,
+        *,
+        parallel_sq_gates: "Sequence[OpType]" = DEFAULT_PARALLEL_SQ_GATES,
     ):
         """Create Machine object.
 
@@ -46,10 +75,14 @@ class Machine:
             gateset: set of supported gates
             tq_options: options for where to perform tq gates
             timings: gate times
+            parallel_sq_gates: single-qubit gate types that can run in parallel
+                groups, each type in groups of its own; the order breaks ties in
+                the order of groups
         """
         self.size = size
         self.gateset = gateset
         self.tq_options = tq_options
+        self.parallel_sq_gates = tuple(parallel_sq_gates)
         self.sq_options: set[int] = set()
         self.tq_time = timings.tq_time
         self.sq_time = timings.sq_time
@@ -59,3 +92,28 @@ class Machine:
         for i in self.tq_options:
             self.sq_options.add(i)
             self.sq_options.add(i + 1)
+
+
+def generic_machine(width: int) -> Machine:
+    """A machine model for parallel gating without a target machine.
+
+    It only limits how many gates run in parallel: up to `width` single-qubit
+    gates, of any type with a PHIR equivalent, or `width // 2` two-qubit gates.
+    It has no gate times or transport costs, so place its layers without a
+    machine and emit them without machine ops.
+
+    Args:
+        width: the maximum number of single-qubit gates in a parallel group
+    """
+    if width < 1:
+        msg = f"Parallel width must be positive, got {width}"
+        raise ValueError(msg)
+    return Machine(
+        size=2 * width,
+        gateset=set(ALL_PARALLEL_SQ_GATES),
+        tq_options=set(range(0, 2 * width, 2)),
+        timings=MachineTimings(
+            tq_time=0.0, sq_time=0.0, qb_swap_time=0.0, meas_prep_time=0.0
+        ),
+        parallel_sq_gates=ALL_PARALLEL_SQ_GATES,
+    )
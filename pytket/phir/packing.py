@@ -0,0 +1,222 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING
+
+from .machine import DEFAULT_PARALLEL_SQ_GATES
+from .phirgen import tket_gate_to_phir
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+    from pytket.circuit import Command, OpType
+    from pytket.unit_id import UnitID
+
+    from .machine import Machine
+
+# states kept after each round of the search, see `pack_sub_commands`
+BEAM_WIDTH = 64
+
+State = tuple[int, ...]
+
+
+class SqPacking(Enum):
+    """How the single-qubit sub-commands of a shard are packed into parallel rounds."""
+
+    greedy = "greedy"
+    """In one pass, each sub-command joins the latest round of its gate type that
+    keeps the order of its qubit, see `process_sub_commands`."""
+    optimal = "optimal"
+    """The fewest rounds, found by a search over the rounds, see
+    `pack_sub_commands`; never more than greedy packing."""
+
+
+@dataclass
+class PackingStats:
+    """Rounds of parallel single-qubit gates, accumulated over a program.
+
+    rounds: rounds of sub-commands emitted
+    greedy_rounds: rounds greedy packing takes for the same sub-commands
+    rounds_by_gate: rounds emitted per PHIR gate, "other" for the sub-commands that
+        cannot run in parallel
+    sq_time_saved: estimated single-qubit gate time saved over greedy packing,
+        one `Machine.sq_time` per round
+    """
+
+    rounds: int = 0
+    greedy_rounds: int = 0
+    rounds_by_gate: dict[str, int] = field(default_factory=dict)
+    sq_time_saved: float = 0.0
+
+    def record(
+        self,
+        rounds: "Iterable[list[Command]]",
+        greedy_rounds: int,
+        machine: "Machine",
+    ) -> None:
+        """Add the rounds of one shard's sub-commands.
+
+        Args:
+            rounds: the rounds emitted
+            greedy_rounds: the number of rounds greedy packing takes
+            machine: the machine the rounds run on
+        """
+        num_rounds = 0
+        for cmds in rounds:
+            op_type = cmds[0].op.type
+            gate = (
+                tket_gate_to_phir[op_type]
+                if op_type in machine.parallel_sq_gates
+                else "other"
+            )
+            self.rounds_by_gate[gate] = self.rounds_by_gate.get(gate, 0) + 1
+            num_rounds += 1
+        self.rounds += num_rounds
+        self.greedy_rounds += greedy_rounds
+        self.sq_time_saved += (greedy_rounds - num_rounds) * machine.sq_time
+
+
+def pack_sub_commands(
+    sub_commands: "dict[UnitID, list[Command]]",
+    max_parallel_sq_gates: int,
+    parallel_sq_gates: "Sequence[OpType]" = DEFAULT_PARALLEL_SQ_GATES,
+    *,
+    beam_width: int = BEAM_WIDTH,
+) -> "dict[int, list[Command]]":
+    """Pack sub-commands into the fewest ordered rounds of parallel gates.
+
+    A round runs gates of one of the `parallel_sq_gates` types, at most
+    `max_parallel_sq_gates` of them and at most one per qubit; any other
+    sub-command is a round of its own.
+    Each qubit runs its sub-commands in order, in successive rounds.
+
+    The rounds are found by a breadth-first search over how far each qubit has got.
+    Running every ready gate of a type is never worse than running some of them, so
+    the search is exact unless more than `max_parallel_sq_gates` gates are ready at
+    once, when those of the qubits with the most sub-commands left go first, or
+    more than `beam_width` states are live, when only those closest to the end are
+    kept.
+
+    Args:
+        sub_commands: the sub-commands of each qubit, in order
+        max_parallel_sq_gates: the maximum number of gates in a round
+        parallel_sq_gates: the gate types that can run in parallel rounds, see
+            `Machine.parallel_sq_gates`
+        beam_width: the maximum number of states kept after each round
+
+    Returns:
+        the rounds in execution order, keyed by position as for
+        `process_sub_commands`
+    """
+    cmds = list(sub_commands.values())
+    ranks = {gate: rank for rank, gate in enumerate(parallel_sq_gates)}
+    kinds = [[ranks.get(cmd.op.type) for cmd in qubit_cmds] for qubit_cmds in cmds]
+    remaining = [_remaining_counts(qubit_kinds, len(ranks)) for qubit_kinds in kinds]
+    end = tuple(len(qubit_cmds) for qubit_cmds in cmds)
+
+    # for each round, the state and the qubits advanced from it to reach each
+    # state kept after the round
+    levels: list[dict[State, tuple[State, tuple[int, ...]]]] = []
+    frontier = [tuple(0 for _ in cmds)]
+    while frontier[0] != end and not (levels and end in levels[-1]):
+        successors: dict[State, tuple[State, tuple[int, ...]]] = {}
+        for state in frontier:
+            for advanced in _next_rounds(state, kinds, max_parallel_sq_gates):
+                successor = list(state)
+                for i in advanced:
+                    successor[i] += 1
+                successors.setdefault(tuple(successor), (state, advanced))
+        frontier = list(successors)
+        if len(frontier) > beam_width:
+            frontier.sort(
+                key=lambda s: _rounds_left(s, remaining, max_parallel_sq_gates)
+            )
+            del frontier[beam_width:]
+        levels.append({state: successors[state] for state in frontier})
+
+    rounds: list[list[Command]] = []
+    state = end
+    for level in reversed(levels):
+        previous, advanced = level[state]
+        rounds.append([cmds[i][previous[i]] for i in advanced])
+        state = previous
+    return dict(enumerate(reversed(rounds)))
+
+
+def min_rounds(
+    sub_commands: "dict[UnitID, list[Command]]",
+    max_parallel_sq_gates: int,
+    parallel_sq_gates: "Sequence[OpType]" = DEFAULT_PARALLEL_SQ_GATES,
+) -> int:
+    """A lower bound on the number of rounds for the sub-commands.
+
+    No packing takes fewer rounds than the longest qubit has sub-commands, nor
+    than it takes to run every gate of each parallel type at full rounds and every
+    other sub-command on its own.
+    """
+    ranks = {gate: rank for rank, gate in enumerate(parallel_sq_gates)}
+    remaining = [
+        _remaining_counts([ranks.get(cmd.op.type) for cmd in cmds], len(ranks))
+        for cmds in sub_commands.values()
+    ]
+    lower_bound, _ = _rounds_left(
+        tuple(0 for _ in remaining), remaining, max_parallel_sq_gates
+    )
+    return lower_bound
+
+
+def _remaining_counts(kinds: list[int | None], num_kinds: int) -> list[tuple[int, ...]]:
+    """Sub-commands left of each parallel kind, then of any other, at each step."""
+    counts = [0] * (num_kinds + 1)
+    suffixes = [tuple(counts)]
+    for kind in reversed(kinds):
+        counts[-1 if kind is None else kind] += 1
+        suffixes.append(tuple(counts))
+    return suffixes[::-1]
+
+
+def _next_rounds(
+    state: State, kinds: list[list[int | None]], max_parallel_sq_gates: int
+) -> "Iterator[tuple[int, ...]]":
+    """The qubits advanced by each round worth running next."""
+    ready: dict[int, list[int]] = {}
+    for i, position in enumerate(state):
+        if position < len(kinds[i]):
+            kind = kinds[i][position]
+            if kind is None:
+                yield (i,)
+            else:
+                ready.setdefault(kind, []).append(i)
+    for qubits in ready.values():
+        if len(qubits) <= max_parallel_sq_gates:
+            yield tuple(qubits)
+        else:
+            # the qubits with the most left are the likeliest to hold up the end
+            by_length = sorted(
+                qubits, key=lambda i: len(kinds[i]) - state[i], reverse=True
+            )
+            yield tuple(sorted(by_length[:max_parallel_sq_gates]))
+
+
+def _rounds_left(
+    state: State, remaining: list[list[tuple[int, ...]]], max_parallel_sq_gates: int
+) -> tuple[int, int]:
+    """A lower bound on the rounds left, then the sub-commands left."""
+    counts = [
+        qubit_remaining[position]
+        for position, qubit_remaining in zip(state, remaining, strict=True)
+    ]
+    if not counts:
+        return 0, 0
+    *parallel, other = [sum(column) for column in zip(*counts, strict=True)]
+    by_kind = sum(-(-count // max_parallel_sq_gates) for count in parallel) + other
+    return max(*map(sum, counts), by_kind), sum(parallel) + other
@@ -0,0 +1,170 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from .phirgen import JsonDict
+
+# rotations that are the identity when all their angles are zero
+ROTATIONS = frozenset({"RX", "RY", "RZ", "RXX", "RYY", "RZZ"})
+# the keys of a qop that can be coalesced with another
+QOP_KEYS = frozenset({"qop", "angles", "args", "returns"})
+
+
+class PeepholeOptimizer:
+    """Clean up a stream of generated PHIR ops, looking at adjacent ops only.
+
+    - Transports of zero duration are dropped, and consecutive Transports merged
+      into one of their total duration;
+    - rotations by exactly zero, and qparallel and sequence blocks left empty,
+      are dropped, and qparallel blocks of a single op replaced by the op;
+    - adjacent qops of the same gate with the same angles, on different qubits
+      and returning to different bits, are coalesced into one qop, as long as
+      the result does not exceed the parallel limits, if any.
+
+    Comments are skipped over, so a comment may end up before an op merged with
+    the one it shows, or before the op following one that was dropped.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_parallel_sq_gates: int | None = None,
+        max_parallel_tq_gates: int | None = None,
+    ) -> None:
+        """Create an optimizer.
+
+        Args:
+            max_parallel_sq_gates: (Optional) the most single-qubit gates a
+                coalesced qop may apply, for programs with strict parallelism
+            max_parallel_tq_gates: (Optional) the most two-qubit gates a
+                coalesced qop may apply, for programs with strict parallelism
+        """
+        self.max_parallel_sq_gates = max_parallel_sq_gates
+        self.max_parallel_tq_gates = max_parallel_tq_gates
+
+    def optimize_layers(
+        self, layers: "Iterable[list[JsonDict]]"
+    ) -> "Iterator[list[JsonDict]]":
+        """Lazily optimize the ops of each layer, across layers.
+
+        The last op of each layer, and any comments after it, are held back until
+        the next layer, which may merge with it, so the ops come out one layer
+        late; they are all out once `layers` is exhausted.
+        """
+        pending: list[JsonDict] = []
+        for ops in layers:
+            pending = self._optimize_into(pending, ops)
+            last = _last_op_index(pending)
+            if last is None:
+                yield pending
+                pending = []
+            else:
+                yield pending[:last]
+                pending = pending[last:]
+        yield pending
+
+    def optimize_ops(self, ops: list["JsonDict"]) -> list["JsonDict"]:
+        """Optimize a whole list of ops, e.g. of a program."""
+        return self._optimize_into([], ops)
+
+    def _optimize_into(
+        self, optimized: list["JsonDict"], ops: list["JsonDict"]
+    ) -> list["JsonDict"]:
+        """Optimize `ops` after the already optimized ones, returning all of them."""
+        last = _last_op_index(optimized)
+        for op in ops:
+            if "//" in op:
+                optimized.append(op)
+                continue
+            new_op = _simplify(op)
+            if new_op is None:
+                continue
+            merged = None if last is None else self._merge(optimized[last], new_op)
+            if last is not None and merged is not None:
+                # the comments after the last op move before the merged op
+                del optimized[last]
+            optimized.append(new_op if merged is None else merged)
+            last = len(optimized) - 1
+        return optimized
+
+    def _merge(self, first: "JsonDict", second: "JsonDict") -> "JsonDict | None":
+        """A single op doing `first` then `second`, None if there is none."""
+        if first.get("mop") == "Transport" and second.get("mop") == "Transport":
+            first_cost, units = first["duration"]
+            second_cost, second_units = second["duration"]
+            if units != second_units:
+                return None
+            return {**first, "duration": (first_cost + second_cost, units)}
+        if "qop" in first and "qop" in second:
+            return self._merge_qops(first, second)
+        return None
+
+    def _merge_qops(self, first: "JsonDict", second: "JsonDict") -> "JsonDict | None":
+        """A single qop applying both qops in parallel, None if there is none."""
+        if not first.keys() == second.keys() <= QOP_KEYS:
+            return None
+        compatible = (
+            (first["qop"], first.get("angles")) == (second["qop"], second.get("angles"))
+            and _disjoint(_qubits(first), _qubits(second))
+            and _disjoint(first.get("returns", []), second.get("returns", []))
+        )
+        args = [*first["args"], *second["args"]]
+        two_qubit = isinstance(args[0][0], list)
+        limit = self.max_parallel_tq_gates if two_qubit else self.max_parallel_sq_gates
+        if not compatible or (limit is not None and len(args) > limit):
+            return None
+        merged = {**first, "args": args}
+        if "returns" in first:
+            merged["returns"] = [*first["returns"], *second["returns"]]
+        return merged
+
+
+def _simplify(op: "JsonDict") -> "JsonDict | None":  # noqa: PLR0911
+    """The op with trivial blocks flattened, None if it does nothing."""
+    match op:
+        case {"mop": "Transport", "duration": (0, _)}:
+            return None
+        case {"qop": "R1XY", "angles": [[0, _], _]}:
+            return None
+        case {"qop": qop, "angles": [angles, _]} if qop in ROTATIONS:
+            return op if any(angles) else None
+        case {"block": "sequence", "ops": []}:
+            return None
+        case {"block": "qparallel", "ops": ops}:
+            kept = [new_op for new_op in map(_simplify, ops) if new_op is not None]
+            if len(kept) <= 1:
+                return kept[0] if kept else None
+            return {**op, "ops": kept}
+    return op
+
+
+def _last_op_index(ops: list["JsonDict"]) -> int | None:
+    """The index of the last op that is not a comment, None if there is none."""
+    for index in range(len(ops) - 1, -1, -1):
+        if "//" not in ops[index]:
+            return index
+    return None
+
+
+def _qubits(qop: "JsonDict") -> "Iterator[list[str | int]]":
+    for arg in qop["args"]:
+        # the args of a two-qubit gate are pairs of qubits
+        yield from arg if isinstance(arg[0], list) else [arg]
+
+
+def _disjoint(
+    first: "Iterable[list[str | int]]", second: "Iterable[list[str | int]]"
+) -> bool:
+    """Whether no bit or qubit is in both."""
+    return {tuple(unit) for unit in first}.isdisjoint(map(tuple, second))
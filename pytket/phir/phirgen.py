@@ -8,13 +8,15 @@
 
 # mypy: disable-error-code="misc"
 
+import io
+import itertools
 import json
 import logging
 import sys
-from collections import deque
 from copy import deepcopy
+from enum import Enum
 from importlib.metadata import version
-from typing import TYPE_CHECKING, Any, TypeAlias
+from typing import TYPE_CHECKING, Any, TypeAlias, overload
 
 from pytket.qasm.qasm import QASMUnsupportedError
 
@@ -37,10 +39,14 @@ from pytket.unit_id import Bit as tkBit
 from pytket.unit_id import BitRegister, QubitRegister
 
 import pytket
-from phir.model import PHIRModel
+
+from .classical import ClassicalOptimizer
+from .peephole import PeepholeOptimizer
+from .validation import PhirValidator, ValidationLevel
 
 if TYPE_CHECKING:
-    from collections.abc import Sequence
+    from collections.abc import Iterable, Iterator, Mapping, Sequence
+    from typing import TextIO
 
     from pytket.circuit import Circuit, WiredClExpr
     from pytket.unit_id import UnitID
@@ -50,6 +56,7 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 JsonDict: TypeAlias = dict[str, Any]  # type: ignore[explicit-any]
+# template for the header of every program, never modified, see `phir_header`
 PHIR_HEADER: JsonDict = {
     "format": "PHIR/JSON",
     "version": "0.1.0",
@@ -59,10 +66,31 @@ PHIR_HEADER: JsonDict = {
 WASM_WORDSIZE = 32
 WORDSIZE = 64 if pytket.__dict__.get("bit_width_64", False) else 32
 UINTMAX = 2**WORDSIZE - 1
+# the comparison that holds exactly when the key does not
+NEGATED_COMPARISONS = {
+    "==": "!=",
+    "!=": "==",
+    "<": ">=",
+    ">=": "<",
+    ">": "<=",
+    "<=": ">",
+}
 
 Var: TypeAlias = str
 Bit: TypeAlias = list[Var | int]  # e.g. [c, 0] for c[0]
 
+
+class EmitProfile(Enum):
+    """What the generated PHIR includes besides the ops themselves."""
+
+    commented = "commented"
+    """A comment with the source pytket command before each op."""
+    compact = "compact"
+    """No comments."""
+    source_mapped = "source_mapped"
+    """No comments; their text goes in a sidecar source map instead."""
+
+
 tket_gate_to_phir = {
     tk.OpType.Reset:    "Init",
     tk.OpType.Measure:  "Measure",
@@ -254,8 +282,22 @@ def cop_from_op_name(op_name: str) -> str:
     return cop
 
 
-def convert_classicalevalop(op: tk.ClassicalEvalOp, cmd: tk.Command) -> JsonDict | None:  # noqa: PLR0912
-    """Return PHIR dict for a pytket ClassicalEvalOp."""
+def convert_classicalevalop(
+    op: tk.ClassicalEvalOp,
+    cmd: tk.Command,
+    *,
+    register_sizes: "Mapping[str, int] | None" = None,
+) -> JsonDict | None:
+    """Return PHIR dict for a pytket ClassicalEvalOp.
+
+    Bitwise ops whose bits are contiguous slices of registers, in index order, are
+    applied to the registers at once, see `assign_to_slice`.
+
+    Args:
+        op: the op
+        cmd: the command
+        register_sizes: size of each classical register, see `get_register_sizes`
+    """
     # Exclude conditional bits from args
     args = cmd.args[cmd.op.width :] if isinstance(cmd.op, tk.Conditional) else cmd.args
     out: JsonDict | None = None
@@ -264,38 +306,30 @@ def convert_classicalevalop(op: tk.ClassicalEvalOp, cmd: tk.Command) -> JsonDict
             if len(cmd.bits) != len(args) // 2:
                 msg = "LHS and RHS lengths mismatch for CopyBits"
                 raise TypeError(msg)
-            out = assign_cop(
+            sources = args[: len(args) // 2]
+            out = coalesce_bitwise(
+                None, [sources], cmd.bits, register_sizes
+            ) or assign_cop(
                 [arg_to_bit(bit) for bit in cmd.bits],
-                [arg_to_bit(args[i]) for i in range(len(args) // 2)],
+                [arg_to_bit(arg) for arg in sources],
             )
         case tk.SetBitsOp():
             if len(cmd.bits) != len(op.values):
                 logger.error("LHS and RHS lengths mismatch for classical assignment")
                 raise ValueError
-            out = assign_cop(
-                [arg_to_bit(bit) for bit in cmd.bits], list(map(int, op.values))
+            values = list(map(int, op.values))
+            # each value in the position of its bit in the register
+            value = sum(
+                int(val) << bit.index[0]
+                for val, bit in zip(values, cmd.bits, strict=True)
+            )
+            out = assign_to_slice(cmd.bits, value, register_sizes) or assign_cop(
+                [arg_to_bit(bit) for bit in cmd.bits], values
             )
         case tk.RangePredicateOp():  # where the condition is a range
-            cond: JsonDict
-            match op.lower, op.upper:
-                case l, u if l == u:
-                    cond = {
-                        "cop": "==",
-                        "args": [args[0].reg_name, u],
-                    }
-                case l, u if u == UINTMAX:
-                    cond = {
-                        "cop": ">=",
-                        "args": [args[0].reg_name, l],
-                    }
-                case 0, u:
-                    cond = {
-                        "cop": "<=",
-                        "args": [args[0].reg_name, u],
-                    }
             out = {
                 "block": "if",
-                "condition": cond,
+                "condition": range_condition(op, args[0].reg_name),
                 "true_branch": [assign_cop([arg_to_bit(cmd.bits[0])], [1])],
             }
         case tk.MultiBitOp():
@@ -309,32 +343,17 @@ def convert_classicalevalop(op: tk.ClassicalEvalOp, cmd: tk.Command) -> JsonDict
             # determine number of register operands involved in the operation
             operand_count = len(args) // len(cmd.bits) - is_explicit
 
-            iters = [iter(args)] * (operand_count + is_explicit)
-            iter2 = deepcopy(iters)
-
-            # Columns of expressions, e.g.,
+            # Expressions and columns of expressions, e.g.,
             #   AND (*2) a[0], b[0], c[0]
             #          , a[1], b[1], c[1]
-            #   would be [(a[0], a[1]), (b[0], b[1]), (c[0], c[1])]
-            # and AND (*2) a[0], a[1], b[0]
-            #            , b[1], c[0], c[1]
-            #   would be [(a[0], b[1]), (a[1], c[0]), (b[0], c[1])]
-            cols = zip(*zip(*iters, strict=True), strict=True)
-
-            if all(
-                all(col[0].reg_name == bit.reg_name for bit in col) for col in cols
-            ):  # expression can be applied register-wise
-                out = assign_cop(
-                    [cmd.bits[0].reg_name],
-                    [
-                        {
-                            "cop": cop,
-                            "args": [arg.reg_name for arg in args[:operand_count]],
-                        }
-                    ],
-                )
-            else:  # apply a sequence of bit-wise ops
-                exps = zip(*iter2, strict=True)
+            #   would be [(a[0], b[0], c[0]), (a[1], b[1], c[1])]
+            #   and [(a[0], a[1]), (b[0], b[1]), (c[0], c[1])]
+            size = operand_count + is_explicit
+            exps = [args[i : i + size] for i in range(0, len(args), size)]
+            cols = list(zip(*exps, strict=True))
+
+            out = coalesce_bitwise(cop, cols[:operand_count], cmd.bits, register_sizes)
+            if out is None:  # apply a sequence of bit-wise ops
                 out = {
                     "block": "sequence",
                     "ops": [
@@ -358,31 +377,204 @@ def convert_classicalevalop(op: tk.ClassicalEvalOp, cmd: tk.Command) -> JsonDict
     return out
 
 
-def multi_bit_condition(args: "list[UnitID]", value: int) -> JsonDict:
-    """Construct bitwise condition."""
+def range_condition(
+    op: tk.RangePredicateOp, reg_name: str, *, negate: bool = False
+) -> JsonDict:
+    """Construct the condition that a register is in the range of a predicate.
+
+    Args:
+        op: the range predicate
+        reg_name: the register it reads
+        negate: whether to construct the condition that it is not in the range
+    """
+    lower, upper = op.lower, op.upper
+    if lower == upper:
+        bounds = [("==", upper)]
+    elif upper == UINTMAX:
+        bounds = [(">=", lower)]
+    elif lower == 0:
+        bounds = [("<=", upper)]
+    else:
+        bounds = [(">=", lower), ("<=", upper)]
+    comparisons = [
+        {"cop": NEGATED_COMPARISONS[cop] if negate else cop, "args": [reg_name, bound]}
+        for cop, bound in bounds
+    ]
+    if len(comparisons) == 1:
+        return comparisons[0]
+    return {"cop": "|" if negate else "&", "args": comparisons}
+
+
+def bit_slice(bits: "Sequence[UnitID]") -> tuple[str, int] | None:
+    """Register name and first index of `bits`, if a slice of it in index order."""
+    reg_name = bits[0].reg_name
+    first = bits[0].index[0]
+    if all(
+        bit.reg_name == reg_name and bit.index[0] == first + i
+        for i, bit in enumerate(bits)
+    ):
+        return reg_name, first
+    return None
+
+
+def assign_to_slice(
+    bits: "Sequence[UnitID]",
+    value: "int | JsonDict | Var",
+    register_sizes: "Mapping[str, int] | None",
+    *,
+    exact: bool = False,
+) -> JsonDict | None:
+    """Assign a value to bits forming a slice of a register, as a register op.
+
+    Unless the bits are the whole register, the others are preserved with a mask:
+    `reg = (reg & ~mask) | (value & mask)`.
+
+    Args:
+        bits: the bits to assign
+        value: the value to assign, already shifted to the position of the bits;
+            any other bits of it are ignored
+        register_sizes: size of each classical register, see `get_register_sizes`
+        exact: whether the other bits of `value` are known to be 0, so that it
+            needs no mask
+
+    Returns:
+        the assignment, or None if the bits are not a slice of at least two bits
+        or the mask does not fit in a signed word
+    """
+    found = bit_slice(bits)
+    width = len(bits)
+    if found is None or width < 2:  # noqa: PLR2004
+        return None
+    reg_name, first = found
+    if (
+        register_sizes is not None
+        and register_sizes.get(reg_name) == width
+        and (not isinstance(value, int) or value < 2 ** (WORDSIZE - 1))
+    ):
+        return assign_cop([reg_name], [value])
+    mask = ((1 << width) - 1) << first
+    if mask >= 2 ** (WORDSIZE - 1):
+        return None
+    kept: JsonDict = {"cop": "&", "args": [reg_name, ~mask]}
+    if isinstance(value, int):
+        value &= mask
+        if value == 0:
+            return assign_cop([reg_name], [kept])
+        if value == mask:
+            return assign_cop([reg_name], [{"cop": "|", "args": [reg_name, mask]}])
+    elif not exact:
+        value = {"cop": "&", "args": [value, mask]}
+    return assign_cop([reg_name], [{"cop": "|", "args": [kept, value]}])
+
+
+def coalesce_bitwise(
+    cop: str | None,
+    operands: "Sequence[Sequence[UnitID]]",
+    bits: "Sequence[UnitID]",
+    register_sizes: "Mapping[str, int] | None",
+) -> JsonDict | None:
+    """Apply a bitwise op to slices of registers at once.
+
+    Args:
+        cop: the bitwise cop, or None to copy the single operand
+        operands: the bits of each operand, in the order of `bits`
+        bits: the bits to assign the result to
+        register_sizes: size of each classical register, see `get_register_sizes`
+
+    Returns:
+        the register op, see `assign_to_slice`, or None unless every operand and
+        `bits` are slices of registers in index order
+    """
+    found = bit_slice(bits)
+    slices = [bit_slice(operand) for operand in operands]
+    if found is None or None in slices:
+        return None
+    _, first = found
+    args: list[Var | JsonDict] = []
+    # whether each operand is a whole register lined up with the bits, so that it
+    # has no other bits set
+    clean: list[bool] = []
+    for reg_name, operand_first in filter(None, slices):
+        # line the operand up with the bits it is assigned to
+        shift = first - operand_first
+        arg: Var | JsonDict = reg_name
+        if shift > 0:
+            arg = {"cop": "<<", "args": [arg, shift]}
+        elif shift < 0:
+            arg = {"cop": ">>", "args": [arg, -shift]}
+        args.append(arg)
+        clean.append(
+            shift == 0
+            and register_sizes is not None
+            and register_sizes.get(reg_name) == len(bits)
+        )
+    value = args[0] if cop is None else {"cop": cop, "args": args}
+    match cop:
+        case "~":
+            exact = False
+        case "&":
+            exact = any(clean)
+        case _:
+            exact = all(clean)
+    return assign_to_slice(bits, value, register_sizes, exact=exact)
+
+
+def multi_bit_condition(
+    args: "list[UnitID]",
+    value: int,
+    *,
+    register_sizes: "Mapping[str, int] | None" = None,
+) -> JsonDict:
+    """Construct the condition that `args`, as bits of a number, equal `value`.
+
+    When the bits are a contiguous slice of one register in index order, this is a
+    single comparison of the register, masked unless the slice is the whole
+    register according to `register_sizes`. Otherwise it is a chain of bitwise
+    comparisons joined by `&`.
+
+    Args:
+        args: the condition bits, least significant first
+        value: the value to compare them to
+        register_sizes: size of each classical register, see `get_register_sizes`
+    """
     min_args = 2
     if len(args) < min_args:
         msg = f"multi_bit_condition requires at least {min_args} arguments"
         raise TypeError(msg)
 
-    def nested_cop(cop: str, args: "deque[UnitID]", val_bits: deque[int]) -> JsonDict:
-        if len(args) == min_args:
+    width = len(args)
+    value &= (1 << width) - 1
+    found = bit_slice(args)
+    if found is not None:
+        reg_name, first = found
+        mask = ((1 << width) - 1) << first
+        # constants must fit in a signed word
+        max_constant = 2 ** (WORDSIZE - 1)
+        whole = register_sizes is not None and register_sizes.get(reg_name) == width
+        if whole and value < max_constant:
+            return {"cop": "==", "args": [reg_name, value]}
+        if mask < max_constant:
             return {
-                "cop": cop,
-                "args": [
-                    {"cop": "==", "args": [arg_to_bit(args.popleft()), val_bits.pop()]},
-                    {"cop": "==", "args": [arg_to_bit(args.popleft()), val_bits.pop()]},
-                ],
+                "cop": "==",
+                "args": [{"cop": "&", "args": [reg_name, mask]}, value << first],
             }
-        return {
-            "cop": cop,
+
+    # built from the last bit outwards, as a chain nested on the right
+    condition = {"cop": "==", "args": [arg_to_bit(args[-1]), value >> (width - 1) & 1]}
+    for i in range(width - 2, -1, -1):
+        condition = {
+            "cop": "&",
             "args": [
-                {"cop": "==", "args": [arg_to_bit(args.popleft()), val_bits.pop()]},
-                nested_cop(cop, args, val_bits),
+                {"cop": "==", "args": [arg_to_bit(args[i]), value >> i & 1]},
+                condition,
             ],
         }
+    return condition
+
 
-    return nested_cop("&", deque(args), deque(map(int, f"{value:0{len(args)}b}")))
+def get_register_sizes(cregs: list[BitRegister]) -> dict[str, int]:
+    """Get the size of each classical register, by name."""
+    return {creg.name: creg.size for creg in cregs}
 
 
 def get_cop_from_op(op: ClOp) -> str | int:  # noqa: PLR0912
@@ -470,8 +662,22 @@ def phir_from_clexpr_arg(
     return {"cop": cop, "args": args}
 
 
-def convert_subcmd(op: tk.Op, cmd: tk.Command) -> JsonDict | None:  # noqa: PLR0912
-    """Return PHIR dict given a tket op and its arguments."""
+def convert_subcmd(  # noqa: PLR0912
+    op: tk.Op,
+    cmd: tk.Command,
+    *,
+    register_sizes: "Mapping[str, int] | None" = None,
+    range_predicate: tk.Command | None = None,
+) -> JsonDict | None:
+    """Return PHIR dict given a tket op and its arguments.
+
+    Args:
+        op: the op, `cmd.op` or an op nested in it
+        cmd: the command
+        register_sizes: size of each classical register, see `get_register_sizes`
+        range_predicate: the range predicate fused into the condition of `op`, a
+            Conditional, see `Shard.range_predicate`
+    """
     if op.is_gate():
         return convert_gate(op, cmd)
 
@@ -479,12 +685,27 @@ def convert_subcmd(op: tk.Op, cmd: tk.Command) -> JsonDict | None:  # noqa: PLR0
     rhs: list[int | str | list[str | int] | JsonDict] = []
     match op:  # non-quantum op
         case tk.Conditional():
+            condition: JsonDict
+            if range_predicate is not None:
+                predicate_op = range_predicate.op
+                assert isinstance(predicate_op, tk.RangePredicateOp)  # noqa: S101
+                condition = range_condition(
+                    predicate_op,
+                    range_predicate.args[0].reg_name,
+                    negate=not op.value,
+                )
+            elif op.width == 1:
+                condition = {"cop": "==", "args": [arg_to_bit(cmd.args[0]), op.value]}
+            else:
+                condition = multi_bit_condition(
+                    cmd.args[: op.width], op.value, register_sizes=register_sizes
+                )
             out = {
                 "block": "if",
-                "condition": {"cop": "==", "args": [arg_to_bit(cmd.args[0]), op.value]}
-                if op.width == 1
-                else multi_bit_condition(cmd.args[: op.width], op.value),
-                "true_branch": [convert_subcmd(op.op, cmd)],
+                "condition": condition,
+                "true_branch": [
+                    convert_subcmd(op.op, cmd, register_sizes=register_sizes)
+                ],
             }
 
         case tk.BarrierOp():
@@ -527,7 +748,7 @@ def convert_subcmd(op: tk.Op, cmd: tk.Command) -> JsonDict | None:  # noqa: PLR0
             return assign_cop([arg_to_bit(cmd_args[output_posn[0]])], rhs)
 
         case tk.ClassicalEvalOp():
-            return convert_classicalevalop(op, cmd)
+            return convert_classicalevalop(op, cmd, register_sizes=register_sizes)
 
         case tk.WASMOp():
             return create_wasm_op(cmd, op)
@@ -558,15 +779,34 @@ def convert_subcmd(op: tk.Op, cmd: tk.Command) -> JsonDict | None:  # noqa: PLR0
     return out
 
 
-def append_cmd(cmd: tk.Command, ops: list[JsonDict]) -> None:
+def append_cmd(
+    cmd: tk.Command,
+    ops: list[JsonDict],
+    *,
+    comments: bool = True,
+    register_sizes: "Mapping[str, int] | None" = None,
+    range_predicate: tk.Command | None = None,
+) -> None:
     """Convert a pytket command to a PHIR command and append to `ops`.
 
     Args:
         cmd: pytket command obtained from pytket-phir
         ops: the list of ops to append to
+        comments: whether to precede the op with a comment showing the command
+        register_sizes: size of each classical register, see `get_register_sizes`
+        range_predicate: the range predicate fused into the command's condition,
+            see `Shard.range_predicate`
     """
-    ops.append({"//": make_comment_text(cmd, cmd.op)})
-    op: JsonDict | None = convert_subcmd(cmd.op, cmd)
+    if comments:
+        if range_predicate is not None:
+            ops.append({"//": make_comment_text(range_predicate, range_predicate.op)})
+        ops.append({"//": make_comment_text(cmd, cmd.op)})
+    op: JsonDict | None = convert_subcmd(
+        cmd.op,
+        cmd,
+        register_sizes=register_sizes,
+        range_predicate=range_predicate,
+    )
     if op:
         ops.append(op)
 
@@ -668,28 +908,42 @@ def get_decls(
     return decls
 
 
-def genphir(
-    inp: list[tuple["Ordering", "ShardLayer", "Cost"]],
-    circuit: "Circuit",
+def genphir_layers(
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
     *,
     machine_ops: bool = True,
-) -> str:
-    """Convert a list of shards to the equivalent PHIR.
+    comments: bool = True,
+    optimize_classical: bool = False,
+    register_sizes: "Mapping[str, int] | None" = None,
+) -> "Iterator[list[JsonDict]]":
+    """Lazily convert each layer of shards to the equivalent PHIR ops.
 
     Args:
-        inp: list of shards
-        circuit: corresponding tket Circuit
+        inp: layers of shards, consumed one at a time
         machine_ops: whether to include machine ops
+        comments: whether to precede each op with a comment showing its command
+        optimize_classical: whether to simplify classical expressions, see
+            `ClassicalOptimizer`
+        register_sizes: size of each classical register, see `get_register_sizes`
     """
-    phir = PHIR_HEADER
-    ops: list[JsonDict] = []
-
+    optimizer = ClassicalOptimizer(WORDSIZE) if optimize_classical else None
     for _orders, shard_layer, layer_cost in inp:
+        ops: list[JsonDict] = []
         for shard in shard_layer:
             for sub_commands in shard.sub_commands.values():
                 for sc in sub_commands:
-                    append_cmd(sc, ops)
-            append_cmd(shard.primary_command, ops)
+                    append_cmd(
+                        sc, ops, comments=comments, register_sizes=register_sizes
+                    )
+            append_cmd(
+                shard.primary_command,
+                ops,
+                comments=comments,
+                register_sizes=register_sizes,
+                range_predicate=shard.range_predicate,
+            )
+        if optimizer:
+            ops = optimizer.optimize_ops(ops)
         if machine_ops:
             ops.append(
                 {
@@ -697,9 +951,464 @@ def genphir(
                     "duration": (layer_cost, "ms"),
                 },
             )
+        yield ops
+
+
+def profile_layers(
+    layers: "Iterable[list[JsonDict]]",
+    profile: EmitProfile,
+    first_index: int,
+    source_map: dict[int, str] | None,
+) -> "Iterable[list[JsonDict]]":
+    """Apply an emission profile to layers of ops generated with comments.
+
+    For the source-mapped profile, each run of comments is removed and its text
+    recorded in `source_map` under the index, in the final program, of the op that
+    follows it; comments left at the very end are recorded under the number of ops.
+
+    Args:
+        layers: ops of each layer, with comments unless the profile is compact
+        profile: emission profile
+        first_index: index in the program of the first op of the first layer
+        source_map: map to fill in for the source-mapped profile
+    """
+    if profile != EmitProfile.source_mapped:
+        return layers
+    if source_map is None:
+        msg = "The source-mapped profile needs a source map to fill in"
+        raise ValueError(msg)
+    return _move_comments(layers, first_index, source_map)
+
+
+def _move_comments(
+    layers: "Iterable[list[JsonDict]]", index: int, source_map: dict[int, str]
+) -> "Iterator[list[JsonDict]]":
+    pending: list[str] = []
+    for ops in layers:
+        kept: list[JsonDict] = []
+        for op in ops:
+            if "//" in op:
+                pending.append(op["//"])
+                continue
+            if pending:
+                source_map[index] = "\n".join(pending)
+                pending.clear()
+            kept.append(op)
+            index += 1
+        yield kept
+    if pending:
+        source_map[index] = "\n".join(pending)
+
+
+class FragmentEmitter:
+    """Emit the ops of each layer as PHIR JSON text instead of dicts.
+
+    Most ops of a large circuit are gates, with a handful of gate types and angles
+    applied to a fixed set of qubits. The JSON text of each gate type with its
+    angles, and of each qubit or bit, is built once and cached, so that emitting a
+    gate only fills in a cached format string instead of building dicts for
+    `json.dumps` to walk. Other ops go through `append_cmd`. Joined with ", ", the
+    fragments of a layer are exactly the `json.dumps` of the ops `genphir_layers`
+    generates.
+
+    Ops are only validated when their fragments are first built, which is enough
+    for `ValidationLevel.sample` but not for full validation.
+    """
 
+    def __init__(
+        self,
+        validator: PhirValidator,
+        *,
+        comments: bool = True,
+        optimize_classical: bool = False,
+        register_sizes: "Mapping[str, int] | None" = None,
+    ) -> None:
+        """Create an emitter.
+
+        Args:
+            validator: validator of the ops, at most at `ValidationLevel.sample`
+            comments: whether to precede each op with a comment showing its command
+            optimize_classical: whether to simplify classical expressions, see
+                `ClassicalOptimizer`
+            register_sizes: size of each classical register, see
+                `get_register_sizes`
+        """
+        if validator.level == ValidationLevel.full:
+            msg = "Fragments cannot be fully validated, use genphir_layers instead"
+            raise ValueError(msg)
+        self.validator = validator
+        self.comments = comments
+        self.register_sizes = register_sizes
+        self._optimizer = ClassicalOptimizer(WORDSIZE) if optimize_classical else None
+        # gate type and angles -> format strings of the op and its comment, to be
+        # completed with the JSON and the comment text of its args
+        self._gates: dict[tuple[object, ...], tuple[str, str]] = {}
+        # qubit or bit -> JSON and comment text
+        self._units: dict[UnitID, tuple[str, str]] = {}
+
+    def layers(
+        self,
+        inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+        *,
+        machine_ops: bool = True,
+    ) -> "Iterator[list[str]]":
+        """Lazily convert each layer of shards to PHIR JSON fragments, one per op.
+
+        Args:
+            inp: layers of shards, consumed one at a time
+            machine_ops: whether to include machine ops
+        """
+        for _orders, shard_layer, layer_cost in inp:
+            fragments: list[str] = []
+            for shard in shard_layer:
+                for sub_commands in shard.sub_commands.values():
+                    for sc in sub_commands:
+                        self.append_cmd(sc, fragments)
+                self.append_cmd(
+                    shard.primary_command,
+                    fragments,
+                    range_predicate=shard.range_predicate,
+                )
+            if machine_ops:
+                self._append_ops(
+                    [{"mop": "Transport", "duration": (layer_cost, "ms")}], fragments
+                )
+            yield fragments
+
+    def append_cmd(
+        self,
+        cmd: tk.Command,
+        fragments: list[str],
+        *,
+        range_predicate: tk.Command | None = None,
+    ) -> None:
+        """Convert a pytket command to PHIR JSON and append it to `fragments`.
+
+        Args:
+            cmd: pytket command obtained from pytket-phir
+            fragments: the list of fragments to append to
+            range_predicate: the range predicate fused into the command's condition,
+                see `Shard.range_predicate`
+        """
+        op = cmd.op
+        op_type = op.type
+        if op_type not in tket_gate_to_phir:
+            ops: list[JsonDict] = []
+            append_cmd(
+                cmd,
+                ops,
+                comments=self.comments,
+                register_sizes=self.register_sizes,
+                range_predicate=range_predicate,
+            )
+            self._append_ops(ops, fragments)
+            return
+        key = (op_type, *op.params)
+        template = self._gates.get(key)
+        if template is None:
+            template = self._gates[key] = self._gate_template(cmd, op)
+        units = [self._units.get(arg) or self._unit(arg) for arg in cmd.args]
+        op_format, comment_format = template
+        if self.comments:
+            fragments.append(comment_format.format(*[text for _, text in units]))
+        fragments.append(op_format.format(*[phir for phir, _ in units]))
+
+    def _gate_template(self, cmd: tk.Command, op: tk.Op) -> tuple[str, str]:
+        ops: list[JsonDict] = []
+        append_cmd(cmd, ops, comments=self.comments)
+        self.validator.validate_ops(ops)
+        gate = ops[-1]["qop"]
+        text = _escape_format(json.dumps(str(op))[1:-1])
+        if gate == "Measure":
+            return (
+                '{{"qop": "Measure", "returns": [{1}], "args": [{0}]}}',
+                f'{{{{"//": "{text} {{0}} --> {{1}};"}}}}',
+            )
+        angles = _escape_format(json.dumps((op.params, "pi") if op.params else None))
+        args = "{0}" if len(cmd.args) == 1 else "[{0}, {1}]"
+        arg_texts = ", ".join(f"{{{i}}}" for i in range(len(cmd.args)))
+        return (
+            f'{{{{"qop": "{gate}", "angles": {angles}, "args": [{args}]}}}}',
+            f'{{{{"//": "{text} {arg_texts};"}}}}',
+        )
+
+    def _unit(self, unit: "UnitID") -> tuple[str, str]:
+        fragment = self._units[unit] = (
+            json.dumps(arg_to_bit(unit)),
+            json.dumps(str(unit))[1:-1],
+        )
+        return fragment
+
+    def _append_ops(self, ops: list[JsonDict], fragments: list[str]) -> None:
+        if self._optimizer:
+            ops = self._optimizer.optimize_ops(ops)
+        self.validator.validate_ops(ops)
+        fragments.extend(json.dumps(op) for op in ops)
+
+
+def _escape_format(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def phir_header(*, strict_parallelism: bool = False) -> JsonDict:
+    """Create the header of a new PHIR program from `PHIR_HEADER`.
+
+    Each program gets its own header so that concurrent compilations never share
+    mutable state.
+
+    Args:
+        strict_parallelism: whether the program marks its parallel blocks as strict
+    """
+    header = deepcopy(PHIR_HEADER)
+    if strict_parallelism:
+        header["metadata"]["strict_parallelism"] = True
+    return header
+
+
+def build_phir(
+    header: JsonDict,
+    decls: list[JsonDict],
+    layers: "Iterable[list[JsonDict]]",
+    validation: ValidationLevel = ValidationLevel.full,
+) -> JsonDict:
+    """Validate and assemble a PHIR program.
+
+    Each layer is validated as it is pulled, see `PhirValidator`, and the program
+    is never validated again as a whole.
+
+    Args:
+        header: PHIR header, see `phir_header`
+        decls: variable declarations
+        layers: ops of each layer
+        validation: how much of the program to validate
+    """
+    validator = PhirValidator(validation)
+    phir = {key: value for key, value in header.items() if key != "ops"}
+    validator.validate_header(phir, decls)
+    ops = list(decls)
+    for layer_ops in layers:
+        validator.validate_ops(layer_ops)
+        ops.extend(layer_ops)
+    phir["ops"] = ops
+    return phir
+
+
+def write_phir(
+    header: JsonDict,
+    decls: list[JsonDict],
+    layers: "Iterable[list[JsonDict]]",
+    out: "TextIO",
+    validation: ValidationLevel = ValidationLevel.full,
+) -> None:
+    """Validate and write a PHIR program to a text stream.
+
+    The header and decls are written first and then the ops of each layer as it is
+    pulled from `layers`, so only one layer is held in memory at a time. The output
+    is the same as `json.dumps` of the program built by `build_phir`.
+
+    Args:
+        header: PHIR header, see `phir_header`
+        decls: variable declarations
+        layers: ops of each layer
+        out: text stream to write to
+        validation: how much of the program to validate
+    """
+    validator = PhirValidator(validation)
+    header = {key: value for key, value in header.items() if key != "ops"}
+    validator.validate_header(header, decls)
+
+    def serialized() -> "Iterator[str]":
+        yield json.dumps(decls)[1:-1]
+        for layer_ops in layers:
+            if layer_ops:
+                validator.validate_ops(layer_ops)
+                yield json.dumps(layer_ops)[1:-1]
+
+    write_serialized_phir(header, serialized(), out)
+
+
+def write_serialized_phir(
+    header: JsonDict, chunks: "Iterable[str]", out: "TextIO"
+) -> None:
+    """Write a PHIR program whose ops are already serialized to a text stream.
+
+    Args:
+        header: PHIR header, see `phir_header`, without ops
+        chunks: JSON text of runs of ops, each as in a JSON array without the
+            brackets, e.g. the fragments of a layer joined with ", "
+        out: text stream to write to
+    """
+    # splice the ops into the header object, mirroring json.dumps of the whole
+    out.write(json.dumps(header)[:-1])
+    out.write(', "ops": [')
+    separator = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        out.write(separator)
+        out.write(chunk)
+        separator = ", "
+    out.write("]}")
+
+
+def genphir_program(  # noqa: PLR0913
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+    circuit: "Circuit",
+    *,
+    machine_ops: bool = True,
+    validation: ValidationLevel = ValidationLevel.full,
+    profile: EmitProfile = EmitProfile.commented,
+    source_map: dict[int, str] | None = None,
+    optimize_classical: bool = False,
+    peephole: bool = False,
+) -> JsonDict:
+    """Convert a list of shards to the equivalent PHIR program, as a dict.
+
+    Args:
+        inp: list of shards, or an iterator such as `iter_place_and_route`
+        circuit: corresponding tket Circuit
+        machine_ops: whether to include machine ops
+        validation: how much of the generated PHIR to validate
+        profile: what to include besides the ops, see `EmitProfile`
+        source_map: map of op index to command text filled in by the source-mapped
+            profile, see `profile_layers`
+        optimize_classical: whether to simplify classical expressions, see
+            `ClassicalOptimizer`
+        peephole: whether to clean up the generated ops, see `PeepholeOptimizer`
+    """
     decls = get_decls(circuit.q_registers, circuit.c_registers)
+    layers = genphir_layers(
+        inp,
+        machine_ops=machine_ops,
+        comments=profile != EmitProfile.compact,
+        optimize_classical=optimize_classical,
+        register_sizes=get_register_sizes(circuit.c_registers),
+    )
+    if peephole:
+        layers = PeepholeOptimizer().optimize_layers(layers)
+    return build_phir(
+        phir_header(),
+        decls,
+        profile_layers(layers, profile, len(decls), source_map),
+        validation,
+    )
+
+
+@overload
+def genphir(
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+    circuit: "Circuit",
+    *,
+    machine_ops: bool = ...,
+    out: None = ...,
+    validation: ValidationLevel = ...,
+    profile: EmitProfile = ...,
+    source_map: dict[int, str] | None = ...,
+    optimize_classical: bool = ...,
+    peephole: bool = ...,
+) -> str: ...
+
 
-    phir["ops"] = decls + ops
-    PHIRModel.model_validate(phir)
-    return json.dumps(phir)
+@overload
+def genphir(
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+    circuit: "Circuit",
+    *,
+    machine_ops: bool = ...,
+    out: "TextIO",
+    validation: ValidationLevel = ...,
+    profile: EmitProfile = ...,
+    source_map: dict[int, str] | None = ...,
+    optimize_classical: bool = ...,
+    peephole: bool = ...,
+) -> None: ...
+
+
+def genphir(  # noqa: PLR0913
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+    circuit: "Circuit",
+    *,
+    machine_ops: bool = True,
+    out: "TextIO | None" = None,
+    validation: ValidationLevel = ValidationLevel.full,
+    profile: EmitProfile = EmitProfile.commented,
+    source_map: dict[int, str] | None = None,
+    optimize_classical: bool = False,
+    peephole: bool = False,
+) -> str | None:
+    """Convert a list of shards to the equivalent PHIR.
+
+    Args:
+        inp: list of shards, or an iterator such as `iter_place_and_route`
+        circuit: corresponding tket Circuit
+        machine_ops: whether to include machine ops
+        out: (Optional) text stream to write the PHIR to incrementally instead of
+            returning it, see `write_phir`
+        validation: how much of the generated PHIR to validate; below full
+            validation, the ops are emitted as JSON text by a `FragmentEmitter`
+        profile: what to include besides the ops, see `EmitProfile`
+        source_map: map of op index to command text filled in by the source-mapped
+            profile, see `profile_layers`
+        optimize_classical: whether to simplify classical expressions, see
+            `ClassicalOptimizer`
+        peephole: whether to clean up the generated ops, see `PeepholeOptimizer`
+    """
+    decls = get_decls(circuit.q_registers, circuit.c_registers)
+    if (
+        validation != ValidationLevel.full
+        and profile != EmitProfile.source_mapped
+        and not peephole
+    ):
+        # nothing needs the ops as dicts, so emit their JSON text directly
+        validator = PhirValidator(validation)
+        header = phir_header()
+        validator.validate_header(header, decls)
+        emitter = FragmentEmitter(
+            validator,
+            comments=profile != EmitProfile.compact,
+            optimize_classical=optimize_classical,
+            register_sizes=get_register_sizes(circuit.c_registers),
+        )
+        chunks = itertools.chain(
+            [json.dumps(decls)[1:-1]],
+            (
+                ", ".join(fragments)
+                for fragments in emitter.layers(inp, machine_ops=machine_ops)
+            ),
+        )
+        if out is not None:
+            write_serialized_phir(header, chunks, out)
+            return None
+        buffer = io.StringIO()
+        write_serialized_phir(header, chunks, buffer)
+        return buffer.getvalue()
+    if out is None:
+        return json.dumps(
+            genphir_program(
+                inp,
+                circuit,
+                machine_ops=machine_ops,
+                validation=validation,
+                profile=profile,
+                source_map=source_map,
+                optimize_classical=optimize_classical,
+                peephole=peephole,
+            )
+        )
+    layers = genphir_layers(
+        inp,
+        machine_ops=machine_ops,
+        comments=profile != EmitProfile.compact,
+        optimize_classical=optimize_classical,
+        register_sizes=get_register_sizes(circuit.c_registers),
+    )
+    if peephole:
+        layers = PeepholeOptimizer().optimize_layers(layers)
+    write_phir(
+        phir_header(),
+        decls,
+        profile_layers(layers, profile, len(decls), source_map),
+        out,
+        validation,
+    )
+    return None
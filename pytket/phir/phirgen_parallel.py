@@ -10,146 +10,248 @@
 
 import json
 import logging
-from collections import OrderedDict
-from typing import TYPE_CHECKING
+import math
+from functools import cache
+from typing import TYPE_CHECKING, overload
 
 import pytket.circuit as tk
 
-from phir.model import PHIRModel
-
-from .phirgen import PHIR_HEADER, append_cmd, arg_to_bit, get_decls, tket_gate_to_phir
+from .classical import ClassicalOptimizer
+from .machine import DEFAULT_PARALLEL_SQ_GATES
+from .packing import PackingStats, SqPacking, min_rounds, pack_sub_commands
+from .peephole import PeepholeOptimizer
+from .phirgen import (
+    WORDSIZE,
+    EmitProfile,
+    append_cmd,
+    arg_to_bit,
+    build_phir,
+    get_decls,
+    get_register_sizes,
+    phir_header,
+    profile_layers,
+    tket_gate_to_phir,
+    write_phir,
+)
+from .validation import ValidationLevel
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Mapping, Sequence
+    from typing import TextIO
+
     from pytket.circuit import Circuit
     from pytket.unit_id import UnitID
 
     from .machine import Machine
     from .phirgen import JsonDict
     from .sharding.shard import Cost, Ordering, Shard, ShardLayer
+    from .timeline import Timeline
 
 logger = logging.getLogger(__name__)
 
 
 def exec_order_preserved(
-    group_exec_order: list[int], group_number: int, qubit_last_group: int
+    group_positions: "Mapping[int, int]", group_number: int, qubit_last_group: int
 ) -> bool:
-    """Determine whether order is preserved when adding qubits to groups."""
-    if (group_number not in group_exec_order) or (
-        qubit_last_group not in group_exec_order
-    ):
+    """Determine whether order is preserved when adding qubits to groups.
+
+    Args:
+        group_positions: position of each group in execution order
+        group_number: the group the qubit is eligible for
+        qubit_last_group: the last group in which the qubit was used
+    """
+    position = group_positions.get(group_number)
+    last_position = group_positions.get(qubit_last_group)
+    if position is None or last_position is None:
         return True
     if group_number <= qubit_last_group:
         return False
-    # if the group that the qubit is eligible for is later in the exec_order list than
-    # the last group in which it was used, it can be parallelized
-    return group_exec_order.index(group_number) > group_exec_order.index(
-        qubit_last_group
-    )
+    # if the group that the qubit is eligible for is later in the execution order
+    # than the last group in which it was used, it can be parallelized
+    return position > last_position
 
 
-def process_sub_commands(  # noqa: PLR0912
-    sub_commands: dict["UnitID", list[tk.Command]], max_parallel_sq_gates: int
+def process_sub_commands(
+    sub_commands: dict["UnitID", list[tk.Command]],
+    max_parallel_sq_gates: int,
+    parallel_sq_gates: "Sequence[tk.OpType]" = DEFAULT_PARALLEL_SQ_GATES,
 ) -> dict[int, list[tk.Command]]:
-    """Create parallelizable groups of sub-commands."""
+    """Create parallelizable groups of sub-commands.
+
+    Args:
+        sub_commands: the sub-commands of each qubit, in order
+        max_parallel_sq_gates: the maximum number of gates in a group
+        parallel_sq_gates: the gate types that can run in parallel groups, see
+            `Machine.parallel_sq_gates`
+    """
     groups: dict[
         int, list[tk.Command]
     ] = {}  # be sure to order by group number into a list when returning
-    qubits2groups = OrderedDict()  # the most recent group in which a qubit was used
-    # group numbers for each gate are incremented by 3 so they don't overlap
-    # and different gate types don't go in the same group
-    # RZ gates go in (mod 3)=0 groups, R1XY gates go in (mod 3)=1 groups,
-    # and all other gates will go in (mod 3)=2 groups
-    rz_group_number = -3  # set to 0 when first RZ gate is assigned (-3 + 3 = 0)
-    r1xy_group_number = -2  # set to 1 when first R1XY gate is assigned (-2 + 3 = 1)
-    other_group_number = -1  # set to 2 when first other gate is assigned (-1 + 3 = 2)
-    num_scs_per_qubit: dict[UnitID, int] = {}
-    group_exec_order: list[int] = []
-
-    for qubit, cmds in sub_commands.items():
-        num_scs_per_qubit[qubit] = len(cmds)
-
-    max_len = max(num_scs_per_qubit.values())
-
-    for index in range(max_len):
-        for qubit, cmds in sub_commands.items():
-            # make sure the qubits are inserted into
-            # qubits2groups in the order in which they appear
-            if qubit not in qubits2groups:
-                # set every qubit's group id to be a default value -4
-                # prevents KeyError in check for group number
-                # will get set to a valid group number the first time the qubit is used
-                qubits2groups[qubit] = -4
-            # check to make sure you are not accessing beyond the end of the list
-            if index < num_scs_per_qubit[qubit]:
-                sc = cmds[index]
-                gate = sc.op.type
-                match gate:
-                    case tk.OpType.Rz:
-                        group_number = rz_group_number
-                        valid_pll_op = True
-                    case tk.OpType.PhasedX:
-                        group_number = r1xy_group_number
-                        valid_pll_op = True
-                    case _:
-                        group_number = other_group_number
-                        valid_pll_op = False
-                # does a group exist for that gate type?
-                group_available = group_number in groups
-                # is the group size still under the maximum allowed parallel ops?
-                group_size = len(groups[group_number]) if group_number in groups else 0
-                group_not_too_large = group_size < max_parallel_sq_gates
-                # is the op parallelizable (only RZ or R1XY)?
-                if (
-                    group_available
-                    and exec_order_preserved(
-                        group_exec_order, group_number, qubits2groups[qubit]
-                    )
-                    and group_not_too_large
-                    and valid_pll_op
-                ):
-                    groups[group_number].append(sc)
-                    qubits2groups[qubit] = group_number
-                else:
-                    # make a new group:
-                    match gate:
-                        case tk.OpType.Rz:
-                            rz_group_number += 3
-                            group_number = rz_group_number
-                        case tk.OpType.PhasedX:
-                            r1xy_group_number += 3
-                            group_number = r1xy_group_number
-                        case _:
-                            other_group_number += 3
-                            group_number = other_group_number
-                    groups[group_number] = [sc]
-                    group_exec_order.append(group_number)
-                    qubits2groups[qubit] = group_number
+    # the most recent group in which each qubit was used, set to a default value
+    # of -4 until it is first used, to prevent a KeyError in the check for group
+    # number
+    qubits2groups: dict[UnitID, int] = dict.fromkeys(sub_commands, -4)
+    # group numbers for each gate are incremented by the number of gate types so
+    # they don't overlap and different gate types don't go in the same group
+    # the n-th parallel gate type goes in (mod num_types)=n groups, e.g. RZ gates
+    # in (mod 3)=0 and R1XY gates in (mod 3)=1 groups by default, and all other
+    # gates will go in the last, e.g. (mod 3)=2, groups
+    gate_ranks = {gate: rank for rank, gate in enumerate(parallel_sq_gates)}
+    num_types = len(parallel_sq_gates) + 1
+    # the latest group number of each type, set to the first group number minus
+    # num_types until the first gate of the type is assigned
+    latest_groups = list(range(-num_types, 0))
+    # position of each group in execution order, i.e. in order of creation
+    group_positions: dict[int, int] = {}
+
+    # the qubits with sub-commands left, dropped as they run out so that each
+    # round only visits those
+    remaining = list(sub_commands.items())
+    index = 0
+    while remaining:
+        remaining = [(qubit, cmds) for qubit, cmds in remaining if index < len(cmds)]
+        for qubit, cmds in remaining:
+            sc = cmds[index]
+            valid_pll_op = sc.op.type in gate_ranks
+            rank = gate_ranks[sc.op.type] if valid_pll_op else num_types - 1
+            group_number = latest_groups[rank]
+            # does a group exist for that gate type?
+            group_available = group_number in groups
+            # is the group size still under the maximum allowed parallel ops?
+            group_size = len(groups[group_number]) if group_number in groups else 0
+            group_not_too_large = group_size < max_parallel_sq_gates
+            # is the op parallelizable (one of parallel_sq_gates)?
+            if (
+                group_available
+                and exec_order_preserved(
+                    group_positions, group_number, qubits2groups[qubit]
+                )
+                and group_not_too_large
+                and valid_pll_op
+            ):
+                groups[group_number].append(sc)
+                qubits2groups[qubit] = group_number
+            else:
+                # make a new group:
+                latest_groups[rank] += num_types
+                group_number = latest_groups[rank]
+                groups[group_number] = [sc]
+                group_positions[group_number] = len(group_positions)
+                qubits2groups[qubit] = group_number
+        index += 1
 
     return dict(groups.items())
 
 
-def groups2qops(groups: dict[int, list[tk.Command]], ops: list["JsonDict"]) -> None:  # noqa: PLR0912
-    """Convert the groups of parallel ops to properly formatted PHIR."""
+def group_sub_commands(
+    sub_commands: dict["UnitID", list[tk.Command]],
+    machine: "Machine",
+    *,
+    sq_packing: SqPacking = SqPacking.greedy,
+    packing_stats: PackingStats | None = None,
+) -> dict[int, list[tk.Command]]:
+    """Create parallelizable groups of sub-commands with the chosen packing.
+
+    Args:
+        sub_commands: the sub-commands of each qubit, in order
+        machine: the QTM machine the groups run on
+        sq_packing: how to pack the sub-commands, see `SqPacking`
+        packing_stats: (Optional) statistics to add the groups to
+    """
+    max_parallel_sq_gates = len(machine.sq_options) // 2
+    parallel_sq_gates = machine.parallel_sq_gates
+    greedy = process_sub_commands(
+        sub_commands, max_parallel_sq_gates, parallel_sq_gates
+    )
+    groups = greedy
+    if sq_packing == SqPacking.optimal and len(greedy) > min_rounds(
+        sub_commands, max_parallel_sq_gates, parallel_sq_gates
+    ):
+        packed = pack_sub_commands(
+            sub_commands, max_parallel_sq_gates, parallel_sq_gates
+        )
+        # the search can fall short of optimal when it has to prune
+        if len(packed) <= len(greedy):
+            groups = packed
+    if packing_stats is not None:
+        packing_stats.record(groups.values(), len(greedy), machine)
+    return groups
+
+
+def canonical_angles(op: tk.Op, tolerance: float) -> tuple[float, ...] | None:
+    """Reduce the angles of a gate so that equivalent gates have equal angles.
+
+    Numeric angles, in half-turns, are reduced modulo 2, which only changes the
+    global phase of the gates PHIR supports, and rounded to the decimal digits of
+    `tolerance`, so that float noise such as -4.4e-16 becomes 0.
+
+    Args:
+        op: a gate, with or without angles
+        tolerance: the largest difference between angles deemed float noise
+
+    Returns:
+        the reduced angles, or None if the gate is a rotation by zero, i.e. the
+        identity up to global phase
+    """
+    ndigits = max(0, math.ceil(-math.log10(tolerance)))
+    angles = tuple(
+        round(param % 2, ndigits) % 2 + 0.0 if isinstance(param, int | float) else param
+        for param in op.params
+    )
+    if angles and (
+        # PhasedX is a rotation by its first angle about an axis set by the second
+        angles[0] == 0 if op.type == tk.OpType.PhasedX else not any(angles)
+    ):
+        return None
+    return angles
+
+
+def groups2qops(  # noqa: PLR0912
+    groups: dict[int, list[tk.Command]],
+    ops: list["JsonDict"],
+    *,
+    comments: bool = True,
+    register_sizes: "Mapping[str, int] | None" = None,
+    angle_tolerance: float | None = None,
+) -> None:
+    """Convert the groups of parallel ops to properly formatted PHIR.
+
+    Args:
+        groups: the groups of commands, in execution order
+        ops: the PHIR ops to append to
+        comments: whether to precede ops with comments showing their commands
+        register_sizes: size of each classical register, see `get_register_sizes`
+        angle_tolerance: (Optional) group gates by angles reduced with this
+            tolerance, and drop rotations by zero, see `canonical_angles`
+    """
     for group in groups.values():
         angles2qops: dict[tuple[float, ...], JsonDict] = {}
-        for qop in group:
-            if not qop.op.is_gate():
-                append_cmd(qop, ops)
+        # the last command emitted, which the comments show
+        qop = group[0]
+        for cmd in group:
+            if not cmd.op.is_gate():
+                append_cmd(cmd, ops, comments=comments, register_sizes=register_sizes)
             else:
-                angles = qop.op.params
-                if tuple(angles) not in angles2qops:
-                    fmt_qop: JsonDict = {
-                        "qop": tket_gate_to_phir[qop.op.type],
-                        "angles": [angles, "pi"],
-                    }
+                if angle_tolerance is None:
+                    angles: tuple[float, ...] | None = tuple(cmd.op.params)
+                else:
+                    angles = canonical_angles(cmd.op, angle_tolerance)
+                if angles is None:
+                    # a rotation by zero
+                    continue
+                qop = cmd
+                if angles not in angles2qops:
+                    fmt_qop: JsonDict = {"qop": tket_gate_to_phir[qop.op.type]}
+                    if angles:
+                        fmt_qop["angles"] = [list(angles), "pi"]
                     if len(qop.qubits) == 1:
                         fmt_qop["args"] = [arg_to_bit(qop.qubits[0])]
                     else:
                         arg = [arg_to_bit(a) for a in qop.qubits]
                         fmt_qop["args"] = [arg]
-                    angles2qops[tuple(angles)] = fmt_qop
+                    angles2qops[angles] = fmt_qop
                 else:
-                    fmt_qop = angles2qops[tuple(angles)]
+                    fmt_qop = angles2qops[angles]
                     if len(qop.qubits) == 1:
                         fmt_qop["args"].append(arg_to_bit(qop.qubits[0]))
                     else:
@@ -162,15 +264,17 @@ def groups2qops(groups: dict[int, list[tk.Command]], ops: list["JsonDict"]) -> N
             pll_block: JsonDict = {"block": "qparallel", "ops": []}
             for phir_qop in angles2qops.values():
                 pll_block["ops"].append(phir_qop)
-            comment = {"//": f"Parallel {tket_gate_to_phir[qop.op.type]}"}
-            ops.extend((comment, pll_block))
+            if comments:
+                ops.append({"//": f"Parallel {tket_gate_to_phir[qop.op.type]}"})
+            ops.append(pll_block)
         else:
             for phir_qop in angles2qops.values():
-                if len(phir_qop["args"]) > 1:
-                    comment = {"//": "Parallel " + str(qop).split(" q", maxsplit=1)[0]}
-                else:
-                    comment = {"//": str(qop)}
-                ops.extend((comment, phir_qop))
+                if comments and len(phir_qop["args"]) > 1:
+                    text = "Parallel " + str(qop).split(" q", maxsplit=1)[0]
+                    ops.append({"//": text})
+                elif comments:
+                    ops.append({"//": str(qop)})
+                ops.append(phir_qop)
 
 
 def process_shards(
@@ -215,47 +319,63 @@ def process_shards(
             types2groups[shard.primary_command.op.type] = group_tracker
             group_tracker += 1
 
-    groups = consolidate_sub_commands(groups)
     return dict(sorted(groups.items()))
 
 
 def consolidate_sub_commands(
-    groups: dict[int, list["Shard"]],
-) -> dict[int, list["Shard"]]:
-    """Group all the sub_commands into the first shard in the group.
-
-    This allows maximum parallelization of sub-commands across shards.
+    shards: list["Shard"],
+) -> dict["UnitID", list[tk.Command]]:
+    """Gather the sub-commands of a group of shards, keyed by qubit.
+
+    This allows maximum parallelization of sub-commands across shards. The shards
+    are left as they are, so the same placement can be converted again, e.g. to
+    serial PHIR or with other parallel limits; the lists of sub-commands are
+    shared with them and must not be modified.
     """
-    for shards in groups.values():
-        # stuckee == the shard that gets 'stuck' with all the sub-commands
-        stuckee = shards[0]
-        # if the group of shards only contains one element, do nothing,
-        # the sub-commands are already packed into one shard
-        if len(shards) > 1:
-            for i in range(1, len(shards)):
-                working_shard = shards[i]
-                stuckee.sub_commands.update(working_shard.sub_commands)
-                working_shard.sub_commands.clear()
-    return groups
+    if len(shards) == 1:
+        return shards[0].sub_commands
+    sub_commands: dict[UnitID, list[tk.Command]] = {}
+    for shard in shards:
+        sub_commands.update(shard.sub_commands)
+    return sub_commands
 
 
 def format_and_add_primary_commands(
-    group: list["Shard"], ops: list["JsonDict"]
+    group: list["Shard"],
+    ops: list["JsonDict"],
+    *,
+    comments: bool = True,
+    register_sizes: "Mapping[str, int] | None" = None,
+    angle_tolerance: float | None = None,
 ) -> None:
-    """Create properly formatted PHIR for parallel primary commands."""
-    if len(group) == 1:
-        append_cmd(group[0].primary_command, ops)
+    """Create properly formatted PHIR for parallel primary commands.
+
+    Args:
+        group: a group of parallelizable shards
+        ops: the PHIR ops to append to
+        comments: whether to precede ops with comments showing their commands
+        register_sizes: size of each classical register, see `get_register_sizes`
+        angle_tolerance: (Optional) group gates by angles reduced with this
+            tolerance, and drop rotations by zero, see `canonical_angles`
+    """
+    first = group[0].primary_command
+    # a single gate with angles may still reduce to the identity
+    canonical = angle_tolerance is not None and first.op.is_gate() and first.op.params
+    if len(group) == 1 and not canonical:
+        append_cmd(
+            group[0].primary_command,
+            ops,
+            comments=comments,
+            register_sizes=register_sizes,
+            range_predicate=group[0].range_predicate,
+        )
     else:
         num_angles = len(group[0].primary_command.op.params)
         # format the ops with no angles
         if num_angles == 0:
             gate_type = tket_gate_to_phir[group[0].primary_command.op.type]
-            # for init, just append normally
-            if gate_type == "Init":
-                for shard in group:
-                    append_cmd(shard.primary_command, ops)
             # for measure, format and include "returns"
-            elif gate_type == "Measure":
+            if gate_type == "Measure":
                 fmt_measure: JsonDict = {
                     "qop": "Measure",
                     "args": [],
@@ -271,13 +391,18 @@ def format_and_add_primary_commands(
                 fmt_qop: JsonDict = {"qop": gate_type, "args": []}
                 for shard in group:
                     pc = shard.primary_command
-                    fmt_qop["args"].append(arg_to_bit(pc.args[0]))
+                    if len(pc.qubits) == 1:
+                        fmt_qop["args"].append(arg_to_bit(pc.args[0]))
+                    else:
+                        fmt_qop["args"].append([arg_to_bit(a) for a in pc.qubits])
                 ops.append(fmt_qop)
         else:
             fmt_g2q: dict[int, list[tk.Command]] = {0: []}
             for shard in group:
                 fmt_g2q[0].append(shard.primary_command)
-            groups2qops(fmt_g2q, ops)
+            groups2qops(
+                fmt_g2q, ops, comments=comments, angle_tolerance=angle_tolerance
+            )
 
 
 def get_transport_time_for_gate(gate: str, machine: "Machine") -> float:
@@ -291,71 +416,325 @@ def get_transport_time_for_gate(gate: str, machine: "Machine") -> float:
             return machine.meas_prep_time
         case "Init":
             return 0
+        case _ if gate in _phir_gates(machine.parallel_sq_gates):
+            return machine.sq_time
         case _:
             logger.warning("Gate type %s not assigned a transport duration", gate)
             return 0
 
 
-def adjust_phir_transport_time(ops: list["JsonDict"], machine: "Machine") -> None:
-    """Analyze the generated phir and adjust the transport time."""
+@cache
+def _phir_gates(gates: tuple[tk.OpType, ...]) -> frozenset[str]:
+    return frozenset(tket_gate_to_phir[gate] for gate in gates)
+
+
+def adjust_phir_transport_time(
+    ops: list["JsonDict"], machine: "Machine", *, timeline: "Timeline | None" = None
+) -> None:
+    """Analyze the generated phir and adjust the transport time.
+
+    Args:
+        ops: the PHIR ops, each layer ending in a Transport
+        machine: the QTM machine whose gate times are added
+        timeline: (Optional) timeline to add the gates and layers to
+    """
     adjustment = 0.0
     for op in ops:
+        qops: list[JsonDict] = []
         if "qop" in op:
-            adjustment += get_transport_time_for_gate(op["qop"], machine)
+            qops = [op]
         if "block" in op and op["block"] == "qparallel":
-            first_op = op["ops"][0]["qop"]
-            adjustment += get_transport_time_for_gate(first_op, machine)
+            qops = op["ops"]
+        if qops:
+            duration = get_transport_time_for_gate(qops[0]["qop"], machine)
+            adjustment += duration
+            if timeline is not None:
+                timeline.add_gates(qops, duration)
         if "mop" in op and op["mop"] == "Transport":
             cost, units = op["duration"]
             op["duration"] = cost + adjustment, units
+            if timeline is not None:
+                timeline.add_layer(cost, adjustment)
             adjustment = 0.0
 
 
-def genphir_parallel(
-    inp: list[tuple["Ordering", "ShardLayer", "Cost"]],
-    circuit: "Circuit",
+def genphir_parallel_layers(  # noqa: PLR0913
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
     machine: "Machine",
-) -> str:
-    """Convert a list of shards to the equivalent PHIR with parallel gating.
+    *,
+    machine_ops: bool = True,
+    comments: bool = True,
+    optimize_classical: bool = False,
+    register_sizes: "Mapping[str, int] | None" = None,
+    sq_packing: SqPacking = SqPacking.greedy,
+    packing_stats: PackingStats | None = None,
+    angle_tolerance: float | None = None,
+    timeline: "Timeline | None" = None,
+) -> "Iterator[list[JsonDict]]":
+    """Lazily convert each layer of shards to the equivalent parallel PHIR ops.
 
     Args:
-        inp: list of shards
-        circuit: corresponding tket Circuit
-        machine: a QTM machine on which to simulate the circuit
+        inp: layers of shards, consumed one at a time
+        machine: a QTM machine on which to simulate the circuit, or a
+            `generic_machine` that only limits the size of parallel groups
+        machine_ops: whether to end each layer with a Transport machine op
+        comments: whether to precede ops with comments showing their commands
+        optimize_classical: whether to simplify classical expressions, see
+            `ClassicalOptimizer`
+        register_sizes: size of each classical register, see `get_register_sizes`
+        sq_packing: how to pack single-qubit sub-commands into parallel groups,
+            see `SqPacking`
+        packing_stats: (Optional) statistics filled in with the groups of
+            sub-commands, see `PackingStats`
+        angle_tolerance: (Optional) group gates by angles reduced with this
+            tolerance, and drop rotations by zero, see `canonical_angles`
+        timeline: (Optional) timeline filled in with the estimated time of each
+            layer and qubit, see `Timeline`
     """
+    optimizer = ClassicalOptimizer(WORDSIZE) if optimize_classical else None
     max_parallel_tq_gates = len(machine.tq_options) // 2
     max_parallel_sq_gates = len(machine.sq_options) // 2
 
-    phir = PHIR_HEADER
-    phir["metadata"]["strict_parallelism"] = True
-    ops: list[JsonDict] = []
-
     for _orders, shard_layer, layer_cost in inp:
+        ops: list[JsonDict] = []
         # within each shard layer, create groups of parallelizable shards
-        # squash all the sub-commands into the first shard in the group
+        # and gather the sub-commands of each group to parallelize them together
         shard_groups = process_shards(
             shard_layer, max_parallel_tq_gates, max_parallel_sq_gates
         )
         for group in shard_groups.values():
-            for shard in group:
-                if shard.sub_commands.values():
-                    # sub-commands are always sq gates
-                    subcmd_groups = process_sub_commands(
-                        shard.sub_commands, max_parallel_sq_gates
-                    )
-                    groups2qops(subcmd_groups, ops)
-            format_and_add_primary_commands(group, ops)
-
-        ops.append(
-            {
-                "mop": "Transport",
-                "duration": (layer_cost, "ms"),
-            },
-        )
-    adjust_phir_transport_time(ops, machine)
+            sub_commands = consolidate_sub_commands(group)
+            if sub_commands:
+                # sub-commands are always sq gates
+                subcmd_groups = group_sub_commands(
+                    sub_commands,
+                    machine,
+                    sq_packing=sq_packing,
+                    packing_stats=packing_stats,
+                )
+                groups2qops(
+                    subcmd_groups,
+                    ops,
+                    comments=comments,
+                    register_sizes=register_sizes,
+                    angle_tolerance=angle_tolerance,
+                )
+            format_and_add_primary_commands(
+                group,
+                ops,
+                comments=comments,
+                register_sizes=register_sizes,
+                angle_tolerance=angle_tolerance,
+            )
+
+        if optimizer:
+            ops = optimizer.optimize_ops(ops)
+        if machine_ops:
+            ops.append(
+                {
+                    "mop": "Transport",
+                    "duration": (layer_cost, "ms"),
+                },
+            )
+            # every layer ends in a transport, so the adjustment never spans layers
+            adjust_phir_transport_time(ops, machine, timeline=timeline)
+        yield ops
+
+
+def genphir_parallel_program(  # noqa: PLR0913
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+    circuit: "Circuit",
+    machine: "Machine",
+    *,
+    machine_ops: bool = True,
+    validation: ValidationLevel = ValidationLevel.full,
+    profile: EmitProfile = EmitProfile.commented,
+    source_map: dict[int, str] | None = None,
+    optimize_classical: bool = False,
+    sq_packing: SqPacking = SqPacking.greedy,
+    packing_stats: PackingStats | None = None,
+    angle_tolerance: float | None = None,
+    timeline: "Timeline | None" = None,
+    peephole: bool = False,
+) -> "JsonDict":
+    """Convert a list of shards to the equivalent PHIR program with parallel gating.
 
+    Args:
+        inp: list of shards, or an iterator such as `iter_place_and_route`
+        circuit: corresponding tket Circuit
+        machine: a QTM machine on which to simulate the circuit, or a
+            `generic_machine` that only limits the size of parallel groups
+        machine_ops: whether to end each layer with a Transport machine op
+        validation: how much of the generated PHIR to validate
+        profile: what to include besides the ops, see `EmitProfile`
+        source_map: map of op index to command text filled in by the source-mapped
+            profile, see `profile_layers`
+        optimize_classical: whether to simplify classical expressions, see
+            `ClassicalOptimizer`
+        sq_packing: how to pack single-qubit sub-commands into parallel groups,
+            see `SqPacking`
+        packing_stats: (Optional) statistics filled in with the groups of
+            sub-commands, see `PackingStats`
+        angle_tolerance: (Optional) group gates by angles reduced with this
+            tolerance, and drop rotations by zero, see `canonical_angles`
+        timeline: (Optional) timeline filled in with the estimated time of each
+            layer and qubit, see `Timeline`
+        peephole: whether to clean up the generated ops, see `PeepholeOptimizer`
+    """
     decls = get_decls(circuit.q_registers, circuit.c_registers)
+    if timeline is not None:
+        timeline.add_qubits(map(str, circuit.qubits))
+    layers = genphir_parallel_layers(
+        inp,
+        machine,
+        machine_ops=machine_ops,
+        comments=profile != EmitProfile.compact,
+        optimize_classical=optimize_classical,
+        register_sizes=get_register_sizes(circuit.c_registers),
+        sq_packing=sq_packing,
+        packing_stats=packing_stats,
+        angle_tolerance=angle_tolerance,
+        timeline=timeline,
+    )
+    if peephole:
+        layers = PeepholeOptimizer(
+            max_parallel_sq_gates=len(machine.sq_options) // 2,
+            max_parallel_tq_gates=len(machine.tq_options) // 2,
+        ).optimize_layers(layers)
+    return build_phir(
+        phir_header(strict_parallelism=True),
+        decls,
+        profile_layers(layers, profile, len(decls), source_map),
+        validation,
+    )
 
-    phir["ops"] = decls + ops
-    PHIRModel.model_validate(phir)
-    return json.dumps(phir)
+
+@overload
+def genphir_parallel(
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+    circuit: "Circuit",
+    machine: "Machine",
+    *,
+    out: None = ...,
+    machine_ops: bool = ...,
+    validation: ValidationLevel = ...,
+    profile: EmitProfile = ...,
+    source_map: dict[int, str] | None = ...,
+    optimize_classical: bool = ...,
+    sq_packing: SqPacking = ...,
+    packing_stats: PackingStats | None = ...,
+    angle_tolerance: float | None = ...,
+    timeline: "Timeline | None" = ...,
+    peephole: bool = ...,
+) -> str: ...
+
+
+@overload
+def genphir_parallel(
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+    circuit: "Circuit",
+    machine: "Machine",
+    *,
+    out: "TextIO",
+    machine_ops: bool = ...,
+    validation: ValidationLevel = ...,
+    profile: EmitProfile = ...,
+    source_map: dict[int, str] | None = ...,
+    optimize_classical: bool = ...,
+    sq_packing: SqPacking = ...,
+    packing_stats: PackingStats | None = ...,
+    angle_tolerance: float | None = ...,
+    timeline: "Timeline | None" = ...,
+    peephole: bool = ...,
+) -> None: ...
+
+
+def genphir_parallel(  # noqa: PLR0913
+    inp: "Iterable[tuple[Ordering, ShardLayer, Cost]]",
+    circuit: "Circuit",
+    machine: "Machine",
+    *,
+    out: "TextIO | None" = None,
+    machine_ops: bool = True,
+    validation: ValidationLevel = ValidationLevel.full,
+    profile: EmitProfile = EmitProfile.commented,
+    source_map: dict[int, str] | None = None,
+    optimize_classical: bool = False,
+    sq_packing: SqPacking = SqPacking.greedy,
+    packing_stats: PackingStats | None = None,
+    angle_tolerance: float | None = None,
+    timeline: "Timeline | None" = None,
+    peephole: bool = False,
+) -> str | None:
+    """Convert a list of shards to the equivalent PHIR with parallel gating.
+
+    Args:
+        inp: list of shards, or an iterator such as `iter_place_and_route`
+        circuit: corresponding tket Circuit
+        machine: a QTM machine on which to simulate the circuit, or a
+            `generic_machine` that only limits the size of parallel groups
+        out: (Optional) text stream to write the PHIR to incrementally instead of
+            returning it, see `write_phir`
+        machine_ops: whether to end each layer with a Transport machine op
+        validation: how much of the generated PHIR to validate
+        profile: what to include besides the ops, see `EmitProfile`
+        source_map: map of op index to command text filled in by the source-mapped
+            profile, see `profile_layers`
+        optimize_classical: whether to simplify classical expressions, see
+            `ClassicalOptimizer`
+        sq_packing: how to pack single-qubit sub-commands into parallel groups,
+            see `SqPacking`
+        packing_stats: (Optional) statistics filled in with the groups of
+            sub-commands, see `PackingStats`
+        angle_tolerance: (Optional) group gates by angles reduced with this
+            tolerance, and drop rotations by zero, see `canonical_angles`
+        timeline: (Optional) timeline filled in with the estimated time of each
+            layer and qubit, see `Timeline`
+        peephole: whether to clean up the generated ops, see `PeepholeOptimizer`
+    """
+    if out is None:
+        return json.dumps(
+            genphir_parallel_program(
+                inp,
+                circuit,
+                machine,
+                machine_ops=machine_ops,
+                validation=validation,
+                profile=profile,
+                source_map=source_map,
+                optimize_classical=optimize_classical,
+                sq_packing=sq_packing,
+                packing_stats=packing_stats,
+                angle_tolerance=angle_tolerance,
+                timeline=timeline,
+                peephole=peephole,
+            )
+        )
+    decls = get_decls(circuit.q_registers, circuit.c_registers)
+    if timeline is not None:
+        timeline.add_qubits(map(str, circuit.qubits))
+    layers = genphir_parallel_layers(
+        inp,
+        machine,
+        machine_ops=machine_ops,
+        comments=profile != EmitProfile.compact,
+        optimize_classical=optimize_classical,
+        register_sizes=get_register_sizes(circuit.c_registers),
+        sq_packing=sq_packing,
+        packing_stats=packing_stats,
+        angle_tolerance=angle_tolerance,
+        timeline=timeline,
+    )
+    if peephole:
+        layers = PeepholeOptimizer(
+            max_parallel_sq_gates=len(machine.sq_options) // 2,
+            max_parallel_tq_gates=len(machine.tq_options) // 2,
+        ).optimize_layers(layers)
+    write_phir(
+        phir_header(strict_parallelism=True),
+        decls,
+        profile_layers(layers, profile, len(decls), source_map),
+        out,
+        validation,
+    )
+    return None
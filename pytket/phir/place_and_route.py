@@ -13,48 +13,69 @@ from .routing import transport_cost
 from .sharding.shards2ops import parse_shards_naive
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     from .machine import Machine
     from .sharding.shard import Cost, Ordering, Shard, ShardLayer
 
 
-def place_and_route(
+def iter_place_and_route(
     shards: list["Shard"],
     machine: "Machine | None" = None,
-) -> list[tuple["Ordering", "ShardLayer", "Cost"]]:
-    """Get all the routing info needed for PHIR generation."""
-    shard_set = set(shards)
-    circuit_rep, shard_layers = parse_shards_naive(shard_set)
-    if machine:
-        initial_order = list(range(machine.size))
-    layer_num = 0
-    orders: list[Ordering] = []
-    layer_costs: list[Cost] = []
-    net_cost: float = 0.0
-    if machine:
-        for layer in circuit_rep:
-            order = optimized_place(
-                layer,
-                machine.tq_options,
-                machine.sq_options,
-                machine.size,
-                initial_order,
-            )
-            orders.append(order)
-            cost = transport_cost(initial_order, order, machine.qb_swap_time)
-            layer_num += 1
-            initial_order = order
-            layer_costs.append(cost)
-            net_cost += cost
-    else:
+    *,
+    overlap_classical: bool = False,
+    defer_measurements: bool = False,
+) -> "Iterator[tuple[Ordering, ShardLayer, Cost]]":
+    """Lazily get the routing info needed for PHIR generation, one layer at a time.
+
+    The shards are layered up front, but each layer is only placed and routed when
+    it is requested, so that a streaming consumer never holds every layer at once.
+    """
+    circuit_rep, shard_layers = parse_shards_naive(
+        set(shards),
+        overlap_classical=overlap_classical,
+        defer_measurements=defer_measurements,
+        layer_capacity=len(machine.sq_options) if machine else None,
+    )
+    if not machine:
         # If no machine object specified,
         # generic lists of qubits with no placement and no routing costs,
         # only the shards
 
         # If needed later, write a helper to find the number
         # of qubits needed in the circuit
-        n = len(circuit_rep)
-        orders = [[]] * n
-        layer_costs = [0] * n
+        for shard_layer in shard_layers:
+            yield [], shard_layer, 0
+        return
 
+    initial_order = list(range(machine.size))
     # don't need a custom error for this, "strict" parameter will throw error if needed
-    return list(zip(orders, shard_layers, layer_costs, strict=True))
+    for layer, shard_layer in zip(circuit_rep, shard_layers, strict=True):
+        order = optimized_place(
+            layer,
+            machine.tq_options,
+            machine.sq_options,
+            machine.size,
+            initial_order,
+        )
+        cost = transport_cost(initial_order, order, machine.qb_swap_time)
+        initial_order = order
+        yield order, shard_layer, cost
+
+
+def place_and_route(
+    shards: list["Shard"],
+    machine: "Machine | None" = None,
+    *,
+    overlap_classical: bool = False,
+    defer_measurements: bool = False,
+) -> list[tuple["Ordering", "ShardLayer", "Cost"]]:
+    """Get all the routing info needed for PHIR generation."""
+    return list(
+        iter_place_and_route(
+            shards,
+            machine,
+            overlap_classical=overlap_classical,
+            defer_measurements=defer_measurements,
+        )
+    )
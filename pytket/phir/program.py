@@ -0,0 +1,81 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+import json
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from .encoding import Compression, Encoding, encode_phir
+
+if TYPE_CHECKING:
+    from .packing import PackingStats
+    from .phirgen import JsonDict
+    from .sharding.shard import Cost
+    from .timeline import Timeline
+
+
+@dataclass(frozen=True)
+class LayerInfo:
+    """Summary of one layer of the compiled program.
+
+    num_shards: number of shards scheduled in the layer
+    transport_cost: routing cost of placing the layer, before gate time adjustment
+    """
+
+    num_shards: int
+    transport_cost: "Cost"
+
+
+@dataclass
+class PhirProgram:
+    """A compiled PHIR program, kept as a dict until it is serialized.
+
+    phir: the PHIR program, already validated during generation
+    layers: summary of each layer, in execution order
+    source_map: pytket command text keyed by the index of the op it became, for
+        programs emitted without comments, see `EmitProfile.source_mapped`
+    packing: how single-qubit sub-commands were packed into parallel groups, for
+        programs with parallel gating
+    timeline: estimated timeline of the program on the machine, for programs with
+        parallel gating
+    """
+
+    phir: "JsonDict"
+    layers: list[LayerInfo] = field(default_factory=list)
+    source_map: dict[int, str] | None = None
+    packing: "PackingStats | None" = None
+    timeline: "Timeline | None" = None
+
+    @property
+    def num_ops(self) -> int:
+        """Number of top-level ops, including declarations."""
+        return len(self.phir["ops"])
+
+    @property
+    def num_shards(self) -> int:
+        """Number of shards across all layers."""
+        return sum(layer.num_shards for layer in self.layers)
+
+    def to_json(self) -> str:
+        """Serialize the program to PHIR JSON."""
+        return json.dumps(self.phir)
+
+    def to_bytes(
+        self,
+        encoding: Encoding = Encoding.json,
+        compression: Compression = Compression.none,
+    ) -> bytes:
+        """Serialize the program, to UTF-8 encoded PHIR JSON by default.
+
+        Args:
+            encoding: serialization format, see `Encoding`
+            compression: compression applied to the serialized program
+        """
+        return encode_phir(self.phir, encoding, compression)
@@ -10,7 +10,7 @@ from enum import Enum
 
 from pytket.circuit import OpType
 
-from .machine import Machine, MachineTimings
+from .machine import ALL_PARALLEL_SQ_GATES, Machine, MachineTimings
 
 
 class QtmMachine(Enum):
@@ -21,6 +21,9 @@ class QtmMachine(Enum):
 
 QTM_DEFAULT_GATESET = {OpType.Rz, OpType.PhasedX, OpType.ZZPhase}
 
+# every single-qubit gate of H1 can run in parallel groups
+QTM_PARALLEL_SQ_GATES = ALL_PARALLEL_SQ_GATES
+
 QTM_MACHINES_MAP = {
     QtmMachine.H1: Machine(
         size=20,
@@ -32,5 +35,6 @@ QTM_MACHINES_MAP = {
             qb_swap_time=0.9,
             meas_prep_time=0.05,
         ),
+        parallel_sq_gates=QTM_PARALLEL_SQ_GATES,
     )
 }
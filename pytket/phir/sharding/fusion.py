@@ -0,0 +1,137 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+from pytket.circuit import Command, Op, OpType
+
+# rotations about a fixed axis, whose angles add up
+AXIS_ROTATIONS = frozenset({OpType.Rx, OpType.Ry, OpType.Rz, OpType.U1})
+
+# the gate each Clifford gate cancels out with
+INVERSES = {
+    OpType.H: OpType.H,
+    OpType.X: OpType.X,
+    OpType.Y: OpType.Y,
+    OpType.Z: OpType.Z,
+    OpType.S: OpType.Sdg,
+    OpType.Sdg: OpType.S,
+    OpType.T: OpType.Tdg,
+    OpType.Tdg: OpType.T,
+    OpType.SX: OpType.SXdg,
+    OpType.SXdg: OpType.SX,
+    OpType.V: OpType.Vdg,
+    OpType.Vdg: OpType.V,
+}
+
+# angles, in half-turns, closer than this to a multiple of 2 are taken as zero
+ANGLE_TOLERANCE = 1e-10
+
+
+def fuse_sq_gates(commands: list[Command]) -> list[Command]:
+    """Fuse the consecutive single-qubit gates of one qubit, in order.
+
+    Works on any gates, rebased or not, and leaves the global phase aside, as
+    PHIR does:
+
+    - consecutive rotations about the same axis, `Rx`, `Ry`, `Rz` or `U1`, are
+      merged into one by the sum of their angles;
+    - an `Rz` is moved before the `PhasedX` gates it follows, shifting their
+      phases, so that in a chain of the two the `Rz` gates gather at the front,
+      as parallel groups run them first, and the `PhasedX` gates meet;
+    - consecutive `PhasedX` gates with the same phase are merged into one by the
+      sum of their first angles;
+    - consecutive Clifford gates that are each other's inverse, e.g. `H` and `H`
+      or `S` and `Sdg`, cancel out;
+    - rotations by zero are dropped, including those left by merging.
+
+    Other commands, e.g. conditional gates, are kept as they are and nothing is
+    fused across them, nor are gates with symbolic angles.
+
+    Args:
+        commands: the sub-commands of one qubit, in order
+
+    Returns:
+        the fused commands, in order; the input ones where nothing changed
+    """
+    fused: list[Command] = []
+    for command in commands:
+        _push(fused, command)
+    return fused
+
+
+def _push(fused: list[Command], command: Command) -> None:
+    """Add a command after the fused ones, fusing it with them where possible."""
+    op = command.op
+    if _is_identity(op):
+        return
+    if op.type == OpType.Rz:
+        # move the Rz before the PhasedX gates it follows, shifting their phases
+        moved: list[Command] = []
+        while fused and (shifted := _shift_phase(fused[-1].op, op)) is not None:
+            moved.append(Command(shifted, fused.pop().args))
+        if moved:
+            _push(fused, command)
+            for phased_x in reversed(moved):
+                _push(fused, phased_x)
+            return
+    merged = _merge(fused[-1].op, op) if fused else None
+    if merged is None:
+        fused.append(command)
+        return
+    fused.pop()
+    fused.extend(Command(op, command.args) for op in merged if not _is_identity(op))
+
+
+def _shift_phase(phased_x: Op, rz: Op) -> Op | None:
+    """The PhasedX to run after an Rz, for `phased_x` then `rz`, or None."""
+    if phased_x.type != OpType.PhasedX:
+        return None
+    match _numeric_params(phased_x), _numeric_params(rz):
+        case [angle, phase], [rz_angle]:
+            # Rz(r) PhasedX(a, p) = PhasedX(a, p + r) Rz(r), as matrices
+            return Op.create(OpType.PhasedX, [angle, phase + rz_angle])
+    return None
+
+
+def _merge(first: Op, second: Op) -> list[Op] | None:
+    """The ops doing `first` then `second` as one, None if they do not fuse."""
+    op_type = first.type
+    if INVERSES.get(op_type) == second.type:
+        return []
+    if op_type != second.type:
+        return None
+    match _numeric_params(first), _numeric_params(second):
+        case [a], [b] if op_type in AXIS_ROTATIONS:
+            return [Op.create(op_type, [a + b])]
+        case [a, phase], [b, other_phase] if op_type == OpType.PhasedX and _is_zero(
+            phase - other_phase
+        ):
+            return [Op.create(op_type, [a + b, phase])]
+    return None
+
+
+def _numeric_params(op: Op) -> list[float] | None:
+    params = op.params
+    if not all(isinstance(param, int | float) for param in params):
+        return None
+    return params
+
+
+def _is_identity(op: Op) -> bool:
+    """Whether an op is a rotation by zero, i.e. the identity up to global phase."""
+    if op.type not in AXIS_ROTATIONS and op.type != OpType.PhasedX:
+        return False
+    params = _numeric_params(op)
+    return params is not None and _is_zero(params[0])
+
+
+def _is_zero(angle: float) -> bool:
+    """Whether an angle, in half-turns, is a multiple of 2."""
+    reduced = angle % 2
+    return min(reduced, 2 - reduced) < ANGLE_TOLERANCE
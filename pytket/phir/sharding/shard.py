@@ -7,8 +7,7 @@
 ##############################################################################
 
 import io
-from dataclasses import dataclass, field
-from itertools import count
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, TypeAlias
 
 if TYPE_CHECKING:
@@ -24,8 +23,8 @@ class Shard:
     we actually do placement of qubits.
     """
 
-    # The unique identifier of the shard
-    ID: int = field(default_factory=count().__next__, init=False)
+    # The identifier of the shard, unique within a run of the sharder
+    ID: int
 
     # The "schedulable" command of the shard
     primary_command: "Command"
@@ -46,8 +45,17 @@ class Shard:
     # A set of the identifiers of other shards this particular shard depends upon
     depends_upon: set[int]
 
+    # The barrier epoch of the shard, i.e. the number of full-width barriers
+    # preceding it. The first shard of each epoch is the barrier itself, and
+    # ordering across epochs is implied instead of listed in `depends_upon`
+    epoch: int = 0
+
+    # The RangePredicate whose result the primary command, a Conditional, tests,
+    # when it is fused into the condition instead of writing a scratch bit
+    range_predicate: "Command | None" = None
+
     def __hash__(self) -> int:
-        """Hashing for shards is done only by its autogen unique int ID."""
+        """Hashing for shards is done only by its unique int ID."""
         return self.ID
 
     def pretty_print(self) -> str:
@@ -64,6 +72,9 @@ class Shard:
         output.write(f"\n   Bits written: {self.bits_written}")
         output.write(f"\n   Bits read:    {self.bits_read}")
         output.write(f"\n   Depends upon: {self.depends_upon}")
+        output.write(f"\n   Epoch:        {self.epoch}")
+        if self.range_predicate is not None:
+            output.write(f"\n   Range predicate: {self.range_predicate}")
         content = output.getvalue()
         output.close()
         return content
@@ -7,10 +7,12 @@
 ##############################################################################
 
 import logging
+from itertools import count
 
-from pytket.circuit import Circuit, Command, Conditional, Op, OpType
+from pytket.circuit import BarrierOp, Circuit, Command, Conditional, Op, OpType
 from pytket.unit_id import Bit, Qubit, UnitID
 
+from .fusion import fuse_sq_gates
 from .shard import Shard
 
 NOT_IMPLEMENTED_OP_TYPES = [OpType.CircBox]
@@ -29,6 +31,8 @@ SHARD_TRIGGER_OP_TYPES = [
     OpType.WASM,
 ]
 
+_SHARD_TRIGGER_OP_TYPE_SET = frozenset(SHARD_TRIGGER_OP_TYPES)
+
 logger = logging.getLogger(__name__)
 
 
@@ -40,19 +44,51 @@ class Sharder:
     compilation pipeline.
     """
 
-    def __init__(self, circuit: Circuit) -> None:
+    def __init__(
+        self,
+        circuit: Circuit,
+        *,
+        conditional_sub_commands: bool = False,
+        fuse_range_predicates: bool = False,
+        fuse_sub_commands: bool = False,
+    ) -> None:
         """Create Sharder object.
 
         Args:
             circuit: tket Circuit
+            conditional_sub_commands: whether conditional single-qubit gates are
+                rolled up as sub-commands instead of creating their own shard
+            fuse_range_predicates: whether range predicates only read by the
+                conditions of Conditionals are fused into them, see
+                `fusable_range_predicates`
+            fuse_sub_commands: whether the sub-commands of each qubit are fused,
+                merging rotations and dropping identities, see `fuse_sq_gates`
         """
         self._circuit = circuit
+        self._n_qubits = circuit.n_qubits
+        self._conditional_sub_commands = conditional_sub_commands
+        self._fuse_range_predicates = fuse_range_predicates
+        self._fuse_sub_commands = fuse_sub_commands
+        # Pending sub-commands indexed by qubit, along with the order in which each
+        # qubit's buffer was started so that rollups keep the circuit order
         self._pending_commands: dict[UnitID, list[Command]] = {}
+        self._pending_order: dict[UnitID, int] = {}
+        self._pending_count = 0
+        # Classical bits read by the pending (conditional) sub-commands per qubit
+        self._pending_bits_read: dict[UnitID, set[UnitID]] = {}
         self._shards: list[Shard] = []
+        # Shard IDs are allocated per run, in circuit order
+        self._shard_ids = count()
         # These dictionaries map qubits/bits to the last shard that modified them
         self._qubit_touched_by: dict[UnitID, int] = {}
         self._bit_read_by: dict[UnitID, int] = {}
         self._bit_written_by: dict[UnitID, int] = {}
+        # Number of full-width barriers seen so far
+        self._epoch = 0
+        # Whether per-command debug logging is enabled, checked once per run
+        self._debug = False
+        # Whether each op type seen so far is a quantum gate
+        self._gate_types: dict[OpType, bool] = {}
 
         logger.debug("Sharder created for circuit %s", self._circuit)
 
@@ -63,48 +99,88 @@ class Sharder:
             list of Shards needed to schedule
         """
         logger.debug("Sharding beginning")
+        self._debug = logger.isEnabledFor(logging.DEBUG)
         commands = self._circuit.get_commands()
 
-        if logger.isEnabledFor(logging.DEBUG):
+        if self._debug:
             logger.debug("All commands:")
             for command in commands:
                 logger.debug(command)
 
-        for command in commands:
-            self._process_command(command)
+        fused = (
+            Sharder.fusable_range_predicates(commands)
+            if self._fuse_range_predicates
+            else {}
+        )
+        fused_predicates = set(fused.values())
+        for i, command in enumerate(commands):
+            if i in fused_predicates:
+                logger.debug("Fusing %s into its conditionals", command)
+                continue
+            predicate = fused.get(i)
+            self._process_command(
+                command, None if predicate is None else commands[predicate]
+            )
         self._cleanup_remaining_commands()
 
-        logger.debug("Shard output:")
-        for shard in self._shards:
-            logger.debug(shard)
+        if self._debug:
+            logger.debug("Shard output:")
+            for shard in self._shards:
+                logger.debug(shard)
         return self._shards
 
-    def _process_command(self, command: Command) -> None:
+    def _process_command(
+        self, command: Command, range_predicate: Command | None = None
+    ) -> None:
         """Handles a command per the type and the extant context within the Sharder.
 
         Args:
             command: tket command (operation, bits, etc)
+            range_predicate: the range predicate fused into the command's condition
         """
-        logger.debug(
-            "Processing command: %s of type %s with args: %s",
-            command.op,
-            command.op.type,
-            command.args,
-        )
-        if command.op.type in NOT_IMPLEMENTED_OP_TYPES:
-            msg = f"OpType {command.op.type} not supported!"
+        op = command.op
+        op_type = op.type
+        if self._debug:
+            logger.debug(
+                "Processing command: %s of type %s with args: %s",
+                op,
+                op_type,
+                command.args,
+            )
+        if op_type in NOT_IMPLEMENTED_OP_TYPES:
+            msg = f"OpType {op_type} not supported!"
             raise NotImplementedError(msg)
 
-        if Sharder._is_command_global_phase(command):
+        if op_type == OpType.Conditional:
+            if isinstance(op, Conditional) and op.op.type == OpType.Phase:
+                logger.debug("Ignoring global Phase gate")
+                return
+            if range_predicate is not None:
+                self._build_shard(command, range_predicate=range_predicate)
+            elif self._conditional_sub_commands and Sharder.is_conditional_sq_gate(op):
+                self._add_pending_sub_command(command, conditional=True)
+            else:
+                self._build_shard(command)
+        elif op_type == OpType.Phase:
             logger.debug("Ignoring global Phase gate")
-            return
-
-        if Sharder.should_op_create_shard(command.op):
+        elif op_type in _SHARD_TRIGGER_OP_TYPE_SET:
             self._build_shard(command)
         else:
-            self._add_pending_sub_command(command)
-
-    def _build_shard(self, command: Command) -> None:
+            # the command's qubits are needed either way, so count them instead of
+            # asking the op for its arity
+            qubits = command.qubits
+            if len(qubits) > 1 and self._is_gate_type(op):
+                self._build_shard(command, qubits)
+            else:
+                self._add_pending_sub_command(command, qubits[0])
+
+    def _build_shard(
+        self,
+        command: Command,
+        qubits: list[Qubit] | None = None,
+        *,
+        range_predicate: Command | None = None,
+    ) -> None:
         """Builds a shard.
 
         Creates a Shard object given the extant sharding context and the schedulable
@@ -112,48 +188,77 @@ class Sharder:
 
         Args:
             command: tket command (operation, bits, etc)
+            qubits: the command's qubits, if already known
+            range_predicate: the range predicate fused into the command's condition,
+                whose register bits are read instead of its scratch bit
         """
-        logger.debug("Building shard for command: %s", command)
-        # Rollup any sub commands (SQ gates) that interact with the same qubits
-        sub_commands: dict[UnitID, list[Command]] = {}
-        for key in (
-            key for key in list(self._pending_commands) if key in command.qubits
-        ):
-            sub_commands[key] = self._pending_commands.pop(key)
-
-        all_commands = [command]
-        for sub_command_list in sub_commands.values():
-            all_commands.extend(sub_command_list)
-
-        logger.debug("All shard commands: %s", all_commands)
-        qubits_used = set(command.qubits)
+        if self._debug:
+            logger.debug("Building shard for command: %s", command)
+        if qubits is None:
+            qubits = command.qubits
         bits_written = set(command.bits)
+        # Pending conditional sub-commands on other qubits must read their
+        # condition bits before this command overwrites them (WAR)
+        if self._pending_bits_read and bits_written:
+            self._flush_pending_readers(command)
+
+        # Rollup any sub commands (SQ gates) that interact with the same qubits,
+        # looking them up by qubit and keeping the order the buffers were started in
+        pending = self._pending_commands
+        rolled_up = [qubit for qubit in qubits if qubit in pending]
+        if len(rolled_up) > 1:
+            rolled_up.sort(key=self._pending_order.__getitem__)
+        sub_commands: dict[UnitID, list[Command]] = {}
         bits_read: set[Bit] = set()
-
-        for sub_command in all_commands:
-            bits_written.update(sub_command.bits)
-            bits_read.update(
-                set(filter(lambda x: isinstance(x, Bit), sub_command.args)),  # type: ignore [misc, arg-type]
-            )
+        for qubit in rolled_up:
+            sub_command_list = self._pop_pending_sub_commands(qubit)
+            sub_commands[qubit] = sub_command_list
+            # only conditional sub-commands touch any classical bits
+            if self._pending_bits_read.pop(qubit, None) is not None:
+                for sub_command in sub_command_list:
+                    bits_written.update(sub_command.bits)
+                    bits_read.update(
+                        arg for arg in sub_command.args if isinstance(arg, Bit)
+                    )
+
+        if self._debug:
+            logger.debug("Shard sub commands: %s", sub_commands)
+        qubits_used = set(qubits)
+        bits_read.update(arg for arg in command.args if isinstance(arg, Bit))
+        if range_predicate is not None:
+            bits_read.discard(range_predicate.bits[0])
+            bits_read.update(range_predicate.args[:-1])  # type: ignore [arg-type]
 
         # Handle dependency calculations
+        # A full-width barrier opens a new epoch instead of depending on the last
+        # shard to touch each qubit, and later shards are ordered after it by epoch
+        is_epoch_barrier = self._is_epoch_barrier(command, qubits)
         depends_upon = self._resolve_shard_dependencies(
-            qubits_used, bits_written, bits_read
+            set() if is_epoch_barrier else qubits_used, bits_written, bits_read
         )
+        if is_epoch_barrier:
+            self._epoch += 1
+            self._qubit_touched_by.clear()
+        elif self._debug:
+            logger.debug("Shard depends upon: %s", depends_upon)
 
         shard = Shard(
+            next(self._shard_ids),
             command,
             sub_commands,
             qubits_used,
             bits_written,
             bits_read,
             depends_upon,
+            self._epoch,
+            range_predicate,
         )
 
-        self._mark_dependencies(shard)
+        self._mark_dependencies(shard, mark_qubits=not is_epoch_barrier)
 
         self._shards.append(shard)
-        logger.debug("Appended shard: %s", shard)
+        if self._debug:
+            logger.debug("Appended shard: %s", shard)
 
     def _resolve_shard_dependencies(
         self, qubits: set[Qubit], bits_written: set[Bit], bits_read: set[Bit]
@@ -169,48 +274,37 @@ class Sharder:
             bits_written: Classical bits the command/sub-commands write to
             bits_read: Classical bits the command/sub-commands read from
         """
-        logger.debug(
-            "Resolving shard dependencies with qubits=%s bits_written=%s bits_read=%s",
-            qubits,
-            bits_written,
-            bits_read,
-        )
+        if self._debug:
+            logger.debug(
+                "Resolving shard dependencies with qubits=%s bits_written=%s "
+                "bits_read=%s",
+                qubits,
+                bits_written,
+                bits_read,
+            )
 
         depends_upon: set[int] = set()
 
+        qubit_touched_by = self._qubit_touched_by
+        bit_written_by = self._bit_written_by
+        bit_read_by = self._bit_read_by
         for qubit in qubits:
-            if qubit in self._qubit_touched_by:
-                logger.debug(
-                    "...adding shard dep %s -> qubit overlap",
-                    self._qubit_touched_by[qubit],
-                )
-                depends_upon.add(self._qubit_touched_by[qubit])
+            if qubit in qubit_touched_by:
+                depends_upon.add(qubit_touched_by[qubit])
 
         for bit_read in bits_read:
-            if bit_read in self._bit_written_by:
-                logger.debug(
-                    "...adding shard dep %s -> RAW", self._bit_written_by[bit_read]
-                )
-                depends_upon.add(self._bit_written_by[bit_read])
+            if bit_read in bit_written_by:
+                depends_upon.add(bit_written_by[bit_read])
 
         for bit_written in bits_written:
-            if bit_written in self._bit_written_by:
-                logger.debug(
-                    "...adding shard dep %s -> WAW", self._bit_written_by[bit_written]
-                )
-                depends_upon.add(self._bit_written_by[bit_written])
-            if bit_written in self._bit_read_by:
-                logger.debug(
-                    "...adding shard dep %s -> WAR", self._bit_read_by[bit_written]
-                )
-                depends_upon.add(self._bit_read_by[bit_written])
+            if bit_written in bit_written_by:
+                depends_upon.add(bit_written_by[bit_written])
+            if bit_written in bit_read_by:
+                depends_upon.add(bit_read_by[bit_written])
 
         return depends_upon
 
-    def _mark_dependencies(
-        self,
-        shard: Shard,
-    ) -> None:
+    def _mark_dependencies(self, shard: Shard, *, mark_qubits: bool = True) -> None:
         """Marks (updates) the dependency maps.
 
         This allows subsequent shard dependency resolution to have the right
@@ -218,14 +312,14 @@ class Sharder:
 
         Args:
             shard: Shard to be updated
+            mark_qubits: whether the shard becomes the last to touch its qubits,
+                which is not the case for epoch barriers
         """
-        for qubit in shard.qubits_used:
-            self._qubit_touched_by[qubit] = shard.ID
-        for bit in shard.bits_written:
-            self._bit_written_by[bit] = shard.ID
-        for bit in shard.bits_read:
-            self._bit_read_by[bit] = shard.ID
-        logger.debug("... dependencies marked")
+        shard_id = shard.ID
+        if mark_qubits:
+            self._qubit_touched_by.update(dict.fromkeys(shard.qubits_used, shard_id))
+        self._bit_written_by.update(dict.fromkeys(shard.bits_written, shard_id))
+        self._bit_read_by.update(dict.fromkeys(shard.bits_read, shard_id))
 
     def _cleanup_remaining_commands(self) -> None:
         """Cleans up any remaining subcommands.
@@ -239,14 +333,61 @@ class Sharder:
         )
         for qubit in remaining_qubits:
             logger.debug("Adding barrier for subcommands for qubit %s", qubit)
-            self._circuit.add_barrier([qubit])
-            # Easiest way to get to a command, since there's no constructor. Could
-            # create an entire orphan circuit with the matching qubits and the barrier
-            # instead, if this has unintended consequences
-            barrier_command = self._circuit.get_commands()[-1]
-            self._build_shard(barrier_command)
-
-    def _add_pending_sub_command(self, command: Command) -> None:
+            self._build_rollup_shard(qubit)
+
+    def _flush_pending_readers(self, command: Command) -> None:
+        """Flushes pending sub-commands that read bits written by a command.
+
+        Each affected qubit gets its pending sub-commands rolled up into a
+        single-qubit barrier shard ahead of the command, so that the condition
+        bits are read before they are overwritten.
+
+        Args:
+            command: tket command about to be built into a shard
+        """
+        bits_written = set(command.bits)
+        stale_qubits = [
+            qubit
+            for qubit, bits_read in self._pending_bits_read.items()
+            if qubit not in command.qubits and not bits_read.isdisjoint(bits_written)
+        ]
+        for qubit in stale_qubits:
+            logger.debug("Flushing pending sub-commands for qubit %s", qubit)
+            self._build_rollup_shard(qubit)
+
+    def _build_rollup_shard(self, qubit: UnitID) -> None:
+        """Builds a single-qubit barrier shard rolling up the qubit's sub-commands.
+
+        The barrier is built in an orphan circuit, since there's no constructor for
+        commands, which leaves the input circuit untouched.
+
+        Args:
+            qubit: qubit whose pending sub-commands are rolled up
+        """
+        orphan = Circuit()
+        orphan.add_qubit(qubit)  # type: ignore [arg-type]
+        orphan.add_barrier([qubit])
+        self._build_shard(orphan.get_commands()[0])
+
+    def _pop_pending_sub_commands(self, qubit: UnitID) -> list[Command]:
+        """Takes the pending sub-commands of a qubit, fused if so configured.
+
+        Args:
+            qubit: qubit whose pending sub-commands are rolled up
+        """
+        sub_commands = self._pending_commands.pop(qubit)
+        del self._pending_order[qubit]
+        if self._fuse_sub_commands:
+            return fuse_sq_gates(sub_commands)
+        return sub_commands
+
+    def _add_pending_sub_command(
+        self,
+        command: Command,
+        qubit_key: UnitID | None = None,
+        *,
+        conditional: bool = False,
+    ) -> None:
         """Adds a pending command.
 
         Adds a pending sub command to the buffer to be flushed when a schedulable
@@ -254,12 +395,36 @@ class Sharder:
 
         Args:
             command:  tket command (operation, bits, etc)
+            qubit_key: the qubit the command acts on, if already known
+            conditional: whether the command is a conditional gate
         """
-        qubit_key = command.qubits[0]
-        if qubit_key not in self._pending_commands:
-            self._pending_commands[qubit_key] = []
-        self._pending_commands[qubit_key].append(command)
-        logger.debug("Added pending sub-command %s", command)
+        if qubit_key is None:
+            qubit_key = command.qubits[0]
+        pending = self._pending_commands.get(qubit_key)
+        if pending is None:
+            self._pending_commands[qubit_key] = [command]
+            self._pending_order[qubit_key] = self._pending_count
+            self._pending_count += 1
+        else:
+            pending.append(command)
+        if conditional and isinstance(op := command.op, Conditional):
+            self._pending_bits_read.setdefault(qubit_key, set()).update(
+                command.args[: op.width]
+            )
+        if self._debug:
+            logger.debug("Added pending sub-command %s", command)
+
+    def _is_gate_type(self, op: Op) -> bool:
+        """Check if an operation is a gate, caching the answer per op type.
+
+        Args:
+            op: operation
+        """
+        op_type = op.type
+        is_gate = self._gate_types.get(op_type)
+        if is_gate is None:
+            is_gate = self._gate_types[op_type] = op.is_gate()
+        return is_gate
 
     @staticmethod
     def should_op_create_shard(op: Op) -> bool:
@@ -279,6 +444,99 @@ class Sharder:
             or (op.is_gate() and op.n_qubits > 1)
         )
 
+    def _is_epoch_barrier(self, command: Command, qubits: list[Qubit]) -> bool:
+        """Check if a command is a plain barrier across every qubit of the circuit.
+
+        Args:
+            command: Command to evaluate
+            qubits: the command's qubits
+        """
+        return (
+            0 < len(qubits) == self._n_qubits
+            and isinstance(op := command.op, BarrierOp)
+            and not op.data
+        )
+
+    @staticmethod
+    def fusable_range_predicates(commands: list[Command]) -> dict[int, int]:
+        """Find the range predicates that can be fused into the Conditionals after.
+
+        A `RangePredicate` writes whether a register is in a range to a scratch bit,
+        which is then tested by the condition of one or more Conditionals. It can be
+        fused into them, so that each tests the register directly, as long as:
+
+        - every later command using its scratch bit is a Conditional whose only
+          condition bit it is, and that does not otherwise use it;
+        - none of its register bits are written before the last of those.
+
+        The scratch bit is then never written, so it keeps its initial value.
+
+        Args:
+            commands: the commands of the circuit, in order
+
+        Returns:
+            the index of the predicate to fuse into each of those Conditionals, by
+            index in `commands`; predicates not read by any Conditional are not
+            fused
+        """
+        # scratch bit -> index of the predicate that last wrote it, for predicates
+        # whose register bits have not been written since
+        current: dict[UnitID, int] = {}
+        # scratch bit -> index of the predicate that last wrote it, for the others,
+        # which can only be fused if the scratch bit is not read any more
+        stale: dict[UnitID, int] = {}
+        # register bit -> scratch bits of the current predicates that read it
+        read_by: dict[UnitID, set[UnitID]] = {}
+        consumers: dict[int, list[int]] = {}
+        for i, command in enumerate(commands):
+            op = command.op
+            args = command.args
+            condition_bit = (
+                args[0] if isinstance(op, Conditional) and op.width == 1 else None
+            )
+            for arg in args:
+                predicate = current.get(arg, stale.get(arg))
+                if predicate is None or predicate not in consumers:
+                    continue
+                if (
+                    arg == condition_bit
+                    and predicate == current.get(arg)
+                    and args.count(arg) == 1
+                ):
+                    consumers[predicate].append(i)
+                else:
+                    # the scratch bit is needed, so the predicate stays
+                    del consumers[predicate]
+            for bit in command.bits:
+                for scratch in read_by.pop(bit, ()):
+                    if scratch in current:
+                        stale[scratch] = current.pop(scratch)
+                current.pop(bit, None)
+                stale.pop(bit, None)
+            if op.type == OpType.RangePredicate:
+                scratch = command.bits[0]
+                current[scratch] = i
+                consumers[i] = []
+                for register_bit in args[:-1]:
+                    read_by.setdefault(register_bit, set()).add(scratch)
+        return {
+            consumer: predicate
+            for predicate, indices in consumers.items()
+            for consumer in indices
+        }
+
+    @staticmethod
+    def is_conditional_sq_gate(op: Op) -> bool:
+        """Check if an operation is a classically-controlled single-qubit gate.
+
+        Args:
+            op: operation
+
+        Returns:
+            `True` if the operation is a `Conditional` wrapping a one-qubit gate
+        """
+        return isinstance(op, Conditional) and op.op.is_gate() and op.op.n_qubits == 1
+
     @staticmethod
     def _is_command_global_phase(command: Command) -> bool:
         """Check if an operation related to global phase.
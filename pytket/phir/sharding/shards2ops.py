@@ -6,8 +6,11 @@
 #
 ##############################################################################
 
+from bisect import bisect_right
 from typing import TYPE_CHECKING, TypeAlias
 
+from pytket.circuit import OpType
+
 if TYPE_CHECKING:
     from pytket.unit_id import UnitID
 
@@ -15,30 +18,76 @@ if TYPE_CHECKING:
 
 Layer: TypeAlias = list[list[int]]
 
+DEFERRABLE_OP_TYPES = [OpType.Measure, OpType.Reset]
+
 
 def parse_shards_naive(
     shards: set["Shard"],
+    *,
+    overlap_classical: bool = False,
+    defer_measurements: bool = False,
+    layer_capacity: int | None = None,
 ) -> tuple[list[Layer], list["ShardLayer"]]:
-    """Parse a set of shards and return a circuit representation for placement."""
+    """Parse a set of shards and return a circuit representation for placement.
+
+    Each shard goes in the earliest layer after all the shards it depends upon.
+    Shard IDs are allocated in circuit order and dependencies always point to
+    earlier shards, so a single pass in ID order assigns every layer. Full-width
+    barriers are honoured through the shard epochs: the first shard of an epoch
+    (its barrier) follows every quantum shard of the previous epoch, and the
+    quantum shards of the epoch follow the barrier.
+
+    Args:
+        shards: set of shards to layer
+        overlap_classical: whether qubit-free shards are slotted into the layer in
+            which their dependencies are scheduled, instead of opening a new layer
+        defer_measurements: whether measurements and resets are moved to later
+            layers, see `defer_measure_and_reset`
+        layer_capacity: maximum number of qubits a layer can gate at once, used to
+            bound the layers that measurements and resets are deferred into
+    """
+    ordered_shards = sorted(shards, key=hash)
+    levels: dict[int, int] = {}
+    # the layer of the barrier opening each epoch
+    epoch_levels: list[int] = [0]
+    epoch = 0
+    # the earliest layer for quantum shards of the current epoch
+    epoch_floor = 0
+    # the latest layer used by quantum shards of the current epoch
+    epoch_top = -1
+
+    for shard in ordered_shards:
+        level = max((levels[dep] + 1 for dep in shard.depends_upon), default=0)
+        if shard.epoch != epoch:
+            # the barrier opening a new epoch
+            level = max(level, epoch_top + 1)
+            epoch = shard.epoch
+            epoch_floor = level + 1
+            epoch_top = level
+            epoch_levels.append(level)
+        elif shard.qubits_used:
+            level = max(level, epoch_floor)
+            epoch_top = max(epoch_top, level)
+        elif overlap_classical:
+            # run at the end of the layer holding the latest dependency
+            level = max((levels[dep] for dep in shard.depends_upon), default=0)
+        levels[shard.ID] = level
+
+    if defer_measurements:
+        defer_measure_and_reset(ordered_shards, levels, epoch_levels, layer_capacity)
+
+    # bucket the shards by layer, dropping any layer left empty by deferral
+    shards_by_level: dict[int, ShardLayer] = {}
+    for shard in ordered_shards:
+        shards_by_level.setdefault(levels[shard.ID], []).append(shard)
+    shards_in_layer = [shards_by_level[level] for level in sorted(shards_by_level)]
+
     layers: list[Layer] = []
-    shards_in_layer: list[ShardLayer] = []
-    scheduled: set[int] = set()
-    num_shards: int = len(shards)
     qid_count: int = 0
     qubits2ids: dict[UnitID, int] = {}
-
-    while len(scheduled) < num_shards:
+    for shard_layer in shards_in_layer:
         layer: Layer = []
-
-        # Iterate the shards, looking for shards whose dependencies have been
-        # satisfied, or initially, shards with no dependencies
-        to_schedule: ShardLayer = [
-            s for s in shards if s.depends_upon.issubset(scheduled)
-        ]
-        shards_in_layer.append(to_schedule)
-        shards.difference_update(to_schedule)
-
-        for shard in to_schedule:
+        for shard in shard_layer:
             op: list[int] = []
             # if there are more than 2 qubits used, treat them all as parallel sq ops
             # one qubit will just be a single sq op
@@ -56,13 +105,90 @@ def parse_shards_naive(
                     op.append(qid)
                 layer.append(op)
 
-            scheduled.add(shard.ID)
-
         layers.append(layer)
 
     return layers, shards_in_layer
 
 
+def defer_measure_and_reset(
+    ordered_shards: "ShardLayer",
+    levels: dict[int, int],
+    epoch_levels: list[int],
+    layer_capacity: int | None,
+) -> None:
+    """Move measurement and reset shards to later layers to batch them together.
+
+    Only unconditional measurements whose results are not read by a later shard,
+    and unconditional resets, are moved. Each one goes to the latest layer that
+    already holds a shard of the same kind, is still before any of its dependents
+    and the next epoch barrier, and has room for its qubit. Measurements and resets
+    from several layers then end up batched into single ops, and the layers left
+    empty are dropped by the caller.
+
+    Args:
+        ordered_shards: all the shards, in ID order
+        levels: map of shard ID to its layer, updated in place
+        epoch_levels: layer of the barrier opening each epoch
+        layer_capacity: maximum number of qubits gated per layer, if any
+    """
+    dependents: dict[int, list[Shard]] = {}
+    load: dict[int, int] = {}
+    # number of shards of each deferrable kind per layer, and the sorted layers
+    batch_sizes: dict[tuple[OpType, int], int] = {}
+    batch_levels: dict[OpType, list[int]] = {
+        op_type: [] for op_type in DEFERRABLE_OP_TYPES
+    }
+    for shard in ordered_shards:
+        for dep in shard.depends_upon:
+            dependents.setdefault(dep, []).append(shard)
+        level = levels[shard.ID]
+        load[level] = load.get(level, 0) + len(shard.qubits_used)
+        op_type = shard.primary_command.op.type
+        if op_type in DEFERRABLE_OP_TYPES:
+            if (op_type, level) not in batch_sizes:
+                batch_levels[op_type].append(level)
+            batch_sizes[op_type, level] = batch_sizes.get((op_type, level), 0) + 1
+    for levels_of_type in batch_levels.values():
+        levels_of_type.sort()
+
+    # dependents come later in ID order, so walk backwards to see their final layer
+    for shard in reversed(ordered_shards):
+        op_type = shard.primary_command.op.type
+        if op_type not in DEFERRABLE_OP_TYPES:
+            continue
+        shard_dependents = dependents.get(shard.ID, [])
+        if op_type == OpType.Measure and any(
+            not dep.bits_read.isdisjoint(shard.bits_written) for dep in shard_dependents
+        ):
+            continue
+
+        level = levels[shard.ID]
+        bound = min((levels[dep.ID] - 1 for dep in shard_dependents), default=None)
+        if shard.epoch + 1 < len(epoch_levels):
+            next_epoch = epoch_levels[shard.epoch + 1] - 1
+            bound = next_epoch if bound is None else min(bound, next_epoch)
+        levels_of_type = batch_levels[op_type]
+        width = len(shard.qubits_used)
+        # candidate layers hold a batch of the same kind within (level, bound]
+        upper = (
+            len(levels_of_type)
+            if bound is None
+            else bisect_right(levels_of_type, bound)
+        )
+        for i in range(upper - 1, bisect_right(levels_of_type, level) - 1, -1):
+            target = levels_of_type[i]
+            if not batch_sizes.get((op_type, target)):
+                continue
+            if layer_capacity is not None and load[target] + width > layer_capacity:
+                continue
+            load[level] -= width
+            load[target] += width
+            batch_sizes[op_type, level] -= 1
+            batch_sizes[op_type, target] += 1
+            levels[shard.ID] = target
+            break
+
+
 def get_qid(
     qubit: "UnitID", qubits2ids: dict["UnitID", int], qid_count: int
 ) -> tuple[int, int]:
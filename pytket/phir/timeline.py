@@ -0,0 +1,107 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .phirgen import JsonDict
+
+# units of the gate times of a `Machine`, as for the Transport durations
+TIME_UNITS = "ms"
+
+
+@dataclass(frozen=True)
+class LayerTiming:
+    """Estimated time of one layer of a program.
+
+    transport_time: time moving qubits into place, from placement and routing
+    gate_time: time running the gates of the layer, one op after the other
+    """
+
+    transport_time: float
+    gate_time: float
+
+    @property
+    def duration(self) -> float:
+        """Time of the whole layer, which its Transport op stands for."""
+        return self.transport_time + self.gate_time
+
+
+@dataclass
+class Timeline:
+    """Estimated timeline of a program on a machine, without running it.
+
+    Times are in ms, from the gate times of the machine and the routing cost of
+    each layer, as for the Transport durations of parallel PHIR: gates inside
+    conditional blocks are not counted, and a qparallel block takes the time of
+    one of its gates.
+
+    layers: timing of each layer, in execution order
+    busy_time: time each qubit spends in gates, keyed by qubit, e.g. "q[0]"
+    """
+
+    layers: list[LayerTiming] = field(default_factory=list)
+    busy_time: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def makespan(self) -> float:
+        """Estimated run time of the whole program."""
+        return sum(layer.duration for layer in self.layers)
+
+    @property
+    def transport_time(self) -> float:
+        """Time moving qubits, across all layers."""
+        return sum(layer.transport_time for layer in self.layers)
+
+    @property
+    def gate_time(self) -> float:
+        """Time running gates, across all layers."""
+        return sum(layer.gate_time for layer in self.layers)
+
+    @property
+    def idle_time(self) -> dict[str, float]:
+        """Time each qubit spends outside gates, i.e. in transport or waiting."""
+        makespan = self.makespan
+        return {qubit: makespan - busy for qubit, busy in self.busy_time.items()}
+
+    def add_qubits(self, qubits: "Iterable[str]") -> None:
+        """Track qubits, so that those without gates show up as idle throughout."""
+        for qubit in qubits:
+            self.busy_time.setdefault(qubit, 0.0)
+
+    def add_gates(self, qops: list["JsonDict"], duration: float) -> None:
+        """Add PHIR qops run together, e.g. a qparallel block, to their qubits."""
+        for qop in qops:
+            for arg in qop["args"]:
+                # the args of a two-qubit gate are pairs of qubits
+                for name, index in arg if isinstance(arg[0], list) else [arg]:
+                    qubit = f"{name}[{index}]"
+                    self.busy_time[qubit] = self.busy_time.get(qubit, 0.0) + duration
+
+    def add_layer(self, transport_time: float, gate_time: float) -> None:
+        """Add a layer, once its gates are added."""
+        self.layers.append(LayerTiming(transport_time, gate_time))
+
+    def to_metadata(self) -> "JsonDict":
+        """The timeline as JSON, for the metadata of a PHIR program."""
+        return {
+            "units": TIME_UNITS,
+            "makespan": self.makespan,
+            "transport_time": self.transport_time,
+            "gate_time": self.gate_time,
+            "layers": [
+                {"transport_time": layer.transport_time, "gate_time": layer.gate_time}
+                for layer in self.layers
+            ],
+            "idle_time": self.idle_time,
+        }
@@ -0,0 +1,128 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+from enum import Enum
+from typing import TYPE_CHECKING, TypeAlias, get_args
+
+from phir.model import (
+    Barrier,
+    COp,
+    CVarDefine,
+    ExportVar,
+    FFCall,
+    IdleMOp,
+    IfBlock,
+    MeasOp,
+    PHIRModel,
+    QParBlock,
+    QVarDefine,
+    SeqBlock,
+    SkipMOp,
+    SQOp,
+    TQOp,
+    TransportMOp,
+)
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+    from .phirgen import JsonDict
+
+OpKind: TypeAlias = tuple[str, str | None]
+
+# keys whose value names the kind of op, e.g. {"qop": "RZ", ...}
+OP_KIND_KEYS = frozenset({"data", "qop", "cop", "mop", "meta", "block"})
+
+
+def _op_models() -> dict[OpKind, type["BaseModel"]]:
+    """Map each kind of op to the one model in the PHIR spec it can be."""
+    models: dict[OpKind, type[BaseModel]] = {}
+    for model in (
+        CVarDefine,
+        QVarDefine,
+        ExportVar,
+        Barrier,
+        MeasOp,
+        SQOp,
+        TQOp,
+        COp,
+        FFCall,
+        IdleMOp,
+        TransportMOp,
+        SkipMOp,
+        SeqBlock,
+        QParBlock,
+        IfBlock,
+    ):
+        for key in OP_KIND_KEYS & model.model_fields.keys():
+            for kind in get_args(model.model_fields[key].annotation):
+                models[key, kind] = model
+    return models
+
+
+OP_MODELS = _op_models()
+
+
+class ValidationLevel(Enum):
+    """How much of the generated PHIR is checked against the PHIR model."""
+
+    off = "off"
+    """No validation."""
+    sample = "sample"
+    """The header, the declarations and the first op of each kind."""
+    full = "full"
+    """Every op."""
+
+
+class PhirValidator:
+    """Validate a PHIR program piecewise, as its ops are generated.
+
+    Each op is validated once, on its own, right after its layer is generated, so
+    the whole program is never needed and the output can be streamed. The kind of
+    an op (e.g. `"qop": "RZ"`) determines the only model it can match, so it is
+    validated against that model directly instead of trying every member of the
+    PHIR op union in turn, which is several times faster. Ops of any other kind,
+    such as comments, are validated against the full PHIR model.
+    """
+
+    def __init__(self, level: ValidationLevel = ValidationLevel.full) -> None:
+        """Create a validator.
+
+        Args:
+            level: how much of the program to validate
+        """
+        self.level = level
+        self._seen_kinds: set[OpKind] = set()
+
+    def validate_header(self, header: "JsonDict", decls: list["JsonDict"]) -> None:
+        """Validate the program header and variable declarations."""
+        if self.level != ValidationLevel.off:
+            PHIRModel.model_validate({**header, "ops": decls})
+
+    def validate_ops(self, ops: list["JsonDict"]) -> None:
+        """Validate a chunk of ops, typically one layer."""
+        if self.level == ValidationLevel.off:
+            return
+        other_ops: list[JsonDict] = []
+        for op in ops:
+            key = next(iter(op), "")
+            value = op[key] if key in OP_KIND_KEYS else None
+            kind = (key, value if isinstance(value, str) else None)
+            if self.level == ValidationLevel.sample:
+                if kind in self._seen_kinds:
+                    continue
+                self._seen_kinds.add(kind)
+            model = OP_MODELS.get(kind)
+            if model:
+                model.model_validate(op)
+            else:
+                other_ops.append(op)
+        if other_ops:
+            PHIRModel.model_validate({"ops": other_ops})
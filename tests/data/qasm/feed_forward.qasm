@@ -0,0 +1,16 @@
+OPENQASM 2.0;
+include "hqslib1.inc";
+
+qreg q[3];
+creg c[3];
+
+h q[0];
+measure q[0]->c[0];
+if (c[0]==1) x q[1];
+if (c[0]==1) rz(0.5*pi) q[1];
+if (c[0]==1) x q[2];
+cx q[1],q[2];
+measure q[1]->c[1];
+if (c[1]==1) z q[2];
+if (c[1]==1) x q[2];
+measure q[2]->c[2];
@@ -11,8 +11,15 @@
 import logging
 
 import pytest
+from pytket.circuit import Circuit
 
-from pytket.phir.api import pytket_to_phir, qasm_to_phir
+from pytket.phir.api import (
+    pytket_to_phir,
+    pytket_to_phir_program,
+    pytket_to_phir_programs,
+    qasm_to_phir,
+)
+from pytket.phir.phirgen import EmitProfile
 from pytket.phir.qtm_machine import QtmMachine
 
 from .test_utils import QasmFile, get_qasm_as_circuit
@@ -63,3 +70,69 @@ class TestApi:
         """
 
         assert qasm_to_phir(qasm, QtmMachine.H1)
+
+    @pytest.mark.parametrize("qtm_machine", [None, QtmMachine.H1])
+    def test_pytket_to_phir_conditional_sub_commands(
+        self, qtm_machine: QtmMachine | None
+    ) -> None:
+        """Conditional gates rolled up as sub-commands still produce valid PHIR."""
+        circuit = get_qasm_as_circuit(QasmFile.feed_forward)
+
+        assert pytket_to_phir(circuit, qtm_machine, conditional_sub_commands=True)
+
+    @pytest.mark.parametrize("qtm_machine", [None, QtmMachine.H1])
+    def test_pytket_to_phir_program(self, qtm_machine: QtmMachine | None) -> None:
+        """The program object serializes to the same PHIR as the string API."""
+        circuit = get_qasm_as_circuit(QasmFile.classical_hazards)
+        program = pytket_to_phir_program(circuit, qtm_machine)
+
+        assert program.to_json() == pytket_to_phir(circuit, qtm_machine)
+        assert program.to_bytes() == program.to_json().encode()
+        assert program.num_ops == len(program.phir["ops"])
+        assert program.num_shards > 0
+        if qtm_machine:
+            transports = [op for op in program.phir["ops"] if "mop" in op]
+            assert len(transports) == len(program.layers)
+
+    def test_pytket_to_phir_programs_matches_serial(self) -> None:
+        """Compiling in a thread pool gives the same programs as one at a time."""
+        files = [QasmFile.baby, QasmFile.cond_1, QasmFile.eztest, QasmFile.classical0]
+        circuits = [get_qasm_as_circuit(f) for f in files * 4]
+        for qtm_machine in (None, QtmMachine.H1):
+            serial = [pytket_to_phir(circuit, qtm_machine) for circuit in circuits]
+            programs = pytket_to_phir_programs(circuits, qtm_machine, max_workers=8)
+            assert [program.to_json() for program in programs] == serial
+
+    def test_parallel_metadata_does_not_leak(self) -> None:
+        """A parallel compilation does not change the header of later ones."""
+        circuit = get_qasm_as_circuit(QasmFile.baby)
+        parallel = pytket_to_phir_program(circuit, QtmMachine.H1)
+        serial = pytket_to_phir_program(circuit)
+
+        assert parallel.phir["metadata"]["strict_parallelism"]
+        assert "strict_parallelism" not in serial.phir["metadata"]
+
+    def test_pytket_to_phir_parallel_width(self) -> None:
+        """Without a machine, gates are still grouped, with no machine ops."""
+        circuit = Circuit(4, 4)
+        for qubit in range(4):
+            circuit.H(qubit)
+        circuit.S(0).S(1).CX(0, 1).CX(2, 3).measure_all()
+        program = pytket_to_phir_program(
+            circuit, parallel_width=4, profile=EmitProfile.compact
+        )
+        ops = program.phir["ops"]
+        # the order of the shards in a layer is arbitrary
+        args = {op["qop"]: sorted(op["args"]) for op in ops if "qop" in op}
+
+        assert program.phir["metadata"]["strict_parallelism"]
+        assert args["H"] == [["q", 0], ["q", 1], ["q", 2], ["q", 3]]
+        assert args["SZ"] == [["q", 0], ["q", 1]]
+        assert args["CX"] == [[["q", 0], ["q", 1]], [["q", 2], ["q", 3]]]
+        assert not any("mop" in op for op in ops)
+        assert program.timeline is None
+        # at most one two-qubit gate per group
+        narrow = pytket_to_phir_program(circuit, parallel_width=3).phir["ops"]
+        assert [len(op["args"]) for op in narrow if op.get("qop") == "CX"] == [1, 1]
+        with pytest.raises(ValueError, match="positive"):
+            pytket_to_phir(circuit, parallel_width=0)
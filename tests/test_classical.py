@@ -0,0 +1,144 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+import json
+
+import pytest
+from pytket.circuit import Circuit
+from pytket.circuit.clexpr import wired_clexpr_from_logic_exp
+
+from pytket.phir.api import pytket_to_phir
+from pytket.phir.classical import ClassicalOptimizer, Expr
+from pytket.phir.phirgen import WORDSIZE, JsonDict
+
+
+def cop(op: str, *args: Expr) -> JsonDict:
+    """PHIR for a classical operation."""
+    return {"cop": op, "args": list(args)}
+
+
+def assign(var: str | list[str | int], expr: Expr) -> JsonDict:
+    """PHIR for the assignment of an expression to a variable."""
+    return {"cop": "=", "returns": [var], "args": [expr]}
+
+
+@pytest.mark.parametrize(
+    ("expr", "expected"),
+    [
+        (cop("+", cop("*", 2, 3), "a"), cop("+", 6, "a")),
+        (cop("^", "a", 0), "a"),
+        (cop("|", 0, "a"), "a"),
+        (cop("&", "a", cop("~", 0)), "a"),
+        (cop("&", "a", -1), "a"),
+        (cop("*", "a", 1), "a"),
+        (cop("*", "a", 0), 0),
+        (cop("&", 0, cop("+", "a", "b")), 0),
+        (cop("^", cop("+", "a", "b"), cop("+", "a", "b")), 0),
+        (cop("|", "a", "a"), "a"),
+        (cop("~", cop("~", "a")), "a"),
+        (
+            cop("&", cop("==", ["a", 0], 1), cop("!=", ["a", 1], 0)),
+            cop("&", ["a", 0], ["a", 1]),
+        ),
+        # width-dependent results are left alone
+        (cop("-", 1, 2), cop("-", 1, 2)),
+        (cop("~", 5), cop("~", 5)),
+        (cop("<<", 1, WORDSIZE), cop("<<", 1, WORDSIZE)),
+        (cop("/", "a", 0), cop("/", "a", 0)),
+        (cop("&", "a", 1), cop("&", "a", 1)),
+    ],
+)
+def test_fold(expr: Expr, expected: Expr) -> None:
+    """Constants are folded and identities simplified bottom-up."""
+    assert ClassicalOptimizer(WORDSIZE).fold(expr) == expected
+
+
+def test_hoist_repeated_subexpressions() -> None:
+    """Repeated sub-expressions are computed once, into a declared temporary."""
+    optimizer = ClassicalOptimizer(WORDSIZE)
+    product = cop("*", cop("+", "a", "b"), "c")
+    decl = {
+        "data": "cvar_define",
+        "data_type": f"i{WORDSIZE}",
+        "variable": "tk_CSE_0",
+        "size": WORDSIZE,
+    }
+
+    assert optimizer.optimize_ops([
+        assign("d", cop("-", product, cop("&", product, "e")))
+    ]) == [
+        decl,
+        assign("tk_CSE_0", product),
+        assign("d", cop("-", "tk_CSE_0", cop("&", "tk_CSE_0", "e"))),
+    ]
+    # the temporary is declared once and reused by later assignments
+    assert optimizer.optimize_ops([assign("e", cop("|", product, product))]) == [
+        assign("e", product)
+    ]
+    assert optimizer.optimize_ops([assign("e", cop("+", product, product))]) == [
+        assign("tk_CSE_0", product),
+        assign("e", cop("+", "tk_CSE_0", "tk_CSE_0")),
+    ]
+    # hoisting a single op used twice would not save anything
+    twice = cop("*", cop("+", "a", "b"), cop("+", "a", "b"))
+    assert optimizer.optimize_ops([assign("e", twice)]) == [assign("e", twice)]
+
+
+def test_optimize_ops() -> None:
+    """No-op assignments and blocks are dropped, and constant conditions resolved."""
+    optimizer = ClassicalOptimizer(WORDSIZE)
+    kept = assign(["c", 1], cop("^", ["c", 0], ["c", 2]))
+    ops = [
+        {"//": "a comment"},
+        assign("c", cop("^", "c", 0)),
+        {"cop": "=", "returns": [["c", 0], ["c", 1]], "args": [["c", 0], ["c", 1]]},
+        {
+            "block": "if",
+            "condition": cop("==", cop("-", 3, 3), 0),
+            "true_branch": [kept],
+            "false_branch": [assign("c", 1)],
+        },
+        {
+            "block": "if",
+            "condition": cop("==", ["c", 0], cop("|", 1, 0)),
+            "true_branch": [assign("c", cop("+", "c", 0))],
+        },
+        {"block": "sequence", "ops": [assign("c", cop("*", "c", 1))]},
+    ]
+
+    assert optimizer.optimize_ops(ops) == [{"//": "a comment"}, kept]
+
+
+def test_pytket_to_phir_optimize_classical() -> None:
+    """The optimized program is valid PHIR, and the default output is unchanged."""
+    circ = Circuit()
+    a = circ.add_c_register("a", 4)
+    b = circ.add_c_register("b", 4)
+    c = circ.add_c_register("c", 4)
+    d = circ.add_c_register("d", 4)
+    product = (a + b) * c
+    wexpr, args = wired_clexpr_from_logic_exp(product - (product & d), d.to_list())
+    circ.add_clexpr(wexpr, args)
+    wexpr, args = wired_clexpr_from_logic_exp(a ^ 0, c.to_list())
+    circ.add_clexpr(wexpr, args)
+
+    ops = json.loads(pytket_to_phir(circ))["ops"]
+    optimized = json.loads(pytket_to_phir(circ, optimize_classical=True))["ops"]
+    assert assign("c", cop("^", "a", 0)) in ops
+    assert assign("c", "a") in optimized
+    hoisted = cop("*", cop("+", "a", "b"), "c")
+    assert assign("tk_CSE_0", hoisted) in optimized
+    assert assign("d", cop("-", "tk_CSE_0", cop("&", "tk_CSE_0", "d"))) in optimized
+    assert {
+        "data": "cvar_define",
+        "data_type": f"i{WORDSIZE}",
+        "variable": "tk_CSE_0",
+        "size": WORDSIZE,
+    } in optimized
@@ -0,0 +1,68 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+import json
+from io import BytesIO
+
+import pytest
+
+from pytket.phir.api import pytket_to_phir_program
+from pytket.phir.encoding import (
+    Compression,
+    Encoding,
+    compressed_reader,
+    compressed_writer,
+    decode_phir,
+)
+from pytket.phir.phirgen import genphir
+from pytket.phir.place_and_route import place_and_route
+from pytket.phir.qtm_machine import QtmMachine
+from pytket.phir.sharding.sharder import Sharder
+
+from .test_utils import QasmFile, get_qasm_as_circuit
+
+OPTIONAL_MODULES = {
+    Encoding.msgpack: "msgpack",
+    Compression.zstd: "zstandard",
+}
+
+
+def _require(*options: Encoding | Compression) -> None:
+    for option in options:
+        if option in OPTIONAL_MODULES:
+            pytest.importorskip(OPTIONAL_MODULES[option])
+
+
+@pytest.mark.parametrize("encoding", list(Encoding))
+@pytest.mark.parametrize("compression", list(Compression))
+def test_encodings_round_trip(encoding: Encoding, compression: Compression) -> None:
+    """Every encoding decodes to exactly the PHIR JSON."""
+    _require(encoding, compression)
+    for qasm_file in (QasmFile.classical_hazards, QasmFile.classical0):
+        program = pytket_to_phir_program(get_qasm_as_circuit(qasm_file), QtmMachine.H1)
+
+        data = program.to_bytes(encoding, compression)
+        assert decode_phir(data, encoding, compression) == json.loads(program.to_json())
+
+
+@pytest.mark.parametrize("compression", [Compression.gzip, Compression.zstd])
+def test_compressed_streaming(compression: Compression) -> None:
+    """PHIR streamed through a compressor reads back as the same JSON."""
+    _require(compression)
+    circuit = get_qasm_as_circuit(QasmFile.baby)
+    placed = place_and_route(Sharder(circuit).shard())
+    expected = genphir(placed, circuit)
+
+    raw = BytesIO()
+    writer = compressed_writer(raw, compression)
+    genphir(placed, circuit, out=writer)
+    writer.close()
+    raw.seek(0)
+    assert compressed_reader(raw, compression).read() == expected
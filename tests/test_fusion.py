@@ -0,0 +1,94 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+import numpy as np
+from pytket.circuit import Circuit, Command, fresh_symbol
+
+from pytket.phir.api import pytket_to_phir_program
+from pytket.phir.qtm_machine import QtmMachine
+from pytket.phir.sharding.fusion import fuse_sq_gates
+from pytket.phir.sharding.sharder import Sharder
+
+from .test_utils import QasmFile, get_qasm_as_circuit
+
+
+def same_up_to_phase(commands: list[Command], fused: list[Command]) -> bool:
+    """Whether two lists of single-qubit commands have the same unitary."""
+    unitaries = []
+    for cmds in (commands, fused):
+        circuit = Circuit(1)
+        for command in cmds:
+            circuit.add_gate(command.op, [0])
+        unitaries.append(circuit.get_unitary())
+    before, after = unitaries
+    index = np.argmax(abs(before))
+    phase = after.flat[index] / before.flat[index]
+    return bool(np.allclose(before * phase, after))
+
+
+def test_fuse_rotations() -> None:
+    """Rotations merge and identities are dropped, up to global phase."""
+    circuit = Circuit(1)
+    circuit.Rz(0.25, 0).Rz(0.5, 0).Rx(1, 0).Rx(1, 0).Ry(0.5, 0).Rz(0, 0)
+    circuit.PhasedX(0.5, 0.25, 0).PhasedX(0.25, 2.25, 0).U1(0.5, 0)
+    commands = circuit.get_commands()
+
+    fused = fuse_sq_gates(commands)
+    assert [str(cmd) for cmd in fused] == [
+        "Rz(0.75) q[0];",
+        "Ry(0.5) q[0];",
+        "PhasedX(0.75, 0.25) q[0];",
+        "U1(0.5) q[0];",
+    ]
+    assert same_up_to_phase(commands, fused)
+
+
+def test_fuse_rz_phased_x_chains() -> None:
+    """Rz gates move to the front of a chain, so the PhasedX gates merge."""
+    circuit = Circuit(1)
+    circuit.PhasedX(0.5, 0, 0).Rz(0.25, 0).PhasedX(0.5, 0.25, 0)
+    circuit.Rz(0.5, 0).PhasedX(0.25, 0.5, 0)
+    commands = circuit.get_commands()
+
+    fused = fuse_sq_gates(commands)
+    assert [str(cmd) for cmd in fused] == [
+        "Rz(0.75) q[0];",
+        "PhasedX(1, 0.75) q[0];",
+        "PhasedX(0.25, 0.5) q[0];",
+    ]
+    assert same_up_to_phase(commands, fused)
+
+
+def test_fuse_cliffords() -> None:
+    """Inverse Clifford gates cancel out, but not across conditions or symbols."""
+    circuit = Circuit(1, 1)
+    circuit.H(0).S(0).Sdg(0).H(0).T(0)
+    circuit.X(0, condition_bits=[0], condition_value=1)
+    circuit.Tdg(0).SX(0).SX(0)
+    a = fresh_symbol("a")
+    circuit.Rz(a, 0).Rz(0.5, 0)
+    commands = circuit.get_commands()
+
+    fused = fuse_sq_gates(commands)
+    assert fused == commands[4:]
+
+
+def test_sharder_fuse_sub_commands() -> None:
+    """The sub-commands of each shard are fused, and fewer ops emitted."""
+    circuit = Circuit(2, 2)
+    circuit.H(0).H(0).Rz(0.5, 1).Rz(1.5, 1).CX(0, 1).measure_all()
+
+    shards = Sharder(circuit, fuse_sub_commands=True).shard()
+    assert shards[0].sub_commands == {circuit.qubits[0]: [], circuit.qubits[1]: []}
+
+    circuit = get_qasm_as_circuit(QasmFile.bv_n10)
+    program = pytket_to_phir_program(circuit, QtmMachine.H1)
+    fused = pytket_to_phir_program(circuit, QtmMachine.H1, fuse_sub_commands=True)
+    assert fused.num_ops < program.num_ops
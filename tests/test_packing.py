@@ -0,0 +1,100 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+from typing import TYPE_CHECKING
+
+import pytest
+from pytket.circuit import Circuit, Command, OpType
+
+from pytket.phir.api import pytket_to_phir, pytket_to_phir_program
+from pytket.phir.packing import SqPacking, min_rounds, pack_sub_commands
+from pytket.phir.phirgen_parallel import process_sub_commands
+from pytket.phir.qtm_machine import QTM_MACHINES_MAP, QtmMachine
+
+from .test_utils import QasmFile, get_qasm_as_circuit
+
+if TYPE_CHECKING:
+    from pytket.unit_id import UnitID
+
+
+def sub_commands_of(circ: Circuit) -> "dict[UnitID, list[Command]]":
+    """The single-qubit commands of a circuit, keyed by qubit."""
+    sub_commands: dict[UnitID, list[Command]] = {q: [] for q in circ.qubits}
+    for cmd in circ.get_commands():
+        sub_commands[cmd.qubits[0]].append(cmd)
+    return sub_commands
+
+
+def rounds_of(groups: dict[int, list[Command]]) -> list[list[tuple[OpType, int]]]:
+    """The gate type and qubit index of each command in each round."""
+    return [
+        [(cmd.op.type, cmd.qubits[0].index[0]) for cmd in group]
+        for group in groups.values()
+    ]
+
+
+def test_pack_sub_commands() -> None:
+    """Gates are held back to share a round when that takes fewer rounds."""
+    circ = Circuit(2)
+    circ.Rz(0.5, 0)
+    circ.PhasedX(0.5, 0.0, 1).Rz(0.25, 1)
+    sub_commands = sub_commands_of(circ)
+
+    assert rounds_of(process_sub_commands(sub_commands, 10)) == [
+        [(OpType.Rz, 0)],
+        [(OpType.PhasedX, 1)],
+        [(OpType.Rz, 1)],
+    ]
+    assert rounds_of(pack_sub_commands(sub_commands, 10)) == [
+        [(OpType.PhasedX, 1)],
+        [(OpType.Rz, 0), (OpType.Rz, 1)],
+    ]
+    assert min_rounds(sub_commands, 10) == 2
+
+
+def test_pack_sub_commands_limits() -> None:
+    """Rounds stay within the parallel limit, and other gates run on their own."""
+    circ = Circuit(3)
+    for qubit in range(3):
+        circ.Rz(0.5, qubit)
+    circ.H(0)
+    circ.H(1)
+    sub_commands = sub_commands_of(circ)
+
+    assert rounds_of(pack_sub_commands(sub_commands, 2)) == [
+        [(OpType.Rz, 0), (OpType.Rz, 1)],
+        [(OpType.H, 0)],
+        [(OpType.H, 1)],
+        [(OpType.Rz, 2)],
+    ]
+    assert pack_sub_commands({}, 2) == {}
+
+
+@pytest.mark.parametrize("qasm_file", [QasmFile.bv_n10, QasmFile.qv20_0])
+def test_pytket_to_phir_sq_packing(qasm_file: QasmFile) -> None:
+    """Optimal packing takes fewer rounds, and greedy packing is the default."""
+    circ = get_qasm_as_circuit(qasm_file)
+    greedy = pytket_to_phir_program(circ, QtmMachine.H1)
+    optimal = pytket_to_phir_program(circ, QtmMachine.H1, sq_packing=SqPacking.optimal)
+
+    assert greedy.packing is not None
+    assert optimal.packing is not None
+    assert greedy.packing.rounds == greedy.packing.greedy_rounds
+    assert greedy.packing.sq_time_saved == 0
+    assert optimal.packing.greedy_rounds == greedy.packing.rounds
+    assert optimal.packing.rounds < greedy.packing.rounds
+    assert sum(optimal.packing.rounds_by_gate.values()) == optimal.packing.rounds
+    assert optimal.packing.sq_time_saved == pytest.approx(
+        (greedy.packing.rounds - optimal.packing.rounds)
+        * QTM_MACHINES_MAP[QtmMachine.H1].sq_time
+    )
+    assert greedy.to_json() == pytket_to_phir(circ, QtmMachine.H1)
+    # the same gates are emitted, in fewer ops
+    assert optimal.num_ops < greedy.num_ops
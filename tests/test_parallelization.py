@@ -8,9 +8,35 @@
 
 # mypy: disable-error-code="misc"
 
+import json
 import logging
+from typing import TYPE_CHECKING
 
-from .test_utils import QasmFile, get_phir_json
+from pytket.circuit import Circuit, Command, OpType
+
+from pytket.phir.api import pytket_to_phir
+from pytket.phir.machine import Machine, MachineTimings
+from pytket.phir.phirgen import genphir
+from pytket.phir.phirgen_parallel import (
+    canonical_angles,
+    format_and_add_primary_commands,
+    genphir_parallel,
+    groups2qops,
+    process_sub_commands,
+)
+from pytket.phir.place_and_route import place_and_route
+from pytket.phir.qtm_machine import QTM_MACHINES_MAP, QtmMachine
+from pytket.phir.rebasing.rebaser import rebase_to_qtm_machine
+from pytket.phir.sharding.shard import Shard
+from pytket.phir.sharding.sharder import Sharder
+
+from .test_utils import QasmFile, get_phir_json, get_qasm_as_circuit
+
+if TYPE_CHECKING:
+    from pytket.unit_id import UnitID
+
+    from pytket.phir.phirgen import JsonDict
+    from pytket.phir.sharding.shard import Cost, Ordering, ShardLayer
 
 logger = logging.getLogger(__name__)
 
@@ -182,3 +208,145 @@ def test_group_ordering() -> None:
         "angles": [[3.5, 0.5], "pi"],
         "args": [["q", 1]],
     }
+
+
+def test_deferred_measurements_batched() -> None:
+    """Deferred measurements from several layers end up in one Measure op."""
+    circuit = get_qasm_as_circuit(QasmFile.eztest)
+    phir = json.loads(pytket_to_phir(circuit, QtmMachine.H1, defer_measurements=True))
+    measures = [op for op in phir["ops"] if op.get("qop") == "Measure"]
+    assert len(measures) == 1
+    assert len(measures[0]["args"]) == len(measures[0]["returns"]) == 3
+
+
+def test_parallel_resets_batched() -> None:
+    """Resets in the same layer are emitted as a single Init op."""
+    circuit = Circuit(3)
+    circuit.CX(0, 1).CX(1, 2)
+    for qubit in circuit.qubits:
+        circuit.Reset(qubit)
+    phir = json.loads(pytket_to_phir(circuit, QtmMachine.H1))
+    inits = [op for op in phir["ops"] if op.get("qop") == "Init"]
+    assert len(inits) == 2
+    assert sorted(len(op["args"]) for op in inits) == [1, 2]
+
+
+def test_process_sub_commands_uneven() -> None:
+    """Qubits that run out of sub-commands early do not disturb later groups."""
+    circ = Circuit(3)
+    circ.Rz(0.5, 0).PhasedX(0.5, 0.0, 0).Rz(0.25, 0)
+    circ.Rz(0.5, 1)
+    circ.Rz(0.5, 2).PhasedX(0.5, 0.0, 2)
+    sub_commands: dict[UnitID, list[Command]] = {q: [] for q in circ.qubits}
+    for cmd in circ.get_commands():
+        sub_commands[cmd.qubits[0]].append(cmd)
+
+    groups = process_sub_commands(sub_commands, max_parallel_sq_gates=10)
+    assert [
+        [(cmd.op.type, cmd.qubits[0].index[0]) for cmd in group]
+        for group in groups.values()
+    ] == [
+        [(OpType.Rz, 0), (OpType.Rz, 1), (OpType.Rz, 2)],
+        [(OpType.PhasedX, 0), (OpType.PhasedX, 2)],
+        [(OpType.Rz, 0)],
+    ]
+
+
+def test_canonical_angles() -> None:
+    """Angles equal modulo 2, or up to float noise, share one qop."""
+    circ = Circuit(5)
+    circ.Rz(0.5, 0).Rz(2.5, 1).Rz(0.5 + 1e-15, 2).Rz(-4.440892098500626e-16, 3)
+    circ.Rz(1.5, 4)
+    group = circ.get_commands()
+
+    ops: list[JsonDict] = []
+    groups2qops({0: group}, ops, comments=False)
+    assert len(ops[0]["ops"]) == 4
+
+    ops = []
+    groups2qops({0: group}, ops, comments=False, angle_tolerance=1e-12)
+    assert ops == [
+        {
+            "block": "qparallel",
+            "ops": [
+                {
+                    "qop": "RZ",
+                    "angles": [[0.5], "pi"],
+                    "args": [["q", 0], ["q", 1], ["q", 2]],
+                },
+                {"qop": "RZ", "angles": [[1.5], "pi"], "args": [["q", 4]]},
+            ],
+        }
+    ]
+
+
+def test_canonical_angles_drop_identities() -> None:
+    """Rotations by zero are dropped, including a lone primary command."""
+    circ = Circuit(2)
+    circ.PhasedX(2.0, 0.3, 0).ZZPhase(-2.0, 0, 1)
+    circ.PhasedX(0.5, 4.25, 1)
+    phased_x_zero, zz_phase, phased_x = circ.get_commands()
+
+    assert canonical_angles(phased_x_zero.op, 1e-12) is None
+    assert canonical_angles(zz_phase.op, 1e-12) is None
+    assert canonical_angles(phased_x.op, 1e-12) == (0.5, 0.25)
+
+    ops: list[JsonDict] = []
+    shard = Shard(0, zz_phase, {}, set(), set(), set(), set())
+    format_and_add_primary_commands([shard], ops, angle_tolerance=1e-12)
+    assert ops == []
+    format_and_add_primary_commands([shard], ops)
+    assert ops[-1]["qop"] == "RZZ"
+
+
+def test_placement_reused() -> None:
+    """Parallel emission leaves the shards as they are, so a placement is reusable."""
+    circ = get_qasm_as_circuit(QasmFile.bv_n10)
+    circ = rebase_to_qtm_machine(circ, QtmMachine.H1)
+    machine = QTM_MACHINES_MAP[QtmMachine.H1]
+
+    def place() -> "list[tuple[Ordering, ShardLayer, Cost]]":
+        return place_and_route(Sharder(circ).shard(), machine)
+
+    placed = place()
+    sub_commands = [
+        dict(shard.sub_commands) for _, layer, _ in placed for shard in layer
+    ]
+    parallel = genphir_parallel(placed, circ, machine)
+    assert [
+        shard.sub_commands for _, layer, _ in placed for shard in layer
+    ] == sub_commands
+    assert genphir_parallel(placed, circ, machine) == parallel
+    assert genphir(placed, circ, machine_ops=True) == genphir(
+        place(), circ, machine_ops=True
+    )
+
+
+def test_parallel_sq_gates_table() -> None:
+    """Single-qubit gates in the table of the machine run in parallel groups."""
+    circ = Circuit(4, 4)
+    for qubit in range(4):
+        circ.H(qubit)
+    circ.S(0).S(1).X(2)
+    circ.CZ(0, 1).CZ(2, 3)
+    for qubit in range(4):
+        circ.Measure(qubit, qubit)
+    h1 = QTM_MACHINES_MAP[QtmMachine.H1]
+    placed = place_and_route(Sharder(circ).shard(), h1)
+
+    ops = json.loads(genphir_parallel(placed, circ, h1))["ops"]
+    assert {"qop": "H", "args": [["q", 0], ["q", 1], ["q", 2], ["q", 3]]} in ops
+    assert {"qop": "SZ", "args": [["q", 0], ["q", 1]]} in ops
+    assert {"qop": "CZ", "args": [[["q", 0], ["q", 1]], [["q", 2], ["q", 3]]]} in ops
+
+    # only Rz and PhasedX by default
+    machine = Machine(
+        h1.size,
+        h1.gateset,
+        h1.tq_options,
+        MachineTimings(h1.tq_time, h1.sq_time, h1.qb_swap_time, h1.meas_prep_time),
+    )
+    ops = json.loads(genphir_parallel(placed, circ, machine))["ops"]
+    h_ops = [op for op in ops if op.get("qop") == "H"]
+    assert len(h_ops) == 4
+    assert all(len(op["args"]) == 1 for op in h_ops)
@@ -0,0 +1,119 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from pytket.phir.api import pytket_to_phir_program
+from pytket.phir.peephole import PeepholeOptimizer
+from pytket.phir.qtm_machine import QtmMachine
+
+from .test_utils import QasmFile, get_qasm_as_circuit
+
+if TYPE_CHECKING:
+    from pytket.phir.phirgen import JsonDict
+
+
+def transport(duration: float) -> "JsonDict":
+    """PHIR for a Transport of the given duration."""
+    return {"mop": "Transport", "duration": (duration, "ms")}
+
+
+def qop(gate: str, *args: list[object], **fields: object) -> "JsonDict":
+    """PHIR for a gate on the given args, with any other fields."""
+    return {"qop": gate, **fields, "args": list(args)}
+
+
+def test_transports() -> None:
+    """Zero-duration Transports are dropped and consecutive ones merged."""
+    ops = [transport(0.0), transport(1.5), {"//": "empty layer"}, transport(2)]
+
+    assert PeepholeOptimizer().optimize_ops(ops) == [
+        {"//": "empty layer"},
+        transport(3.5),
+    ]
+
+
+def test_no_ops_and_blocks() -> None:
+    """Rotations by zero and trivial blocks are dropped or flattened."""
+    rz = qop("RZ", ["q", 0], angles=[[0.5], "pi"])
+    ops = [
+        qop("RZ", ["q", 1], angles=[[0.0], "pi"]),
+        qop("R1XY", ["q", 1], angles=[[0.0, 0.5], "pi"]),
+        {"block": "qparallel", "ops": [rz, qop("RX", ["q", 1], angles=[[0], "pi"])]},
+        {"block": "sequence", "ops": []},
+        qop("R1XY", ["q", 1], angles=[[0.5, 0.0], "pi"]),
+    ]
+
+    assert PeepholeOptimizer().optimize_ops(ops) == [rz, ops[-1]]
+
+
+def test_coalesce_qops() -> None:
+    """Adjacent qops of the same gate and angles on other units are coalesced."""
+    ops = [
+        {"//": "H q[0]"},
+        qop("H", ["q", 0]),
+        {"//": "H q[1]"},
+        qop("H", ["q", 1]),
+        # the same qubit again
+        qop("H", ["q", 1]),
+        qop("Measure", ["q", 0], returns=[["c", 0]]),
+        # the same bit again
+        qop("Measure", ["q", 1], returns=[["c", 0]]),
+        qop("Measure", ["q", 2], returns=[["c", 2]]),
+        qop("CX", [["q", 0], ["q", 1]]),
+        qop("CX", [["q", 2], ["q", 3]]),
+        qop("RZ", ["q", 0], angles=[[0.5], "pi"]),
+        qop("RZ", ["q", 1], angles=[[0.25], "pi"]),
+    ]
+
+    assert PeepholeOptimizer(max_parallel_tq_gates=1).optimize_ops(ops) == [
+        {"//": "H q[0]"},
+        {"//": "H q[1]"},
+        qop("H", ["q", 0], ["q", 1]),
+        qop("H", ["q", 1]),
+        qop("Measure", ["q", 0], returns=[["c", 0]]),
+        qop("Measure", ["q", 1], ["q", 2], returns=[["c", 0], ["c", 2]]),
+        *ops[-4:],
+    ]
+
+
+def test_optimize_layers() -> None:
+    """Layers are optimized across their boundaries, a layer late."""
+    layers = [
+        [qop("H", ["q", 0]), transport(1)],
+        [transport(2)],
+        [{"//": "H q[1]"}],
+        [qop("H", ["q", 1])],
+    ]
+
+    assert list(PeepholeOptimizer().optimize_layers(layers)) == [
+        [qop("H", ["q", 0])],
+        [],
+        [],
+        [transport(3), {"//": "H q[1]"}],
+        [qop("H", ["q", 1])],
+    ]
+
+
+@pytest.mark.parametrize(
+    ("qasm_file", "qtm_machine"),
+    [(QasmFile.bv_n10, None), (QasmFile.cond_1, QtmMachine.H1)],
+)
+def test_pytket_to_phir_peephole(
+    qasm_file: QasmFile, qtm_machine: QtmMachine | None
+) -> None:
+    """The optimized programs are valid PHIR with fewer ops."""
+    circuit = get_qasm_as_circuit(qasm_file)
+
+    program = pytket_to_phir_program(circuit, qtm_machine)
+    optimized = pytket_to_phir_program(circuit, qtm_machine, peephole=True)
+    assert optimized.num_ops < program.num_ops
@@ -9,15 +9,29 @@
 # mypy: disable-error-code="misc"
 
 import json
+from io import StringIO
 
-from pytket.circuit import Bit, Circuit
+import pytest
+from pytket.circuit import Bit, Circuit, reg_neq
 from pytket.circuit.clexpr import wired_clexpr_from_logic_exp
 from pytket.circuit.logic_exp import BitWiseOp, create_bit_logic_exp
 from pytket.qasm.qasm import circuit_from_qasm_str
 from pytket.unit_id import BitRegister
 
-from pytket.phir.api import pytket_to_phir
-from pytket.phir.phirgen import WORDSIZE
+from pytket.phir.api import pytket_to_phir, pytket_to_phir_program
+from pytket.phir.phirgen import (
+    WORDSIZE,
+    EmitProfile,
+    FragmentEmitter,
+    JsonDict,
+    genphir,
+)
+from pytket.phir.phirgen_parallel import genphir_parallel
+from pytket.phir.place_and_route import iter_place_and_route, place_and_route
+from pytket.phir.qtm_machine import QTM_MACHINES_MAP, QtmMachine
+from pytket.phir.rebasing.rebaser import rebase_to_qtm_machine
+from pytket.phir.sharding.sharder import Sharder
+from pytket.phir.validation import PhirValidator, ValidationLevel
 
 from .test_utils import QasmFile, get_qasm_as_circuit
 
@@ -71,11 +85,12 @@ def test_pytket_classical_only() -> None:
 
     phir = json.loads(pytket_to_phir(c))
 
-    assert phir["ops"][3] == {
+    copy_a: JsonDict = {
         "cop": "=",
-        "returns": [["b", 0], ["b", 1]],
-        "args": [["a", 0], ["a", 1]],
+        "returns": ["b"],
+        "args": [{"cop": "|", "args": [{"cop": "&", "args": ["b", -4]}, "a"]}],
     }
+    assert phir["ops"][3] == copy_a
     assert phir["ops"][5] == {
         "cop": "=",
         "returns": [["a", 0], ["b", 0]],
@@ -93,16 +108,8 @@ def test_pytket_classical_only() -> None:
     }
     assert phir["ops"][9] == {
         "block": "if",
-        "condition": {
-            "cop": "&",
-            "args": [
-                {"cop": "==", "args": [["b", 1], 0]},
-                {"cop": "==", "args": [["b", 2], 1]},
-            ],
-        },
-        "true_branch": [
-            {"cop": "=", "returns": [["b", 0], ["b", 1]], "args": [["a", 0], ["a", 1]]}
-        ],
+        "condition": {"cop": "==", "args": [{"cop": "&", "args": ["b", 6]}, 4]},
+        "true_branch": [copy_a],
     }
 
 
@@ -179,13 +186,7 @@ def test_conditional_barrier() -> None:
     assert phir["ops"][4] == {"//": "IF ([m[0], m[1]] == 0) THEN Barrier q[0], q[1];"}
     assert phir["ops"][5] == {
         "block": "if",
-        "condition": {
-            "cop": "&",
-            "args": [
-                {"cop": "==", "args": [["m", 0], 0]},
-                {"cop": "==", "args": [["m", 1], 0]},
-            ],
-        },
+        "condition": {"cop": "==", "args": ["m", 0]},
         "true_branch": [{"meta": "barrier", "args": [["q", 0], ["q", 1]]}],
     }
 
@@ -361,26 +362,52 @@ def test_multi_bit_ops() -> None:
     assert phir["ops"][3] == {
         "//": "AND (*3) c0[0], c1[0], c2[0], c0[1], c1[1], c2[1], c0[2], c1[2], c2[2];"
     }
+    # only the low bits of c2 are written, c0 has no others set
     assert phir["ops"][4] == {
         "cop": "=",
         "returns": ["c2"],
-        "args": [{"cop": "&", "args": ["c0", "c1"]}],
+        "args": [
+            {
+                "cop": "|",
+                "args": [
+                    {"cop": "&", "args": ["c2", -8]},
+                    {"cop": "&", "args": ["c0", "c1"]},
+                ],
+            }
+        ],
     }
     assert phir["ops"][5] == {
         "//": "NOT (*4) c1[0], c2[0], c1[1], c2[1], c1[2], c2[2], c1[3], c2[3];"
     }
-    assert phir["ops"][6] == {
+    not_c1: JsonDict = {
         "cop": "=",
         "returns": ["c2"],
-        "args": [{"cop": "~", "args": ["c1"]}],
+        "args": [
+            {
+                "cop": "|",
+                "args": [
+                    {"cop": "&", "args": ["c2", -16]},
+                    {"cop": "&", "args": [{"cop": "~", "args": ["c1"]}, 15]},
+                ],
+            }
+        ],
     }
+    assert phir["ops"][6] == not_c1
     assert phir["ops"][7] == {
         "//": "OR (*3) c0[0], c1[0], c2[0], c0[1], c1[1], c2[1], c0[2], c1[2], c2[2];"
     }
     assert phir["ops"][8] == {
         "cop": "=",
         "returns": ["c2"],
-        "args": [{"cop": "|", "args": ["c0", "c1"]}],
+        "args": [
+            {
+                "cop": "|",
+                "args": [
+                    {"cop": "&", "args": ["c2", -8]},
+                    {"cop": "&", "args": [{"cop": "|", "args": ["c0", "c1"]}, 7]},
+                ],
+            }
+        ],
     }
     assert phir["ops"][9] == {
         "//": "XOR (*4) c1[0], c2[0], c1[1], c2[1], c1[2], c2[2], c1[3], c2[3];"
@@ -388,14 +415,20 @@ def test_multi_bit_ops() -> None:
     assert phir["ops"][10] == {
         "cop": "=",
         "returns": ["c2"],
-        "args": [{"cop": "^", "args": ["c1", "c2"]}],
+        "args": [
+            {
+                "cop": "|",
+                "args": [
+                    {"cop": "&", "args": ["c2", -16]},
+                    {"cop": "&", "args": [{"cop": "^", "args": ["c1", "c2"]}, 15]},
+                ],
+            }
+        ],
     }
     assert phir["ops"][12] == {
         "block": "if",
         "condition": {"cop": "==", "args": [["c0", 0], 1]},
-        "true_branch": [
-            {"cop": "=", "returns": ["c2"], "args": [{"cop": "~", "args": ["c1"]}]}
-        ],
+        "true_branch": [not_c1],
     }
     assert phir["ops"][14] == {
         "block": "if",
@@ -406,6 +439,50 @@ def test_multi_bit_ops() -> None:
     }
 
 
+def test_register_slice_assignments() -> None:
+    """Bitwise ops on slices of registers are applied to the registers at once."""
+    c = Circuit()
+    a = c.add_c_register("a", 4)
+    b = c.add_c_register("b", 6)
+    c.add_c_setbits([True, False, True, True], a.to_list())
+    c.add_c_setbits([True, False, True], [b[1], b[2], b[3]])
+    c.add_c_setbits([False, False], [b[4], b[5]])
+    c.add_c_copybits([a[1], a[2]], [b[3], b[4]])
+    c.add_c_copybits([a[3], a[2]], [b[0], b[1]])
+    c.add_c_xor_to_registers(b, a, a)
+    ops = [op for op in json.loads(pytket_to_phir(c))["ops"][2:] if "//" not in op]
+
+    assert ops == [
+        {"cop": "=", "returns": ["a"], "args": [13]},
+        {
+            "cop": "=",
+            "returns": ["b"],
+            "args": [{"cop": "|", "args": [{"cop": "&", "args": ["b", -15]}, 10]}],
+        },
+        {"cop": "=", "returns": ["b"], "args": [{"cop": "&", "args": ["b", -49]}]},
+        # not in index order
+        {"cop": "=", "returns": [["b", 0], ["b", 1]], "args": [["a", 3], ["a", 2]]},
+        {
+            "cop": "=",
+            "returns": ["b"],
+            "args": [
+                {
+                    "cop": "|",
+                    "args": [
+                        {"cop": "&", "args": ["b", -25]},
+                        {"cop": "&", "args": [{"cop": "<<", "args": ["a", 2]}, 24]},
+                    ],
+                }
+            ],
+        },
+        {
+            "cop": "=",
+            "returns": ["a"],
+            "args": [{"cop": "^", "args": ["b", "a"]}],
+        },
+    ]
+
+
 def test_irregular_multibit_ops() -> None:
     """From https://github.com/CQCL/pytket-phir/pull/162#discussion_r1555807863 ."""
     c = Circuit()
@@ -479,19 +556,70 @@ def test_condition_multiple_bits() -> None:
     phir = json.loads(pytket_to_phir(c))
 
     assert phir["ops"][2] == {"//": "IF ([c[0], c[1], c[2]] == 6) THEN Rz(0.5) q[0];"}
-    assert phir["ops"][3]["condition"] == {
-        "cop": "&",
-        "args": [
-            {"cop": "==", "args": [["c", 0], 0]},
-            {
-                "cop": "&",
-                "args": [
-                    {"cop": "==", "args": [["c", 1], 1]},
-                    {"cop": "==", "args": [["c", 2], 1]},
-                ],
-            },
-        ],
-    }
+    assert phir["ops"][3]["condition"] == {"cop": "==", "args": ["c", 6]}
+
+
+def test_fuse_range_predicates() -> None:
+    """Fused range predicates are tested inline, negated for a condition of 0."""
+    c = Circuit(2)
+    a = c.add_c_register("a", 4)
+    flag = c.add_c_register("flag", 1)
+    c.H(0).Measure(0, a[0])
+    c.H(1, condition=reg_neq(a, 2))
+    c.add_c_range_predicate(1, 5, a.to_list(), flag[0])
+    c.X(0, condition_bits=[flag[0]], condition_value=1)
+    ops = json.loads(pytket_to_phir(c, fuse_range_predicates=True))["ops"]
+
+    assert {"//": "RangePredicate([1,5]) a[0], a[1], a[2], a[3], flag[0];"} in ops
+    assert [op["condition"] for op in ops if "block" in op] == [
+        {
+            "cop": "&",
+            "args": [{"cop": ">=", "args": ["a", 1]}, {"cop": "<=", "args": ["a", 5]}],
+        },
+        {"cop": "!=", "args": ["a", 2]},
+    ]
+    assert not any("returns" in op and op["returns"] == [["flag", 0]] for op in ops)
+
+
+def test_condition_register_slice() -> None:
+    """Conditions on contiguous bits of a register compare the register at once."""
+    c = Circuit(1)
+    a = c.add_c_register("a", 32)
+    b = c.add_c_register("b", 4)
+    c.X(0, condition_bits=a.to_list(), condition_value=0xDEC0DE)
+    c.X(0, condition_bits=[b[1], b[2]], condition_value=1)
+    c.X(0, condition_bits=[b[2], b[1], b[3]], condition_value=5)
+    c.X(0, condition_bits=[b[0], a[0]], condition_value=2)
+    conditions = [
+        op["condition"] for op in json.loads(pytket_to_phir(c))["ops"] if "block" in op
+    ]
+
+    assert conditions == [
+        {"cop": "==", "args": ["a", 0xDEC0DE]},
+        {"cop": "==", "args": [{"cop": "&", "args": ["b", 6]}, 2]},
+        # bits out of order
+        {
+            "cop": "&",
+            "args": [
+                {"cop": "==", "args": [["b", 2], 1]},
+                {
+                    "cop": "&",
+                    "args": [
+                        {"cop": "==", "args": [["b", 1], 0]},
+                        {"cop": "==", "args": [["b", 3], 1]},
+                    ],
+                },
+            ],
+        },
+        # bits of different registers
+        {
+            "cop": "&",
+            "args": [
+                {"cop": "==", "args": [["b", 0], 0]},
+                {"cop": "==", "args": [["a", 0], 1]},
+            ],
+        },
+    ]
 
 
 def test_unused_classical_registers() -> None:
@@ -613,3 +741,95 @@ def test_classical_1() -> None:
         "returns": [["d", 0]],
         "args": [{"cop": "^", "args": [["a", 0], 1]}],
     } in ops
+
+
+@pytest.mark.parametrize(
+    "qasm_file", [QasmFile.baby, QasmFile.cond_1, QasmFile.classical0, QasmFile.sleep]
+)
+def test_genphir_streams_to_output(qasm_file: QasmFile) -> None:
+    """Streaming the PHIR gives exactly the same output as returning it."""
+    circuit = get_qasm_as_circuit(qasm_file)
+    shards = Sharder(circuit).shard()
+    expected = genphir(place_and_route(shards), circuit, machine_ops=False)
+
+    out = StringIO()
+    genphir(iter_place_and_route(shards), circuit, machine_ops=False, out=out)
+    assert out.getvalue() == expected
+
+
+@pytest.mark.parametrize(
+    "qasm_file", [QasmFile.baby, QasmFile.eztest, QasmFile.classical_hazards]
+)
+def test_genphir_parallel_streams_to_output(qasm_file: QasmFile) -> None:
+    """Streaming the parallel PHIR gives exactly the same output as returning it."""
+    machine = QTM_MACHINES_MAP[QtmMachine.H1]
+    circuit = rebase_to_qtm_machine(get_qasm_as_circuit(qasm_file), QtmMachine.H1)
+    shards = Sharder(circuit).shard()
+    expected = genphir_parallel(place_and_route(shards, machine), circuit, machine)
+
+    out = StringIO()
+    genphir_parallel(iter_place_and_route(shards, machine), circuit, machine, out=out)
+    assert out.getvalue() == expected
+
+
+@pytest.mark.parametrize("qtm_machine", [None, QtmMachine.H1])
+def test_compact_and_source_mapped_profiles(qtm_machine: QtmMachine | None) -> None:
+    """The compact profile drops comments, the source map records where they were."""
+    circuit = get_qasm_as_circuit(QasmFile.classical_hazards)
+    commented = pytket_to_phir_program(circuit, qtm_machine)
+    compact = pytket_to_phir_program(circuit, qtm_machine, profile=EmitProfile.compact)
+    mapped = pytket_to_phir_program(
+        circuit, qtm_machine, profile=EmitProfile.source_mapped
+    )
+
+    assert not any("//" in op for op in compact.phir["ops"])
+    assert compact.source_map is None
+    assert mapped.phir == compact.phir
+    assert mapped.source_map
+
+    # each comment of the commented program maps to the op that follows it
+    index = 0
+    comments: list[str] = []
+    expected: dict[int, str] = {}
+    for op in commented.phir["ops"]:
+        if "//" in op:
+            comments.append(op["//"])
+            continue
+        if comments:
+            expected[index] = "\n".join(comments)
+            comments = []
+        assert op == compact.phir["ops"][index]
+        index += 1
+    assert mapped.source_map == expected
+
+
+@pytest.mark.parametrize(
+    "qasm_file",
+    [
+        QasmFile.baby,
+        QasmFile.cond_1,
+        QasmFile.classical0,
+        QasmFile.sleep,
+        QasmFile.oned_brickwork_circuit_n20,
+    ],
+)
+@pytest.mark.parametrize("profile", [EmitProfile.commented, EmitProfile.compact])
+@pytest.mark.parametrize("validation", [ValidationLevel.off, ValidationLevel.sample])
+def test_fragments_match_dicts(
+    qasm_file: QasmFile, profile: EmitProfile, validation: ValidationLevel
+) -> None:
+    """The fragment emitter gives exactly the same PHIR as the dict path."""
+    circuit = get_qasm_as_circuit(qasm_file)
+    placed = place_and_route(Sharder(circuit).shard())
+    expected = genphir(placed, circuit, profile=profile)
+
+    assert genphir(placed, circuit, profile=profile, validation=validation) == expected
+    out = StringIO()
+    genphir(placed, circuit, profile=profile, validation=validation, out=out)
+    assert out.getvalue() == expected
+
+
+def test_fragment_emitter_needs_partial_validation() -> None:
+    """Fragments are only validated when first built, so full validation is refused."""
+    with pytest.raises(ValueError, match="fully validated"):
+        FragmentEmitter(PhirValidator(ValidationLevel.full))
@@ -6,8 +6,19 @@
 #
 ##############################################################################
 
-from pytket.circuit import Conditional, Op, OpType
-
+from pytket.circuit import (
+    Circuit,
+    Conditional,
+    Op,
+    OpType,
+    reg_eq,
+    reg_geq,
+    reg_lt,
+)
+
+from pytket.phir.place_and_route import place_and_route
+from pytket.phir.qtm_machine import QtmMachine
+from pytket.phir.rebasing.rebaser import rebase_to_qtm_machine
 from pytket.phir.sharding.sharder import Sharder
 
 from .test_utils import QasmFile, get_qasm_as_circuit
@@ -25,6 +36,14 @@ class TestSharder:
         shard_set.add(first_shard)
         assert len(shard_set) == 3
 
+    def test_shard_ids_are_per_run(self) -> None:
+        circuit = get_qasm_as_circuit(QasmFile.baby)
+        first_run = Sharder(circuit).shard()
+        second_run = Sharder(circuit).shard()
+
+        assert [shard.ID for shard in first_run] == [0, 1, 2]
+        assert [shard.ID for shard in second_run] == [0, 1, 2]
+
     def test_should_op_create_shard(self) -> None:
         expected_true: list[Op] = [
             Op.create(OpType.Measure),
@@ -399,3 +418,120 @@ class TestSharder:
             circuit.bits[3],
         }
         assert shards[3].depends_upon == {shards[2].ID}
+
+    def test_conditional_sub_commands(self) -> None:
+        circuit = get_qasm_as_circuit(QasmFile.feed_forward)
+        shards = Sharder(circuit, conditional_sub_commands=True).shard()
+
+        # no conditional gate gets a shard of its own
+        assert not any(
+            isinstance(shard.primary_command.op, Conditional) for shard in shards
+        )
+
+        # shard 1: [if(c[0]==1) x q[1]; if(c[0]==1) rz q[1]; ...] cx q[1],q[2];
+        cx_shard = next(s for s in shards if s.primary_command.op.type == OpType.CX)
+        q1_cmds = cx_shard.sub_commands[circuit.qubits[1]]
+        assert [
+            cmd.op.op.type for cmd in q1_cmds if isinstance(cmd.op, Conditional)
+        ] == [OpType.X, OpType.Rz]
+        assert circuit.bits[0] in cx_shard.bits_read
+        assert shards[0].primary_command.op.type == OpType.Measure
+        assert shards[0].ID in cx_shard.depends_upon
+
+        layers = place_and_route(Sharder(circuit).shard())
+        ff_layers = place_and_route(
+            Sharder(circuit, conditional_sub_commands=True).shard()
+        )
+        assert len(ff_layers) < len(layers)
+
+    def test_conditional_sub_commands_war_hazard(self) -> None:
+        circuit = Circuit(2, 1)
+        circuit.Measure(0, 0)
+        circuit.X(1, condition=circuit.bits[0])
+        circuit.H(0)
+        circuit.Measure(0, 0)
+        shards = Sharder(circuit, conditional_sub_commands=True).shard()
+
+        assert len(shards) == 3
+        # the pending conditional is flushed before c[0] gets overwritten
+        assert shards[1].primary_command.op.type == OpType.Barrier
+        assert shards[1].qubits_used == {circuit.qubits[1]}
+        assert shards[1].bits_read == {circuit.bits[0]}
+        assert shards[1].depends_upon == {shards[0].ID}
+        assert shards[2].primary_command.op.type == OpType.Measure
+        assert shards[2].depends_upon == {shards[0].ID, shards[1].ID}
+        # the input circuit is left untouched
+        assert circuit.n_gates == 4
+
+    def test_barrier_epochs(self) -> None:
+        circuit = Circuit(3)
+        for _ in range(4):
+            circuit.H(0).CX(1, 2)
+            circuit.add_barrier(circuit.qubits)
+        circuit.H(1)
+        shards = Sharder(circuit).shard()
+
+        barriers = [s for s in shards if s.primary_command.op.type == OpType.Barrier]
+        assert [s.epoch for s in barriers[:4]] == [1, 2, 3, 4]
+        for shard in barriers[:4]:
+            # the barrier rolls up the pending H, but has no per-qubit fan-in
+            assert not shard.depends_upon
+            assert circuit.qubits[0] in shard.sub_commands
+        for shard in shards:
+            if shard not in barriers:
+                # and the shards after a barrier don't fan out from it
+                assert not shard.depends_upon
+        # the lingering H after the last barrier is rolled up in the last epoch
+        assert shards[-1].epoch == 4
+        assert shards[-1].qubits_used == {circuit.qubits[1]}
+
+    def test_rollup_keeps_every_command(self) -> None:
+        circuit = rebase_to_qtm_machine(
+            get_qasm_as_circuit(QasmFile.baby_with_rollup), QtmMachine.H1
+        )
+        commands = circuit.get_commands()
+        shards = Sharder(circuit).shard()
+
+        sharded = [shard.primary_command for shard in shards]
+        for shard in shards:
+            for sub_commands in shard.sub_commands.values():
+                sharded.extend(sub_commands)
+        assert sorted(map(str, commands)) == sorted(
+            str(cmd) for cmd in sharded if cmd.op.type != OpType.Barrier
+        )
+        # the rollup barriers are not added to the input circuit
+        assert circuit.get_commands() == commands
+
+    def test_fuse_range_predicates(self) -> None:
+        circuit = Circuit(2)
+        a = circuit.add_c_register("a", 4)
+        circuit.H(0).Measure(0, a[0])
+        circuit.X(0, condition=reg_eq(a, 3))
+        circuit.X(1, condition=reg_lt(a, 3))
+        circuit.Measure(1, a[1])
+        circuit.H(1, condition=reg_geq(a, 2))
+        # the scratch bit is read again after the register changes
+        circuit.H(0, condition=reg_eq(a, 2))
+        circuit.Measure(0, a[2])
+        scratch = circuit.get_c_register("tk_SCRATCH_BIT")
+        circuit.Z(0, condition_bits=scratch.to_list()[3:], condition_value=1)
+        commands = circuit.get_commands()
+
+        fused = Sharder.fusable_range_predicates(commands)
+        assert {commands[i].op.type for i in fused.values()} == {OpType.RangePredicate}
+        assert len(fused) == len(set(fused.values())) == 3
+
+        shards = Sharder(circuit, fuse_range_predicates=True).shard()
+        unfused = Sharder(circuit).shard()
+        assert len(shards) == len(unfused) - 3
+        measure_a0 = shards[0]
+        for shard in shards:
+            if shard.range_predicate is None:
+                continue
+            # the register is read instead of the scratch bit
+            assert shard.bits_read == set(a.to_list())
+            assert measure_a0.ID in shard.depends_upon
+        predicates = [
+            s for s in shards if s.primary_command.op.type == OpType.RangePredicate
+        ]
+        assert len(predicates) == 1
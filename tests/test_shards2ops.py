@@ -0,0 +1,105 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+from typing import TYPE_CHECKING
+
+import pytest
+from pytket.circuit import Circuit, OpType
+
+from pytket.phir.sharding.sharder import Sharder
+from pytket.phir.sharding.shards2ops import parse_shards_naive
+
+from .test_utils import QasmFile, get_qasm_as_circuit
+
+if TYPE_CHECKING:
+    from pytket.phir.sharding.shard import ShardLayer
+
+
+@pytest.mark.parametrize(
+    "test_file",
+    [
+        QasmFile.classical_hazards,
+        QasmFile.classical_ordering,
+        QasmFile.cond_classical,
+        QasmFile.classical0,
+        QasmFile.classical1,
+    ],
+)
+def test_overlap_classical(test_file: QasmFile) -> None:
+    """Qubit-free shards are slotted into existing layers in dependency order."""
+    circuit = get_qasm_as_circuit(test_file)
+    shards = Sharder(circuit).shard()
+    _, naive_layers = parse_shards_naive(set(shards))
+    _, shard_layers = parse_shards_naive(set(shards), overlap_classical=True)
+
+    assert len(shard_layers) < len(naive_layers)
+    assert sum(len(layer) for layer in shard_layers) == len(shards)
+
+    emitted: set[int] = set()
+    for layer in shard_layers:
+        for shard in layer:
+            assert shard.depends_upon.issubset(emitted)
+            emitted.add(shard.ID)
+
+
+def test_barrier_epoch_layers() -> None:
+    """Full-width barriers separate the layers without explicit dependencies."""
+    circuit = Circuit(4)
+    n_rounds = 50
+    for _ in range(n_rounds):
+        circuit.CX(0, 1).CX(2, 3)
+        circuit.add_barrier(circuit.qubits)
+    shards = Sharder(circuit).shard()
+    _, shard_layers = parse_shards_naive(set(shards))
+
+    assert len(shard_layers) == 2 * n_rounds
+    for i, layer in enumerate(shard_layers):
+        op_types = {shard.primary_command.op.type for shard in layer}
+        assert op_types == ({OpType.Barrier} if i % 2 else {OpType.CX})
+        assert all(shard.epoch == (i + 1) // 2 for shard in layer)
+
+
+def test_defer_measurements() -> None:
+    """Unread measurements are deferred to join a later batch of measurements."""
+    circuit = Circuit(4, 4)
+    circuit.CX(0, 1).Measure(0, 0)
+    circuit.CX(1, 2).CX(1, 2).Measure(1, 1).Measure(2, 2)
+    circuit.Measure(3, 3).X(3, condition=circuit.bits[3])
+    shards = Sharder(circuit).shard()
+    _, naive_layers = parse_shards_naive(set(shards))
+    _, shard_layers = parse_shards_naive(set(shards), defer_measurements=True)
+
+    def measured(layer: "ShardLayer") -> set[int]:
+        return {
+            shard.primary_command.qubits[0].index[0]
+            for shard in layer
+            if shard.primary_command.op.type == OpType.Measure
+        }
+
+    assert [measured(layer) for layer in naive_layers] == [{3}, {0}, set(), {1, 2}]
+    # the measurement read by the conditional X stays where it is
+    assert [measured(layer) for layer in shard_layers] == [{3}, set(), set(), {0, 1, 2}]
+
+    emitted: set[int] = set()
+    for layer in shard_layers:
+        for shard in layer:
+            assert shard.depends_upon.issubset(emitted)
+        emitted.update(shard.ID for shard in layer)
+
+
+def test_defer_measurements_capacity() -> None:
+    """Deferred measurements only go to layers with room for their qubit."""
+    circuit = Circuit(4, 4)
+    circuit.CX(0, 1).Measure(0, 0)
+    circuit.CX(1, 2).CX(1, 2).Measure(1, 1).Measure(2, 2)
+    shards = Sharder(circuit).shard()
+    _, shard_layers = parse_shards_naive(
+        set(shards), defer_measurements=True, layer_capacity=2
+    )
+
+    assert shard_layers[1][0].primary_command.op.type == OpType.Measure
@@ -0,0 +1,66 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+import json
+
+import pytest
+from phir.model import PHIRModel
+
+from pytket.phir.api import pytket_to_phir, pytket_to_phir_program
+from pytket.phir.qtm_machine import QTM_MACHINES_MAP, QtmMachine
+
+from .test_utils import QasmFile, get_qasm_as_circuit
+
+
+def test_timeline() -> None:
+    """The timeline adds up to the Transport durations, split by layer and qubit."""
+    circ = get_qasm_as_circuit(QasmFile.bv_n10)
+    program = pytket_to_phir_program(circ, QtmMachine.H1)
+    timeline = program.timeline
+    assert timeline is not None
+
+    durations = [
+        op["duration"][0] for op in program.phir["ops"] if op.get("mop") == "Transport"
+    ]
+    assert [layer.duration for layer in timeline.layers] == pytest.approx(durations)
+    assert len(timeline.layers) == len(program.layers)
+    assert [layer.transport_time for layer in timeline.layers] == [
+        layer.transport_cost for layer in program.layers
+    ]
+    assert timeline.makespan == pytest.approx(sum(durations))
+    assert timeline.makespan == pytest.approx(
+        timeline.transport_time + timeline.gate_time
+    )
+
+    assert set(timeline.busy_time) == {str(qubit) for qubit in circ.qubits}
+    machine = QTM_MACHINES_MAP[QtmMachine.H1]
+    # the ancilla is in every two-qubit gate
+    assert max(timeline.busy_time, key=timeline.busy_time.__getitem__) == "qr[9]"
+    assert timeline.busy_time["qr[9]"] > machine.tq_time
+    for qubit, idle in timeline.idle_time.items():
+        assert idle == pytest.approx(timeline.makespan - timeline.busy_time[qubit])
+        assert 0 <= idle <= timeline.makespan
+
+
+def test_timeline_metadata() -> None:
+    """The timeline is only added to the metadata on request."""
+    circ = get_qasm_as_circuit(QasmFile.bv_n10)
+    assert "timeline" not in json.loads(pytket_to_phir(circ, QtmMachine.H1))["metadata"]
+
+    program = pytket_to_phir_program(circ, QtmMachine.H1, timeline_metadata=True)
+    assert program.timeline is not None
+    metadata = program.phir["metadata"]["timeline"]
+    assert metadata == json.loads(json.dumps(program.timeline.to_metadata()))
+    assert metadata["units"] == "ms"
+    assert len(metadata["layers"]) == len(program.layers)
+    PHIRModel.model_validate(program.phir)
+
+    # serial PHIR has no timeline
+    assert pytket_to_phir_program(circ).timeline is None
@@ -56,6 +56,7 @@ class QasmFile(Enum):
     sleep = auto()
     classical0 = auto()
     classical1 = auto()
+    feed_forward = auto()
 
 
 class WatFile(Enum):
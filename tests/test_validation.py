@@ -0,0 +1,60 @@
+##############################################################################
+#
+# Copyright (c) 2026 Quantinuum LLC All rights reserved.
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+#
+##############################################################################
+
+# mypy: disable-error-code="misc"
+
+import pytest
+from pydantic import ValidationError
+
+from pytket.phir.api import pytket_to_phir
+from pytket.phir.qtm_machine import QtmMachine
+from pytket.phir.validation import PhirValidator, ValidationLevel
+
+from .test_utils import QasmFile, get_qasm_as_circuit
+
+GOOD_OP = {"qop": "RZ", "angles": [[0.5], "pi"], "args": [["q", 0]]}
+BAD_OP = {"qop": "RZ", "args": [["q", 0]]}
+
+
+def test_full_validation_rejects_bad_ops() -> None:
+    """Every op is checked against the model its kind implies."""
+    validator = PhirValidator(ValidationLevel.full)
+    validator.validate_ops([GOOD_OP, {"//": "a comment"}])
+    with pytest.raises(ValidationError):
+        validator.validate_ops([GOOD_OP, BAD_OP])
+    with pytest.raises(ValidationError):
+        validator.validate_ops([{"qop": "NotAGate", "args": [["q", 0]]}])
+
+
+def test_sample_validation_checks_first_op_of_each_kind() -> None:
+    """Sampling only checks the first op of each kind."""
+    validator = PhirValidator(ValidationLevel.sample)
+    validator.validate_ops([GOOD_OP])
+    validator.validate_ops([BAD_OP])
+    with pytest.raises(ValidationError):
+        validator.validate_ops([{"qop": "RX", "args": [["q", 0]]}])
+
+
+def test_no_validation() -> None:
+    """Nothing is checked when validation is off."""
+    validator = PhirValidator(ValidationLevel.off)
+    validator.validate_header({"format": "PHIR/JSON", "bogus": True}, [])
+    validator.validate_ops([BAD_OP])
+
+
+@pytest.mark.parametrize("qtm_machine", [None, QtmMachine.H1])
+def test_validation_level_does_not_change_output(
+    qtm_machine: QtmMachine | None,
+) -> None:
+    """Validation only checks the PHIR, never alters it."""
+    circuit = get_qasm_as_circuit(QasmFile.classical_hazards)
+    outputs = {
+        pytket_to_phir(circuit, qtm_machine, validation=level)
+        for level in ValidationLevel
+    }
+    assert len(outputs) == 1